@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""asyncio 串口传输
+
+SerialTransport 直接在串口的文件描述符上实现 asyncio 的 Transport: 用
+loop.add_reader() 等待可读, 非阻塞写入, 写不完的数据缓存到描述符可写时
+继续写出, 缓存超过高水位时暂停协议的写入(drain() 等待)。不需要接收线程
+和发送线程, 多个串口、定时器和脚本可以在同一个事件循环中组合。
+
+    reader, writer = await open_serial_connection('/dev/ttyUSB0', baudrate=115200)
+    writer.write(b'AT\\r\\n')
+    await writer.drain()
+    line = await reader.readline()
+
+仅支持有文件描述符的串口(Linux/macOS 的串口设备和 pty), 且需要支持
+add_reader() 的事件循环(默认的 SelectorEventLoop)。
+
+与 Qt 界面配合时, 可以用 LoopThread 在后台线程中运行事件循环, 界面线程通过
+submit() 提交协程并取得 concurrent.futures.Future; 也可以使用 qasync 等把
+asyncio 事件循环运行在 Qt 事件循环之上的库, 本模块只使用标准的 add_reader /
+add_writer 接口。
+
+命令行:
+    python async_serial.py echo <串口>...       在一个事件循环中回显多个串口收到的数据
+    python async_serial.py selftest             通过 pty 对测试收发、流控和关闭
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+import serial
+
+from serial_engine import open_port
+
+# 写缓存的默认高低水位(字节)
+HIGH_WATER = 64 * 1024
+LOW_WATER = 16 * 1024
+READ_SIZE = 64 * 1024
+
+
+class SerialTransport(asyncio.Transport):
+    """串口文件描述符上的 asyncio 传输
+
+    收到的数据连同 perf_counter_ns 时间戳交给 recorder (CaptureWriter) 录制,
+    再调用 protocol.data_received()。串口被拔出等读写错误时调用
+    protocol.connection_lost(异常)。
+    """
+    def __init__(self, loop, protocol, serial_port, recorder=None):
+        super().__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self.serial_port = serial_port
+        self.recorder = recorder
+        self._fd = serial_port.fileno()
+        os.set_blocking(self._fd, False)
+        self._buffer = bytearray()
+        self._high_water = HIGH_WATER
+        self._low_water = LOW_WATER
+        self._protocol_paused = False
+        self._reading_paused = False
+        self._closing = False
+        self._closed = False
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._loop.call_soon(self._protocol.connection_made, self)
+        self._loop.call_soon(self._add_reader)
+
+    def _add_reader(self):
+        if not self._closing and not self._reading_paused:
+            self._loop.add_reader(self._fd, self._read_ready)
+
+    def get_extra_info(self, name, default=None):
+        if name == 'serial':
+            return self.serial_port
+        return default
+
+    def is_closing(self):
+        return self._closing
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
+    # 接收
+
+    def _read_ready(self):
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._fatal_error(e)
+            return
+        if not data:
+            # 可读但读不到数据: 设备已断开
+            self._fatal_error(OSError("串口已断开"))
+            return
+        timestamp_ns = time.perf_counter_ns()
+        self.bytes_received += len(data)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_rx(data, timestamp_ns)
+        self._protocol.data_received(data)
+
+    def is_reading(self):
+        return not self._reading_paused and not self._closing
+
+    def pause_reading(self):
+        if self._closing or self._reading_paused:
+            return
+        self._reading_paused = True
+        self._loop.remove_reader(self._fd)
+
+    def resume_reading(self):
+        if self._closing or not self._reading_paused:
+            return
+        self._reading_paused = False
+        self._loop.add_reader(self._fd, self._read_ready)
+
+    # 发送
+
+    def write(self, data):
+        if not data or self._closing:
+            return
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_tx(bytes(data))
+        if not self._buffer:
+            # 缓存为空时先直接写, 写不完的部分等描述符可写
+            try:
+                written = os.write(self._fd, data)
+            except (BlockingIOError, InterruptedError):
+                written = 0
+            except OSError as e:
+                self._fatal_error(e)
+                return
+            self.bytes_sent += written
+            data = memoryview(data)[written:]
+            if not data:
+                return
+            self._loop.add_writer(self._fd, self._write_ready)
+        self._buffer += data
+        self._maybe_pause_protocol()
+
+    def _write_ready(self):
+        try:
+            written = os.write(self._fd, self._buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._loop.remove_writer(self._fd)
+            self._buffer.clear()
+            self._fatal_error(e)
+            return
+        self.bytes_sent += written
+        del self._buffer[:written]
+        self._maybe_resume_protocol()
+        if not self._buffer:
+            self._loop.remove_writer(self._fd)
+            if self._closing:
+                self._call_connection_lost(None)
+
+    def get_write_buffer_size(self):
+        return len(self._buffer)
+
+    def get_write_buffer_limits(self):
+        return self._low_water, self._high_water
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        if high is None:
+            high = HIGH_WATER if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not 0 <= low <= high:
+            raise ValueError(f"高水位 {high} 必须不小于低水位 {low}")
+        self._high_water = high
+        self._low_water = low
+        self._maybe_pause_protocol()
+
+    def _maybe_pause_protocol(self):
+        if len(self._buffer) > self._high_water and not self._protocol_paused:
+            self._protocol_paused = True
+            self._protocol.pause_writing()
+
+    def _maybe_resume_protocol(self):
+        if self._protocol_paused and len(self._buffer) <= self._low_water:
+            self._protocol_paused = False
+            self._protocol.resume_writing()
+
+    def can_write_eof(self):
+        return False
+
+    # 关闭
+
+    def close(self):
+        """写完缓存的数据后关闭串口"""
+        if self._closing:
+            return
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        if not self._buffer:
+            self._loop.call_soon(self._call_connection_lost, None)
+
+    def abort(self):
+        """丢弃缓存的数据立即关闭"""
+        self._abort(None)
+
+    def _fatal_error(self, exc):
+        self._abort(exc)
+
+    def _abort(self, exc):
+        if self._closed:
+            return
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        if self._buffer:
+            self._buffer.clear()
+            self._loop.remove_writer(self._fd)
+        self._loop.call_soon(self._call_connection_lost, exc)
+
+    def _call_connection_lost(self, exc):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            self.serial_port.close()
+
+    def __del__(self):
+        if not self._closed and self.serial_port.is_open:
+            self.serial_port.close()
+
+
+async def create_serial_connection(protocol_factory, port, baudrate=115200, bytesize=8, parity='N', stopbits=1,
+                                   flow_control='N', recorder=None):
+    """打开串口并创建 SerialTransport, 返回 (transport, protocol)
+
+    串口参数与 SerialEngine.open() 相同; 串口没有文件描述符时抛出 ValueError。
+    """
+    loop = asyncio.get_running_loop()
+    serial_port = open_port(port, baudrate, bytesize, parity, stopbits, flow_control, timeout=0)
+    try:
+        serial_port.fileno()
+    except (AttributeError, OSError, ValueError):
+        serial_port.close()
+        raise ValueError(f"{port} 没有文件描述符, 不能用于 asyncio 传输")
+    protocol = protocol_factory()
+    transport = SerialTransport(loop, protocol, serial_port, recorder)
+    return transport, protocol
+
+
+async def open_serial_connection(port, limit=2 ** 16, **kwargs):
+    """打开串口, 返回 (asyncio.StreamReader, asyncio.StreamWriter)
+
+    writer.drain() 在写缓存超过高水位时等待, 串口流控暂停时随之等待。
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=limit, loop=loop)
+    protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+    transport, _ = await create_serial_connection(lambda: protocol, port, **kwargs)
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    return reader, writer
+
+
+class LoopThread(threading.Thread):
+    """在后台线程中运行的 asyncio 事件循环
+
+    供界面等有自己事件循环的程序使用: submit(协程) 在本线程的循环中执行并
+    返回 concurrent.futures.Future, 结果回调需自行转发到界面线程。
+    """
+    def __init__(self):
+        super().__init__(daemon=True, name="asyncio")
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+        # 取消尚未完成的任务后关闭循环
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+
+    def start(self):
+        super().start()
+        self._ready.wait()
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, callback, *args):
+        return self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+class _EchoProtocol(asyncio.Protocol):
+    """把收到的数据原样写回, 关闭时完成 done"""
+    def __init__(self, name, done):
+        self.name = name
+        self.done = done
+        self.transport = None
+        self.count = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.count += len(data)
+        self.transport.write(data)
+
+    def connection_lost(self, exc):
+        print(f"{self.name} 已关闭: {exc or '正常'}, 回显 {self.count} 字节", file=sys.stderr)
+        self.done.set_result(None)
+
+
+async def echo(ports, baudrate=115200):
+    """在一个事件循环中回显多个串口收到的数据, 直到全部关闭"""
+    loop = asyncio.get_running_loop()
+    closed = []
+    for port in ports:
+        done = loop.create_future()
+        await create_serial_connection(lambda: _EchoProtocol(port, done), port, baudrate=baudrate)
+        closed.append(done)
+    await asyncio.gather(*closed)
+
+
+async def _selftest(ports=8, size=256 * 1024):
+    """通过 pty 对测试多个串口在同一个事件循环中的收发、流控和断开"""
+    import tty
+    ok = True
+    peers = []
+    for _ in range(ports):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        os.set_blocking(master, False)
+        peers.append((master, slave, os.ttyname(slave)))
+    connections = [await open_serial_connection(name) for _, _, name in peers]
+    payload = os.urandom(size)
+    loop = asyncio.get_running_loop()
+
+    async def peer_echo(master):
+        # 对端在同一个事件循环中把收到的数据原样写回
+        queue = asyncio.Queue()
+        loop.add_reader(master, lambda: queue.put_nowait(os.read(master, READ_SIZE)))
+        received = 0
+        try:
+            while received < size:
+                data = await queue.get()
+                received += len(data)
+                view = memoryview(data)
+                while view:
+                    try:
+                        view = view[os.write(master, view):]
+                    except BlockingIOError:
+                        await asyncio.sleep(0.001)
+        finally:
+            loop.remove_reader(master)
+
+    async def exchange(reader, writer):
+        async def send():
+            for i in range(0, size, 4096):
+                writer.write(payload[i:i + 4096])
+                await writer.drain()
+        sender = asyncio.ensure_future(send())
+        data = await reader.readexactly(size)
+        await sender
+        return data == payload
+
+    start = time.perf_counter()
+    echoes = [asyncio.ensure_future(peer_echo(master)) for master, _, _ in peers]
+    results = await asyncio.gather(*(exchange(reader, writer) for reader, writer in connections))
+    await asyncio.gather(*echoes)
+    elapsed = time.perf_counter() - start
+    ok &= all(results)
+    print(f"{ports} 个串口 x {size} 字节回环: {'通过' if all(results) else '失败'}, "
+          f"{ports * size / elapsed / 1024 / 1024:.1f} MB/s")
+
+    # 对端关闭后读到 EOF, 传输关闭串口
+    master, slave, _ = peers[0]
+    reader, writer = connections[0]
+    os.close(master)
+    os.close(slave)
+    try:
+        data = await asyncio.wait_for(reader.read(), 2.0)
+        disconnected = data == b'' and writer.transport.is_closing()
+    except (OSError, asyncio.TimeoutError):
+        disconnected = writer.transport.is_closing()
+    ok &= disconnected
+    print(f"对端断开: {'通过' if disconnected else '失败'}")
+    for (master, slave, _), (_, writer) in zip(peers[1:], connections[1:]):
+        writer.close()
+        await writer.wait_closed()
+        os.close(master)
+        os.close(slave)
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="asyncio 串口传输")
+    sub = parser.add_subparsers(dest='command', required=True)
+    echo_parser = sub.add_parser('echo')
+    echo_parser.add_argument('ports', nargs='+')
+    echo_parser.add_argument('-b', '--baudrate', type=int, default=115200)
+    sub.add_parser('selftest')
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'selftest':
+            return 0 if asyncio.run(_selftest()) else 1
+        asyncio.run(echo(args.ports, args.baudrate))
+    except KeyboardInterrupt:
+        pass
+    except (serial.SerialException, ValueError) as e:
+        print(f"无法打开串口: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
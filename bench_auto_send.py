@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""自动发送调度测量: 相对休眠循环 vs PeriodicSender
+
+相对休眠循环模拟旧的 QTimer 自动发送: 每次发送时重新解析十六进制文本,
+然后休眠一个间隔, 解析和唤醒延迟逐次累积。PeriodicSender 只编码一次负载,
+按绝对截止时间发送。两者都通过 loop:// 串口写出。
+
+用法:
+    python bench_auto_send.py [每项秒数]
+"""
+import re
+import sys
+import time
+
+from serial_engine import SerialEngine
+
+HEX_TEXT = "AA 55 01 02 03 04 05 06 07 08 09 0A 0B 0C 0D 0E 0F 10 " * 8
+
+
+def encode(text):
+    """旧版 send_data 的十六进制编码路径"""
+    hex_text = re.sub(r'[^0-9A-Fa-f]', '', text)
+    if len(hex_text) % 2 != 0:
+        hex_text += '0'
+    return bytes.fromhex(hex_text) + b'\r\n'
+
+
+def relative_loop(engine, interval_s, seconds):
+    """每次发送后休眠一个间隔, 返回 (实际频率, 期望频率)"""
+    sent = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        engine.submit(encode(HEX_TEXT))
+        sent += 1
+        time.sleep(interval_s)
+    return sent / (time.perf_counter() - start), 1 / interval_s
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    engine = SerialEngine()
+    engine.open('loop://')
+    print(f"{'间隔':>8} {'相对休眠 实际/目标':>22} {'PeriodicSender 实际/目标':>26} {'p99 延迟':>10} {'跳过':>6}")
+    for interval_ms in (10, 5, 2, 1):
+        interval_s = interval_ms / 1000
+        legacy_hz, target_hz = relative_loop(engine, interval_s, seconds)
+        sender = engine.start_periodic(encode(HEX_TEXT), interval_s)
+        time.sleep(seconds)
+        stats = sender.stats()
+        engine.stop_periodic()
+        print(f"{interval_ms:>6}ms {legacy_hz:>10.1f}/{target_hz:<10.1f} "
+              f"{stats['achieved_hz']:>13.1f}/{stats['target_hz']:<12.1f} "
+              f"{stats['p99_us']:>8.1f}us {stats['skipped']:>6}")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""分帧器微基准
+
+把随机帧编码后按固定块大小切开喂给各个分帧器, 校验切出的帧与原始帧一致,
+输出每种分帧方式的吞吐量。"长帧" 一列把 60KB 的单帧按 16 字节分块送入:
+若分帧器重复扫描缓冲区, 耗时会随帧长平方增长, 吞吐量明显低于短帧。
+
+用法:
+    python bench_deframer.py [帧数] [块大小,...]
+"""
+import os
+import sys
+import random
+import timeit
+
+from deframer import (
+    DelimiterDeframer, FixedLengthDeframer, LengthPrefixDeframer, SlipDeframer, CobsDeframer
+)
+
+LONG_FRAME = 60 * 1024
+
+
+def cases(payloads):
+    """返回 (名称, 分帧器工厂, 编码后的字节流, 期望的帧)"""
+    lines = [payload.replace(b'\n', b'.') for payload in payloads]
+    joined = b''.join(payloads)
+    fixed = joined[:len(joined) // 64 * 64]
+    header = b'\xaa\x55'
+    length_frames = [header + len(payload).to_bytes(2, 'big') + payload for payload in payloads]
+    return [
+        ("delimiter", lambda: DelimiterDeframer(b'\n'), b''.join(line + b'\n' for line in lines), lines),
+        ("fixed", lambda: FixedLengthDeframer(64), fixed, [fixed[i:i + 64] for i in range(0, len(fixed), 64)]),
+        ("length", lambda: LengthPrefixDeframer(length_offset=2, length_size=2, header=header),
+         b''.join(length_frames), length_frames),
+        ("slip", SlipDeframer, b''.join(map(SlipDeframer.encode, payloads)), payloads),
+        ("cobs", CobsDeframer, b''.join(map(CobsDeframer.encode, payloads)), payloads),
+    ]
+
+
+def run(factory, stream, chunk_size):
+    deframer = factory()
+    frames = []
+    for i in range(0, len(stream), chunk_size):
+        frames += deframer.feed(stream[i:i + chunk_size], 0)
+    return [frame[0] for frame in frames]
+
+
+def throughput(factory, stream, chunk_size):
+    elapsed = min(timeit.repeat(lambda: run(factory, stream, chunk_size), number=1, repeat=3))
+    return len(stream) / elapsed / 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    chunk_sizes = [int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else [16, 256, 4096]
+    random.seed(0)
+    payloads = [os.urandom(random.randint(8, 256)) for _ in range(count)]
+    long_streams = {name: stream for name, _, stream, _ in cases([os.urandom(LONG_FRAME)])}
+
+    print(f"{count} 帧, 吞吐量 MB/s")
+    print(f"{'分帧方式':<10}" + ''.join(f"{f'块 {size}':>10}" for size in chunk_sizes) + f"{'长帧':>10}")
+    for name, factory, stream, expected in cases(payloads):
+        for size in chunk_sizes:
+            assert run(factory, stream, size) == expected, (name, size)
+        row = [throughput(factory, stream, size) for size in chunk_sizes]
+        row.append(throughput(factory, long_streams[name], 16))
+        print(f"{name:<14}" + ''.join(f"{value:10.1f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""实时曲线抽取基准: DecimatingRing.envelope vs 逐个采样扫描
+
+向 DecimatingRing 写入 N 个采样(报告写入速率), 再对整个窗口按给定像素宽度
+求 min/max 包络。逐个采样扫描的耗时随 N 线性增长, envelope() 的耗时只随宽度
+变化; 两者的全局最小值和最大值一致。
+
+用法:
+    python bench_plot.py [宽度] [采样数,...]
+"""
+import sys
+import math
+import random
+import timeit
+
+from plot_data import DecimatingRing
+
+
+def naive_envelope(times, values, start_ns, end_ns, width):
+    """逐个采样扫描的参考实现"""
+    columns = {}
+    scale = width / (end_ns - start_ns)
+    for timestamp, value in zip(times, values):
+        if start_ns <= timestamp < end_ns:
+            column = min(int((timestamp - start_ns) * scale), width - 1)
+            low, high = columns.get(column, (value, value))
+            columns[column] = (min(low, value), max(high, value))
+    return [(column, low, high) for column, (low, high) in sorted(columns.items())]
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    counts = [int(n) for n in sys.argv[2].split(',')] if len(sys.argv) > 2 else [10_000, 100_000, 1_000_000]
+    random.seed(0)
+    print(f"宽度 {width} 像素")
+    print(f"{'采样数':>10}{'写入 采样/秒':>16}{'逐个扫描 ms':>14}{'envelope ms':>14}{'读取项数':>10}")
+    for count in counts:
+        ring = DecimatingRing(capacity=1 << max(count - 1, 1).bit_length())
+        times = [i * 1000 for i in range(count)]
+        values = [math.sin(i / 500) + random.gauss(0, 0.1) for i in range(count)]
+        elapsed = timeit.timeit(lambda: [ring.append(t, v) for t, v in zip(times, values)], number=1)
+        start_ns, end_ns = 0, count * 1000
+        naive = min(timeit.repeat(lambda: naive_envelope(times, values, start_ns, end_ns, width),
+                                  number=1, repeat=3))
+        fast = min(timeit.repeat(lambda: ring.envelope(start_ns, end_ns, width), number=1, repeat=5))
+        envelope = ring.envelope(start_ns, end_ns, width)
+        expected = naive_envelope(times, values, start_ns, end_ns, width)
+        assert min(low for _, low, _ in envelope) == min(low for _, low, _ in expected)
+        assert max(high for _, _, high in envelope) == max(high for _, _, high in expected)
+        level = 0
+        while level + 1 < ring.levels and ring.factor ** (level + 1) * width <= count:
+            level += 1
+        print(f"{count:>13}{count / elapsed:>16.0f}{naive * 1000:>14.1f}{fast * 1000:>14.2f}"
+              f"{count // ring.factor ** level:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""接收延迟测量: 通过 pty 回环比较旧的 10ms 轮询与事件驱动的 SerialReader
+
+仅支持 Linux/macOS。用法:
+    python bench_rx_latency.py [样本数]
+"""
+import os
+import sys
+import time
+import random
+import threading
+
+import serial
+
+from serial_engine import SerialReader
+
+
+class PollingReader(threading.Thread):
+    """旧版接收循环: 检查 in_waiting 后休眠 10ms"""
+    def __init__(self, serial_port, callback):
+        super().__init__(daemon=True)
+        self.serial_port = serial_port
+        self.callback = callback
+        self.running = True
+
+    def run(self):
+        while self.running:
+            if self.serial_port.in_waiting:
+                data = self.serial_port.read(self.serial_port.in_waiting)
+                self.callback(data)
+            time.sleep(0.01)
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+
+def open_pty_pair():
+    """创建 pty 对, 返回 (主端描述符, 打开的从端串口)"""
+    master, slave = os.openpty()
+    port = serial.Serial(os.ttyname(slave), baudrate=115200, timeout=0)
+    os.close(slave)
+    return master, port
+
+
+def measure(master, samples, on_data_event):
+    """逐字节写入主端, 测量从写入到接收回调的延迟(微秒)"""
+    latencies = []
+    for _ in range(samples):
+        on_data_event.clear()
+        t0 = time.perf_counter()
+        os.write(master, b'\x55')
+        if not on_data_event.wait(1.0):
+            continue
+        latencies.append((on_data_event.timestamp - t0) * 1e6)
+        time.sleep(random.uniform(0.001, 0.02))
+    return latencies
+
+
+def idle_cpu(seconds):
+    """测量空闲期间进程消耗的 CPU 时间(毫秒)"""
+    start = time.process_time()
+    time.sleep(seconds)
+    return (time.process_time() - start) * 1000
+
+
+def summarize(name, latencies, cpu_ms):
+    latencies.sort()
+    n = len(latencies)
+    if not n:
+        print(f"{name:<12} 无数据")
+        return
+    p50 = latencies[n // 2]
+    p99 = latencies[min(n - 1, int(n * 0.99))]
+    mean = sum(latencies) / n
+    print(f"{name:<12} n={n:<5} mean={mean:8.1f}us p50={p50:8.1f}us "
+          f"p99={p99:8.1f}us max={latencies[-1]:8.1f}us 空闲CPU={cpu_ms:6.1f}ms/2s")
+
+
+class _Event(threading.Event):
+    timestamp = 0.0
+
+    def fire(self, _data, _timestamp_ns=None):
+        self.timestamp = time.perf_counter()
+        self.set()
+
+
+def main():
+    if not hasattr(os, 'openpty'):
+        print("此测量需要 pty 支持 (Linux/macOS)")
+        return
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # 旧版轮询
+    master, port = open_pty_pair()
+    event = _Event()
+    reader = PollingReader(port, event.fire)
+    reader.start()
+    latencies = measure(master, samples, event)
+    cpu_ms = idle_cpu(2.0)
+    reader.stop()
+    port.close()
+    os.close(master)
+    summarize("轮询 10ms", latencies, cpu_ms)
+
+    # 事件驱动
+    for policy in (SerialReader.WAKE_IMMEDIATE, SerialReader.WAKE_BATCH):
+        master, port = open_pty_pair()
+        event = _Event()
+        # 回调在接收线程中记录时间, 不包含 GUI 事件循环的开销
+        thread = SerialReader(port, wake_policy=policy, on_data=event.fire)
+        thread.start()
+        time.sleep(0.05)
+        latencies = measure(master, samples, event)
+        cpu_ms = idle_cpu(2.0)
+        thread.stop()
+        port.close()
+        os.close(master)
+        summarize(policy, latencies, cpu_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""吞吐量和延迟基准测试套件
+
+驱动真实的接收和发送路径: 引擎层的 SerialReader / SerialWriter, 以及离屏
+Qt 平台下主窗口的 drain_receive_buffer / append_received_data / send_data。
+传输方式为 pyserial 的 loop:// 和 pty 对(仅 Linux/macOS), 在界面支持的每个
+常用波特率(按 波特率/10 字节每秒限速)和不限速下各运行一次。
+
+每个用例输出一行 JSON 到标准输出(或 --json 指定的文件), 便于跟踪回归:
+    suite       engine、asyncio (async_serial.SerialTransport, 仅 pty) 或 gui
+    transport   loop 或 pty
+    direction   rx(对端发送, 本端接收)、tx(本端发送, 对端接收)或 loopback
+    baudrate    限速的波特率, 不限速时为 null
+    bytes_per_s 测量时长内接收到的字节数 / 时长
+    lag_p99_ms / lag_max_ms   界面事件循环延迟(10ms 定时器的迟到量), 引擎用例为 null
+    rss_growth_kb             用例前后常驻内存的增长
+第一行为 type=meta 的环境信息。人可读的汇总写入标准错误。
+
+用法:
+    python bench_suite.py [--duration 2] [--rates 9600,115200] [--no-gui] [--json results.jsonl]
+"""
+import os
+import gc
+import sys
+import json
+import time
+import select
+import argparse
+import platform
+import tempfile
+import threading
+
+import serial
+
+from serial_engine import SerialEngine, TxQueueFull, COMMON_BAUDRATES
+
+CHUNK_SIZE = 4096
+
+
+def rss_kb():
+    """返回当前常驻内存(KB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # 无 /proc 时退回到峰值常驻内存, macOS 上单位为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Pacer:
+    """按目标速率分块产生数据; rate 为 0 时不限速"""
+    def __init__(self, rate, chunk_size=CHUNK_SIZE):
+        self.rate = rate
+        # 限速时每块约 10ms 的数据, 避免低波特率下一块就超过测量时长
+        self.chunk = bytes(range(256)) * (chunk_size // 256)
+        if rate:
+            self.chunk = self.chunk[:max(1, min(chunk_size, rate // 100))]
+        self.start = time.perf_counter()
+        self.produced = 0
+
+    def due(self):
+        """返回现在应发出的一块数据, 尚未到时间时返回 None"""
+        if self.rate and self.produced > (time.perf_counter() - self.start) * self.rate:
+            return None
+        self.produced += len(self.chunk)
+        return self.chunk
+
+    def delay(self):
+        """距下一块到期的秒数"""
+        if not self.rate:
+            return 0.0
+        return max(0.0, self.produced / self.rate - (time.perf_counter() - self.start))
+
+
+class PtyPeer:
+    """pty 主端: 在后台线程中按速率写入或读取计数"""
+    def __init__(self, rate=0, write=False):
+        self.master, slave = os.openpty()
+        import tty
+        tty.setraw(self.master)
+        self.name = os.ttyname(slave)
+        self._slave = slave
+        self.rate = rate
+        self.write = write
+        self.bytes = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        if self.write:
+            pacer = Pacer(self.rate)
+            while not self._stopped.is_set():
+                chunk = pacer.due()
+                if chunk is None:
+                    time.sleep(min(pacer.delay(), 0.01))
+                    continue
+                _, writable, _ = select.select([], [self.master], [], 0.1)
+                if writable:
+                    self.bytes += os.write(self.master, chunk)
+        else:
+            while not self._stopped.is_set():
+                readable, _, _ = select.select([self.master], [], [], 0.1)
+                if readable:
+                    try:
+                        self.bytes += len(os.read(self.master, 65536))
+                    except OSError:
+                        return
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self._slave)
+
+
+def result(suite, transport, direction, rate, duration, sent, received, window_bytes,
+           lag=None, dropped=0, rss_before=0):
+    """组装一条结果记录"""
+    lag = sorted(lag) if lag else []
+    n = len(lag)
+    gc.collect()
+    return {
+        'type': 'result',
+        'suite': suite,
+        'transport': transport,
+        'direction': direction,
+        'baudrate': rate * 10 if rate else None,
+        'duration_s': round(duration, 3),
+        'target_bytes_per_s': rate or None,
+        'bytes_per_s': round(window_bytes / duration, 1) if duration else 0,
+        'bytes_sent': sent,
+        'bytes_received': received,
+        'bytes_dropped': dropped,
+        'lag_p99_ms': round(lag[min(n - 1, int(n * 0.99))] * 1000, 3) if n else None,
+        'lag_max_ms': round(lag[-1] * 1000, 3) if n else None,
+        'rss_growth_kb': rss_kb() - rss_before,
+    }
+
+
+def wait_drained(get_count, settle=0.3, limit=5.0):
+    """等待计数在 settle 秒内不再变化"""
+    deadline = time.monotonic() + limit
+    last = get_count()
+    while time.monotonic() < deadline:
+        time.sleep(settle)
+        current = get_count()
+        if current == last:
+            return
+        last = current
+
+
+def run_engine(transport, direction, rate, duration):
+    """引擎层用例: SerialReader 接收回调计数, SerialWriter 发送"""
+    rss_before = rss_kb()
+    received = [0]
+
+    def on_data(data, _timestamp_ns):
+        received[0] += len(data)
+
+    engine = SerialEngine()
+    peer = None
+    if transport == 'loop':
+        engine.open('loop://', baudrate=(rate or 0) * 10 or 921600)
+    else:
+        peer = PtyPeer(rate, write=direction == 'rx')
+        engine.open(peer.name, baudrate=(rate or 0) * 10 or 921600)
+    engine.add_listener(on_data)
+
+    def count():
+        return peer.bytes if direction == 'tx' else received[0]
+
+    start = time.perf_counter()
+    if peer:
+        peer.start()
+    sent = 0
+    if direction in ('tx', 'loopback'):
+        pacer = Pacer(rate)
+        while time.perf_counter() - start < duration:
+            chunk = pacer.due()
+            if chunk is None:
+                time.sleep(min(pacer.delay(), 0.01))
+                continue
+            try:
+                engine.submit(chunk, background=True)
+                sent += len(chunk)
+            except TxQueueFull:
+                pacer.produced -= len(chunk)
+                time.sleep(0.0005)
+    else:
+        time.sleep(duration)
+    window_bytes = count()
+    elapsed = time.perf_counter() - start
+    if peer and direction == 'rx':
+        peer.stop()
+        sent = peer.bytes
+    wait_drained(count)
+    record = result('engine', transport, direction, rate, elapsed, sent, count(), window_bytes,
+                    rss_before=rss_before)
+    engine.close()
+    if peer:
+        peer.close()
+    return record
+
+
+def run_asyncio(transport, direction, rate, duration):
+    """asyncio 用例: SerialTransport 在事件循环中收发, 没有接收和发送线程"""
+    import asyncio
+    from async_serial import create_serial_connection
+
+    rss_before = rss_kb()
+    peer = PtyPeer(rate, write=direction == 'rx')
+
+    class Counter(asyncio.Protocol):
+        received = 0
+
+        def data_received(self, data):
+            self.received += len(data)
+
+    async def run():
+        connection, protocol = await create_serial_connection(Counter, peer.name, baudrate=(rate or 0) * 10 or 921600)
+
+        def count():
+            return peer.bytes if direction == 'tx' else protocol.received
+
+        start = time.perf_counter()
+        peer.start()
+        sent = 0
+        pacer = Pacer(rate)
+        while time.perf_counter() - start < duration:
+            if direction == 'rx':
+                await asyncio.sleep(0.05)
+                continue
+            chunk = pacer.due()
+            if chunk is None:
+                await asyncio.sleep(min(pacer.delay(), 0.01))
+                continue
+            connection.write(chunk)
+            sent += len(chunk)
+            # 写缓存超过高水位时让出事件循环, 等描述符可写
+            while connection.get_write_buffer_size() > connection.get_write_buffer_limits()[1]:
+                await asyncio.sleep(0.0005)
+        window_bytes = count()
+        elapsed = time.perf_counter() - start
+        if direction == 'rx':
+            peer.stop()
+            sent = peer.bytes
+        last = -1
+        while count() != last:
+            last = count()
+            await asyncio.sleep(0.3)
+        connection.close()
+        return elapsed, sent, count(), window_bytes
+
+    elapsed, sent, received, window_bytes = asyncio.run(run())
+    peer.close()
+    return result('asyncio', transport, direction, rate, elapsed, sent, received, window_bytes,
+                  rss_before=rss_before)
+
+
+class GuiBench:
+    """离屏主窗口用例: 接收经环形缓冲区和 append_received_data 显示, 发送经 send_data"""
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        # 设置和数据帧库写入临时目录, 不影响用户的配置
+        self.directory = tempfile.mkdtemp(prefix='bench_')
+        os.environ['XDG_DATA_HOME'] = self.directory
+        os.environ['LOCALAPPDATA'] = self.directory
+        from PyQt5.QtCore import Qt, QSettings, QTimer
+        from PyQt5.QtWidgets import QApplication
+        QSettings.setPath(QSettings.IniFormat, QSettings.UserScope, self.directory)
+        QSettings.setPath(QSettings.NativeFormat, QSettings.UserScope, self.directory)
+        self.QTimer = QTimer
+        self.precise = Qt.PreciseTimer
+        self.app = QApplication.instance() or QApplication([sys.argv[0]])
+        import main
+        self.window = main.SerialMonitor()
+        self.window.port_timer.stop()
+
+    def run(self, transport, direction, rate, duration):
+        window = self.window
+        app = self.app
+        rss_before = rss_kb()
+        peer = None
+        port = 'loop://'
+        if transport == 'pty':
+            peer = PtyPeer(rate, write=direction == 'rx')
+            port = peer.name
+        window.port_combo.clear()
+        window.port_combo.addItem(port, port)
+        baudrate = (rate or 0) * 10 or COMMON_BAUDRATES[-1]
+        index = window.baudrate_combo.findData(baudrate)
+        window.baudrate_combo.setCurrentIndex(max(index, 0))
+        window.clear_receive()
+        window.open_serial()
+        if not window.engine.is_open:
+            raise RuntimeError(f"无法打开 {port}")
+
+        def count():
+            return peer.bytes if direction == 'tx' else window.received_bytes_count
+
+        # 事件循环延迟: 10ms 定时器相邻两次触发间隔超出 10ms 的部分
+        lag = []
+        last_tick = [time.perf_counter()]
+
+        def tick():
+            now = time.perf_counter()
+            lag.append(max(0.0, now - last_tick[0] - 0.01))
+            last_tick[0] = now
+
+        ticker = self.QTimer()
+        ticker.setTimerType(self.precise)
+        ticker.timeout.connect(tick)
+
+        # 发送: 在界面线程中按速率调用 send_data, 与用户点击发送走同一路径
+        pacer = Pacer(rate)
+        sent = [0]
+
+        def send_tick():
+            while True:
+                chunk = pacer.due()
+                if chunk is None:
+                    return
+                window.send_payload = chunk
+                depth = window.engine.writer.depth if window.engine.writer else 0
+                if depth >= 64:
+                    pacer.produced -= len(chunk)
+                    return
+                window.send_data()
+                sent[0] += len(chunk)
+                if not rate:
+                    return
+
+        sender = self.QTimer()
+        sender.timeout.connect(send_tick)
+        window_bytes = [0]
+
+        def finish():
+            window_bytes[0] = count()
+            # 之后的排空阶段会阻塞事件循环, 不计入延迟
+            ticker.stop()
+            app.quit()
+
+        start = time.perf_counter()
+        if peer:
+            peer.start()
+        ticker.start(10)
+        if direction in ('tx', 'loopback'):
+            sender.start(0 if not rate else 5)
+        self.QTimer.singleShot(int(duration * 1000), finish)
+        app.exec_()
+        elapsed = time.perf_counter() - start
+        sender.stop()
+        if peer and direction == 'rx':
+            peer.stop()
+            sent[0] = peer.bytes
+
+        # 让剩余数据显示完
+        def drained_count():
+            app.processEvents()
+            return count()
+
+        wait_drained(drained_count, settle=0.2)
+        dropped = window.rx_buffer.dropped
+        record = result('gui', transport, direction, rate, elapsed, sent[0], drained_count(), window_bytes[0],
+                        lag=lag, dropped=dropped, rss_before=rss_before)
+        window.close_serial()
+        window.send_payload = None
+        if peer:
+            peer.close()
+        return record
+
+
+def describe(record):
+    rate = f"{record['baudrate']}" if record['baudrate'] else "不限速"
+    lag = (f" 延迟p99 {record['lag_p99_ms']:.2f}ms 最大 {record['lag_max_ms']:.2f}ms"
+           if record['lag_p99_ms'] is not None else "")
+    return (f"{record['suite']:<7} {record['transport']:<4} {record['direction']:<8} {rate:>7} "
+            f"{record['bytes_per_s'] / 1024:>10.1f} KB/s  收 {record['bytes_received']:>10} / 发 {record['bytes_sent']:>10}"
+            f"  丢弃 {record['bytes_dropped']}{lag}  内存 {record['rss_growth_kb']:+}KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口收发基准测试")
+    parser.add_argument('--duration', type=float, default=2.0, help="每个用例的测量时长(秒)")
+    parser.add_argument('--rates', help="逗号分隔的波特率, 默认使用界面的常用波特率")
+    parser.add_argument('--no-gui', action='store_true', help="只运行引擎层用例")
+    parser.add_argument('--no-pty', action='store_true', help="不使用 pty 对")
+    parser.add_argument('--json', metavar='FILE', help="结果写入文件而不是标准输出")
+    args = parser.parse_args()
+
+    rates = [int(r) for r in args.rates.split(',')] if args.rates else COMMON_BAUDRATES
+    # 8N1 每字节 10 位; 0 表示不限速
+    byte_rates = [baudrate // 10 for baudrate in rates] + [0]
+    transports = [('loop', 'loopback')]
+    if hasattr(os, 'openpty') and not args.no_pty:
+        transports += [('pty', 'rx'), ('pty', 'tx')]
+
+    output = open(args.json, 'w', encoding='utf-8') if args.json else sys.stdout
+
+    def emit(record):
+        output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        output.flush()
+
+    emit({
+        'type': 'meta',
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pyserial': serial.__version__,
+        'duration_s': args.duration,
+    })
+    suites = [('engine', run_engine)]
+    if hasattr(os, 'openpty') and not args.no_pty:
+        suites.append(('asyncio', run_asyncio))
+    if not args.no_gui:
+        suites.append(('gui', GuiBench().run))
+    try:
+        for name, run in suites:
+            for transport, direction in transports:
+                # asyncio 传输需要文件描述符, 不支持 loop://
+                if name == 'asyncio' and transport != 'pty':
+                    continue
+                for rate in byte_rates:
+                    record = run(transport, direction, rate, args.duration)
+                    emit(record)
+                    print(describe(record), file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""串口数据捕获文件
+
+二进制捕获文件格式(小端):
+    文件头: 魔数 b'SMCAP\\x00\\x00\\x01', 版本(u16), 保留(u16),
+            perf_counter_ns 到墙上时间的差值(i64), 开始录制时的 perf_counter_ns(i64)
+    记录:   采集时间戳 perf_counter_ns(i64), 方向(u8, 0=RX 1=TX), 负载长度(u32), 负载
+
+记录按块缓冲写入, 每写出一块在同名的 .idx 索引文件中追加一条索引:
+    块在捕获文件中的偏移(u64), 块内第一条记录的时间戳(i64),
+    块内第一条记录的序号(u64), 块起始处 RX 数据流的累计字节数(u64)
+索引按偏移和时间单调递增, 可二分查找定位到任意时间或数据偏移。
+
+CaptureReader 以内存映射方式打开捕获文件, 只在访问时按块读取记录, 打开
+数 GB 的文件也只需映射文件和索引。
+"""
+import os
+import mmap
+import time
+import struct
+import threading
+
+CAPTURE_MAGIC = b'SMCAP\x00\x00\x01'
+CAPTURE_VERSION = 1
+CAPTURE_SUFFIX = '.smcap'
+INDEX_SUFFIX = '.idx'
+
+FILE_HEADER = struct.Struct('<8sHHqq')
+RECORD_HEADER = struct.Struct('<qBI')
+INDEX_ENTRY = struct.Struct('<QqQQ')
+
+DIRECTION_RX = 0
+DIRECTION_TX = 1
+
+
+def index_path_for(path):
+    """返回捕获文件对应的索引文件路径"""
+    return path + INDEX_SUFFIX
+
+
+class CaptureWriter:
+    """流式捕获写入器
+
+    record() 可在接收线程和发送端同时调用, 记录追加到内存块中, 块满
+    block_size 字节时写入磁盘并追加一条索引。后台线程每 flush_interval 秒把
+    未满的块也写出, 低速时数据同样能及时落盘。
+    """
+    def __init__(self, path, block_size=64 * 1024, flush_interval=1.0):
+        self.path = path
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self._file = open(path, 'wb')
+        self._index_file = open(index_path_for(path), 'wb')
+        self._file.write(FILE_HEADER.pack(
+            CAPTURE_MAGIC, CAPTURE_VERSION, 0,
+            time.time_ns() - time.perf_counter_ns(), time.perf_counter_ns()
+        ))
+        self._block = bytearray()
+        self._block_first_ts = 0
+        self._block_first_record = 0
+        self._block_rx_offset = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def record(self, direction, data, timestamp_ns=None):
+        """追加一条记录"""
+        if not data:
+            return
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        with self._lock:
+            if self._closed.is_set():
+                return
+            if not self._block:
+                self._block_first_ts = timestamp_ns
+                self._block_first_record = self.records
+                self._block_rx_offset = self.rx_bytes
+            self._block += RECORD_HEADER.pack(timestamp_ns, direction, len(data))
+            self._block += data
+            self.records += 1
+            if direction == DIRECTION_RX:
+                self.rx_bytes += len(data)
+            else:
+                self.tx_bytes += len(data)
+            if len(self._block) >= self.block_size:
+                self._write_block()
+
+    def record_rx(self, data, timestamp_ns=None):
+        self.record(DIRECTION_RX, data, timestamp_ns)
+
+    def record_tx(self, data, timestamp_ns=None):
+        self.record(DIRECTION_TX, data, timestamp_ns)
+
+    def _write_block(self):
+        """写出当前块并追加索引, 调用时需持有锁"""
+        if not self._block:
+            return
+        self._index_file.write(INDEX_ENTRY.pack(
+            self._file.tell(), self._block_first_ts, self._block_first_record, self._block_rx_offset
+        ))
+        self._file.write(self._block)
+        self._block = bytearray()
+
+    def flush(self):
+        """写出未满的块并刷新到操作系统"""
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._write_block()
+            self._file.flush()
+            self._index_file.flush()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    @property
+    def size(self):
+        """已写入的字节数(含未写出的块)"""
+        return self._file.tell() + len(self._block)
+
+    def close(self):
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._write_block()
+            self._closed.set()
+            self._file.close()
+            self._index_file.close()
+        self._flusher.join()
+
+
+class CaptureFormatError(Exception):
+    """捕获文件格式错误"""
+
+
+class CaptureReader:
+    """内存映射的捕获文件读取器
+
+    记录按块访问: block_count 为块数, iter_block_records(i) 逐条返回第 i 块中
+    的记录。find_block_by_time() / find_block_by_rx_offset() 在索引上二分查找,
+    复杂度 O(log n)。索引文件缺失或与捕获文件不一致(录制中断、索引过期)时
+    扫描一遍捕获文件在内存中重建索引, block_size 为重建时的块大小。
+    """
+    def __init__(self, path, block_size=64 * 1024):
+        self.path = path
+        self._index = None
+        self._index_file = None
+        self._file = open(path, 'rb')
+        self.file_size = os.fstat(self._file.fileno()).st_size
+        if self.file_size < FILE_HEADER.size:
+            self._file.close()
+            raise CaptureFormatError("文件太短, 不是捕获文件")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.clock_offset_ns, self.start_ns = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            self.close()
+            raise CaptureFormatError("不支持的捕获文件格式")
+        self._index = self._load_index(block_size)
+        self.block_count = len(self._index) // INDEX_ENTRY.size
+
+    def _load_index(self, block_size):
+        """映射索引文件; 缺失或与捕获文件不一致时重建"""
+        path = index_path_for(self.path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if size and size % INDEX_ENTRY.size == 0:
+            self._index_file = open(path, 'rb')
+            index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._index_matches(index, size, block_size):
+                return index
+            index.close()
+            self._index_file.close()
+            self._index_file = None
+        return self.rebuild_index(block_size)
+
+    def _index_matches(self, index, size, block_size):
+        """索引的第一块从文件头之后开始, 最后一块的记录恰好结束在文件末尾
+
+        块在超过 block_size 的那条记录之后结束, 最后一块更长说明索引缺少之后
+        写出的块。
+        """
+        last_offset = INDEX_ENTRY.unpack_from(index, size - INDEX_ENTRY.size)[0]
+        if INDEX_ENTRY.unpack_from(index, 0)[0] != FILE_HEADER.size or last_offset >= self.file_size:
+            return False
+        end = last_offset
+        last_record = last_offset
+        for position, _, _, length in self._scan(last_offset, self.file_size):
+            last_record = position
+            end = position + RECORD_HEADER.size + length
+        return end == self.file_size and last_record - last_offset < block_size
+
+    def rebuild_index(self, block_size=64 * 1024):
+        """顺序扫描捕获文件, 每 block_size 字节生成一条索引"""
+        index = bytearray()
+        position = FILE_HEADER.size
+        block_start = None
+        records = 0
+        rx_offset = 0
+        for position, timestamp_ns, direction, length in self._scan(position, self.file_size):
+            if block_start is None or position - block_start >= block_size:
+                block_start = position
+                index += INDEX_ENTRY.pack(position, timestamp_ns, records, rx_offset)
+            records += 1
+            if direction == DIRECTION_RX:
+                rx_offset += length
+        return index
+
+    def _scan(self, start, end):
+        """逐条返回 [start, end) 中的记录头 (偏移, 时间戳, 方向, 负载长度)
+
+        末尾不完整的记录(录制中断)被忽略。
+        """
+        header_size = RECORD_HEADER.size
+        position = start
+        while position + header_size <= end:
+            timestamp_ns, direction, length = RECORD_HEADER.unpack_from(self._map, position)
+            if position + header_size + length > self.file_size:
+                return
+            yield position, timestamp_ns, direction, length
+            position += header_size + length
+
+    def block_entry(self, block):
+        """返回第 block 块的索引 (文件偏移, 首条时间戳, 首条记录序号, RX 累计字节数)"""
+        return INDEX_ENTRY.unpack_from(self._index, block * INDEX_ENTRY.size)
+
+    def block_end(self, block):
+        if block + 1 < self.block_count:
+            return self.block_entry(block + 1)[0]
+        return self.file_size
+
+    def iter_block_records(self, block):
+        """逐条返回第 block 块中的记录 (时间戳, 方向, 负载)"""
+        header_size = RECORD_HEADER.size
+        for position, timestamp_ns, direction, length in self._scan(self.block_entry(block)[0], self.block_end(block)):
+            start = position + header_size
+            yield timestamp_ns, direction, self._map[start:start + length]
+
+    def _bisect(self, column, value):
+        """返回索引中 column 列 <= value 的最后一块, 不存在时返回 0"""
+        low, high = 0, self.block_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.block_entry(middle)[column] <= value:
+                low = middle + 1
+            else:
+                high = middle
+        return max(low - 1, 0)
+
+    def find_block_by_time(self, timestamp_ns):
+        """返回包含 timestamp_ns 时刻记录的块"""
+        return self._bisect(1, timestamp_ns)
+
+    def find_block_by_rx_offset(self, rx_offset):
+        """返回包含 RX 数据流第 rx_offset 字节的块"""
+        return self._bisect(3, rx_offset)
+
+    @property
+    def end_time(self):
+        """最后一条记录的时间戳"""
+        last = self.start_ns
+        if self.block_count:
+            for timestamp_ns, _, _ in self.iter_block_records(self.block_count - 1):
+                last = timestamp_ns
+        return last
+
+    def close(self):
+        if isinstance(self._index, mmap.mmap):
+            self._index.close()
+        if self._index_file:
+            self._index_file.close()
+        self._map.close()
+        self._file.close()
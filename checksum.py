@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""校验和与 CRC
+
+按查表法计算的 CRC-8/16/32 (参数采用 Rocksoft 模型: width, poly, init,
+refin, refout, xorout, 各算法的参数和 check 值与 CRC RevEng 目录一致), 以及
+字节累加和、异或和 LRC。CRC-32、CRC-16/XMODEM 和 CRC-16/IBM-3740 直接使用
+zlib / binascii 的 C 实现, 其余 CRC 每字节一次查表。
+
+每个算法都有 append(data) 在数据末尾追加校验值, verify(frame) 检查帧末尾
+的校验值。校验值的字节序默认跟随算法: 反射(refin)算法低字节在前(如
+Modbus), 其余高字节在前; parse_checksum('CRC-16/XMODEM:le') 可以覆盖。
+"""
+import zlib
+import binascii
+from functools import reduce
+from operator import xor
+
+
+def _reflect(value, width):
+    result = 0
+    for _ in range(width):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+class Checksum:
+    """校验算法基类, 子类实现 compute(data) 返回整数校验值"""
+    def __init__(self, name, width, byteorder='big'):
+        self.name = name
+        self.width = width
+        self.size = width // 8
+        self.byteorder = byteorder
+
+    def compute(self, data):
+        raise NotImplementedError
+
+    def digest(self, data):
+        """校验值按字节序编码后的字节"""
+        return self.compute(data).to_bytes(self.size, self.byteorder)
+
+    def append(self, data):
+        return bytes(data) + self.digest(data)
+
+    def verify(self, frame, offset=0):
+        """frame 末尾为校验值, 校验范围从 offset 开始到校验值之前"""
+        if len(frame) < offset + self.size:
+            return False
+        body = memoryview(frame)[offset:len(frame) - self.size]
+        return self.digest(body) == bytes(frame[len(frame) - self.size:])
+
+    @property
+    def key(self):
+        """区分算法和校验值字节序, 用作已追加校验值的数据的缓存键"""
+        return self.name, self.byteorder
+
+    def with_byteorder(self, byteorder):
+        """返回校验值字节序不同的同一算法"""
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other.byteorder = byteorder
+        return other
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class Crc(Checksum):
+    """查表法 CRC, 表在第一次计算时生成"""
+    def __init__(self, name, width, poly, init, refin, refout, xorout, check):
+        super().__init__(name, width, 'little' if refin else 'big')
+        self.poly = poly
+        self.init = init
+        self.refin = refin
+        self.refout = refout
+        self.xorout = xorout
+        self.check = check
+        self.mask = (1 << width) - 1
+        self._table = None
+
+    def table(self):
+        if self._table is None:
+            width = self.width
+            table = []
+            if self.refin:
+                poly = _reflect(self.poly, width)
+                for byte in range(256):
+                    crc = byte
+                    for _ in range(8):
+                        crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+                    table.append(crc)
+            else:
+                top = 1 << (width - 1)
+                for byte in range(256):
+                    crc = byte << (width - 8)
+                    for _ in range(8):
+                        crc = ((crc << 1) ^ self.poly) & self.mask if crc & top else (crc << 1) & self.mask
+                    table.append(crc)
+            self._table = table
+        return self._table
+
+    def compute(self, data):
+        table = self.table()
+        if self.refin:
+            crc = _reflect(self.init, self.width)
+            for byte in data:
+                crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+            if not self.refout:
+                crc = _reflect(crc, self.width)
+        else:
+            crc = self.init
+            shift = self.width - 8
+            mask = self.mask
+            for byte in data:
+                crc = table[((crc >> shift) ^ byte) & 0xFF] ^ ((crc << 8) & mask)
+            if self.refout:
+                crc = _reflect(crc, self.width)
+        return crc ^ self.xorout
+
+
+class _Crc32(Crc):
+    """CRC-32/ISO-HDLC, 使用 zlib.crc32"""
+    def compute(self, data):
+        return zlib.crc32(data)
+
+
+class _CrcHqx(Crc):
+    """poly 0x1021 不反射、xorout 为 0 的 CRC-16, 使用 binascii.crc_hqx"""
+    def compute(self, data):
+        return binascii.crc_hqx(data, self.init)
+
+
+class Sum(Checksum):
+    """字节累加和, 取低 width 位"""
+    def __init__(self, name, width=8):
+        super().__init__(name, width)
+        self.mask = (1 << width) - 1
+
+    def compute(self, data):
+        return sum(data) & self.mask
+
+
+class Lrc(Checksum):
+    """LRC (Modbus ASCII): 字节累加和的补码"""
+    def __init__(self, name='LRC'):
+        super().__init__(name, 8)
+
+    def compute(self, data):
+        return -sum(data) & 0xFF
+
+
+class Xor(Checksum):
+    """所有字节的异或"""
+    def __init__(self, name='XOR8'):
+        super().__init__(name, 8)
+
+    def compute(self, data):
+        return reduce(xor, data, 0)
+
+
+CHECKSUMS = {}
+
+
+def _register(checksum, *aliases):
+    for name in (checksum.name,) + aliases:
+        CHECKSUMS[name.upper()] = checksum
+
+
+_register(Crc('CRC-8/SMBUS', 8, 0x07, 0x00, False, False, 0x00, 0xF4), 'CRC-8')
+_register(Crc('CRC-8/MAXIM-DOW', 8, 0x31, 0x00, True, True, 0x00, 0xA1), 'CRC-8/MAXIM')
+_register(Crc('CRC-8/ROHC', 8, 0x07, 0xFF, True, True, 0x00, 0xD0))
+_register(Crc('CRC-16/MODBUS', 16, 0x8005, 0xFFFF, True, True, 0x0000, 0x4B37), 'MODBUS')
+_register(_CrcHqx('CRC-16/IBM-3740', 16, 0x1021, 0xFFFF, False, False, 0x0000, 0x29B1),
+          'CRC-16/CCITT-FALSE', 'CCITT')
+_register(_CrcHqx('CRC-16/XMODEM', 16, 0x1021, 0x0000, False, False, 0x0000, 0x31C3))
+_register(Crc('CRC-16/KERMIT', 16, 0x1021, 0x0000, True, True, 0x0000, 0x2189), 'CRC-16/CCITT')
+_register(Crc('CRC-16/IBM-SDLC', 16, 0x1021, 0xFFFF, True, True, 0xFFFF, 0x906E), 'CRC-16/X-25')
+_register(Crc('CRC-16/ARC', 16, 0x8005, 0x0000, True, True, 0x0000, 0xBB3D), 'CRC-16')
+_register(Crc('CRC-16/USB', 16, 0x8005, 0xFFFF, True, True, 0xFFFF, 0xB4C8))
+_register(_Crc32('CRC-32/ISO-HDLC', 32, 0x04C11DB7, 0xFFFFFFFF, True, True, 0xFFFFFFFF, 0xCBF43926), 'CRC-32')
+_register(Crc('CRC-32/ISCSI', 32, 0x1EDC6F41, 0xFFFFFFFF, True, True, 0xFFFFFFFF, 0xE3069283), 'CRC-32C')
+_register(Crc('CRC-32/MPEG-2', 32, 0x04C11DB7, 0xFFFFFFFF, False, False, 0x00000000, 0x0376E6E7))
+_register(Crc('CRC-32/BZIP2', 32, 0x04C11DB7, 0xFFFFFFFF, False, False, 0xFFFFFFFF, 0xFC891918))
+_register(Sum('SUM8', 8))
+_register(Sum('SUM16', 16))
+_register(Xor('XOR8'), 'XOR')
+_register(Lrc('LRC'))
+
+
+def checksum_names():
+    """所有算法的标准名称, 按注册顺序, 不含别名"""
+    names = []
+    for checksum in CHECKSUMS.values():
+        if checksum.name not in names:
+            names.append(checksum.name)
+    return names
+
+
+def parse_checksum(spec):
+    """按名称或别名查找算法, 可加 :le / :be 指定校验值字节序; 名称无效时抛出 ValueError"""
+    name, _, order = spec.strip().partition(':')
+    checksum = CHECKSUMS.get(name.strip().upper())
+    if checksum is None:
+        raise ValueError(f"未知的校验算法 {name}")
+    order = order.strip().lower()
+    if not order:
+        return checksum
+    if order not in ('le', 'be'):
+        raise ValueError("校验值字节序必须为 le 或 be")
+    return checksum.with_byteorder('little' if order == 'le' else 'big')
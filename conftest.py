@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# 这些是手动运行的环境诊断脚本(导入时打印信息并等待回车), 不是测试
+collect_ignore = ['test_serial.py', 'test_serial_import.py', 'import_test.py', 'detailed_serial_test.py']
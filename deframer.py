@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""增量分帧
+
+把接收线程读到的任意分段的字节流切分为完整的帧。每个分帧器的 feed(data,
+timestamp_ns) 接收一批数据及其采集时间戳, 返回这批数据补全的所有帧
+[(帧数据, 首字节时间戳, 末字节时间戳), ...]; 不完整的尾部保留到下一次 feed()。
+
+每个字节只检查一次: 查找分隔符时从上次扫描结束的位置继续(只回退分隔符长度
+减一个字节), 长度前缀帧只在凑够头部或整帧时解析, 已切出的帧一次性从缓冲区
+移除, 不会重复扫描。分隔符查找和 SLIP/COBS 解码使用 bytes 的 C 实现方法。
+
+支持的分帧方式(parse_deframer() 的规格字符串):
+    delimiter:0d0a           以分隔符结尾, 分隔符用十六进制表示, 默认 0a
+    fixed:16                 固定长度
+    length:offset=2,size=2,order=big,adjust=0,header=aa55
+                             长度前缀: 可选的同步头 header, 长度字段位于帧内
+                             offset 处, 宽 size 字节; 帧总长 = offset + size +
+                             长度字段值 + adjust
+    slip                     SLIP (RFC 1055)
+    cobs                     COBS, 帧以 0x00 结尾
+    idle:5                   两批数据间隔超过 5ms 视为帧结束
+"""
+import time
+import threading
+
+SLIP_END = 0xC0
+SLIP_ESC = 0xDB
+SLIP_ESC_END = 0xDC
+SLIP_ESC_ESC = 0xDD
+
+
+class Deframer:
+    """分帧器基类
+
+    max_length 为帧的最大长度, 缓冲区中的数据超过该长度仍不能成帧时丢弃并
+    累计到 dropped, 防止线路噪声使缓冲区无限增长。
+    """
+    def __init__(self, max_length=64 * 1024):
+        self.max_length = max_length
+        self.frames = 0
+        self.dropped = 0
+        self._buffer = bytearray()
+        self._start_ns = 0
+
+    def feed(self, data, timestamp_ns=None):
+        """追加一批数据, 返回补全的帧 [(数据, 首字节时间戳, 末字节时间戳), ...]"""
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        if not self._buffer:
+            self._start_ns = timestamp_ns
+        self._buffer += data
+        frames = self._extract(timestamp_ns)
+        if len(self._buffer) > self.max_length:
+            self.dropped += len(self._buffer)
+            self._buffer.clear()
+            self._reset_scan()
+        self.frames += len(frames)
+        return frames
+
+    def _emit(self, frames, data, timestamp_ns):
+        """记录一帧; 之后剩余的数据属于当前这批, 以其时间戳作为下一帧的开始"""
+        frames.append((bytes(data), self._start_ns, timestamp_ns))
+        self._start_ns = timestamp_ns
+
+    def _extract(self, timestamp_ns):
+        raise NotImplementedError
+
+    def _reset_scan(self):
+        """清空缓冲区后重置扫描状态"""
+
+    def poll(self, now_ns=None):
+        """检查与时间有关的帧结束条件, 返回因此完成的帧; 只有空闲间隔分帧使用"""
+        return []
+
+    def flush(self):
+        """把缓冲区中不完整的数据作为最后一帧返回(可能为空列表)"""
+        if not self._buffer:
+            return []
+        frame = (bytes(self._buffer), self._start_ns, self._start_ns)
+        self._buffer.clear()
+        self._reset_scan()
+        return [frame]
+
+    def reset(self):
+        self._buffer.clear()
+        self._reset_scan()
+
+    @property
+    def pending(self):
+        """缓冲区中尚未成帧的字节数"""
+        return len(self._buffer)
+
+
+class DelimiterDeframer(Deframer):
+    """以分隔符结尾的帧; include_delimiter 为真时帧数据包含分隔符, 空帧被忽略"""
+    def __init__(self, delimiter=b'\n', include_delimiter=False, max_length=64 * 1024):
+        super().__init__(max_length)
+        if not delimiter:
+            raise ValueError("分隔符不能为空")
+        self.delimiter = bytes(delimiter)
+        self.include_delimiter = include_delimiter
+        # 已确认不含分隔符起点的位置
+        self._scanned = 0
+
+    def _extract(self, timestamp_ns):
+        frames = []
+        buffer = self._buffer
+        delimiter = self.delimiter
+        size = len(delimiter)
+        start = 0
+        position = buffer.find(delimiter, self._scanned)
+        while position >= 0:
+            end = position + size
+            frame = buffer[start:end if self.include_delimiter else position]
+            if len(frame) > (size if self.include_delimiter else 0):
+                self._emit(frames, frame, timestamp_ns)
+            start = end
+            position = buffer.find(delimiter, start)
+        if start:
+            del buffer[:start]
+        # 末尾可能是分隔符的前半部分, 下次从那里继续查找
+        self._scanned = max(len(buffer) - size + 1, 0)
+        return frames
+
+    def _reset_scan(self):
+        self._scanned = 0
+
+
+class FixedLengthDeframer(Deframer):
+    """固定长度的帧"""
+    def __init__(self, length, max_length=None):
+        if length <= 0:
+            raise ValueError("帧长度必须大于 0")
+        super().__init__(max_length or max(length * 2, 64 * 1024))
+        self.length = length
+
+    def _extract(self, timestamp_ns):
+        frames = []
+        buffer = self._buffer
+        length = self.length
+        count = len(buffer) // length
+        for i in range(count):
+            self._emit(frames, buffer[i * length:(i + 1) * length], timestamp_ns)
+        if count:
+            del buffer[:count * length]
+        return frames
+
+
+class LengthPrefixDeframer(Deframer):
+    """带长度字段的帧
+
+    header 为帧开头的同步字节(可为空); 长度字段位于帧内 length_offset 处,
+    宽 length_size 字节, 按 byteorder 解析; 帧总长 = length_offset +
+    length_size + 长度字段值 + length_adjust。header 不匹配或长度超出
+    max_length 时丢弃一个字节重新同步。
+    """
+    def __init__(self, length_offset=0, length_size=1, byteorder='big', length_adjust=0, header=b'',
+                 max_length=64 * 1024):
+        super().__init__(max_length)
+        if length_size not in (1, 2, 3, 4):
+            raise ValueError("长度字段宽度必须为 1 到 4 字节")
+        if byteorder not in ('big', 'little'):
+            raise ValueError("字节序必须为 big 或 little")
+        self.header = bytes(header)
+        self.length_offset = max(length_offset, len(self.header))
+        self.length_size = length_size
+        self.byteorder = byteorder
+        self.length_adjust = length_adjust
+
+    def _extract(self, timestamp_ns):
+        frames = []
+        buffer = self._buffer
+        header = self.header
+        header_end = self.length_offset + self.length_size
+        start = 0
+        while True:
+            if header:
+                # 同步到下一个帧头, 跳过的字节计入 dropped
+                position = buffer.find(header, start)
+                if position < 0:
+                    keep = max(len(buffer) - len(header) + 1, start)
+                    self.dropped += keep - start
+                    start = keep
+                    break
+                self.dropped += position - start
+                start = position
+            if len(buffer) - start < header_end:
+                break
+            value = int.from_bytes(buffer[start + self.length_offset:start + header_end], self.byteorder)
+            total = header_end + value + self.length_adjust
+            if total < header_end or total > self.max_length:
+                # 长度字段不合理: 不是真正的帧头
+                self.dropped += 1
+                start += 1
+                continue
+            if len(buffer) - start < total:
+                break
+            self._emit(frames, buffer[start:start + total], timestamp_ns)
+            start += total
+        if start:
+            del buffer[:start]
+        return frames
+
+
+class SlipDeframer(Deframer):
+    """SLIP (RFC 1055) 帧: 以 0xC0 结尾, 0xDB 0xDC / 0xDB 0xDD 转义"""
+    _END = bytes([SLIP_END])
+
+    def __init__(self, max_length=64 * 1024):
+        super().__init__(max_length)
+        self._scanned = 0
+
+    @staticmethod
+    def decode(data):
+        # 合法的 SLIP 数据中 0xDB 只作为转义前缀出现, 先替换 ESC END 不会误匹配
+        return bytes(data).replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb')
+
+    @staticmethod
+    def encode(data):
+        return bytes(data).replace(b'\xdb', b'\xdb\xdd').replace(b'\xc0', b'\xdb\xdc') + b'\xc0'
+
+    def _extract(self, timestamp_ns):
+        frames = []
+        buffer = self._buffer
+        start = 0
+        position = buffer.find(self._END, self._scanned)
+        while position >= 0:
+            # 连续的 END (帧间填充) 产生空帧, 忽略
+            if position > start:
+                self._emit(frames, self.decode(buffer[start:position]), timestamp_ns)
+            start = position + 1
+            position = buffer.find(self._END, start)
+        if start:
+            del buffer[:start]
+        self._scanned = len(buffer)
+        return frames
+
+    def _reset_scan(self):
+        self._scanned = 0
+
+
+class CobsDeframer(Deframer):
+    """COBS 帧: 编码后不含 0x00, 以 0x00 结尾; 解码失败的帧计入 dropped"""
+    def __init__(self, max_length=64 * 1024):
+        super().__init__(max_length)
+        self.errors = 0
+        self._scanned = 0
+
+    @staticmethod
+    def decode(data):
+        """解码一帧(不含结尾的 0x00), 编码错误时抛出 ValueError"""
+        output = bytearray()
+        position = 0
+        length = len(data)
+        while position < length:
+            code = data[position]
+            end = position + code
+            if code == 0 or end > length:
+                raise ValueError("COBS 编码错误")
+            output += data[position + 1:end]
+            position = end
+            # 最后一块之后不补 0; 0xFF 块表示后面没有隐含的 0
+            if code != 0xFF and position < length:
+                output.append(0)
+        return bytes(output)
+
+    @staticmethod
+    def encode(data):
+        output = bytearray()
+        for block in bytes(data).split(b'\x00'):
+            # 每个以 0 分隔的块再按 254 字节切分
+            while len(block) >= 0xFE:
+                output.append(0xFF)
+                output += block[:0xFE]
+                block = block[0xFE:]
+            output.append(len(block) + 1)
+            output += block
+        return bytes(output) + b'\x00'
+
+    def _extract(self, timestamp_ns):
+        frames = []
+        buffer = self._buffer
+        start = 0
+        position = buffer.find(0, self._scanned)
+        while position >= 0:
+            if position > start:
+                try:
+                    self._emit(frames, self.decode(buffer[start:position]), timestamp_ns)
+                except ValueError:
+                    self.errors += 1
+                    self.dropped += position - start
+            start = position + 1
+            position = buffer.find(0, start)
+        if start:
+            del buffer[:start]
+        self._scanned = len(buffer)
+        return frames
+
+    def _reset_scan(self):
+        self._scanned = 0
+
+
+class IdleGapDeframer(Deframer):
+    """按空闲间隔分帧: 与上一批数据的时间间隔超过 gap_ms 时, 之前的数据成为一帧
+
+    最后一帧在下一批数据到达时, 或 poll() 发现已空闲超过 gap_ms 时完成。
+    时间戳是每次读取的采集时间, 同一批中的字节之间无法再细分。
+    """
+    def __init__(self, gap_ms=5.0, max_length=64 * 1024):
+        super().__init__(max_length)
+        self.gap_ns = int(gap_ms * 1e6)
+        self._last_ns = 0
+
+    def feed(self, data, timestamp_ns=None):
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        frames = []
+        if self._buffer and timestamp_ns - self._last_ns > self.gap_ns:
+            frames.append((bytes(self._buffer), self._start_ns, self._last_ns))
+            self._buffer.clear()
+            self.frames += 1
+        self._last_ns = timestamp_ns
+        return frames + super().feed(data, timestamp_ns)
+
+    def _extract(self, timestamp_ns):
+        return []
+
+    def poll(self, now_ns=None):
+        if now_ns is None:
+            now_ns = time.perf_counter_ns()
+        if not self._buffer or now_ns - self._last_ns <= self.gap_ns:
+            return []
+        frame = (bytes(self._buffer), self._start_ns, self._last_ns)
+        self._buffer.clear()
+        self.frames += 1
+        return [frame]
+
+
+class DeframingListener:
+    """把分帧器挂到串口引擎的接收回调上, 在接收线程中分帧
+
+    engine.add_listener(DeframingListener(deframer, on_frame)) 之后, 每个完整
+    的帧调用一次 on_frame(数据, 首字节时间戳, 末字节时间戳)。poll() 和 flush()
+    可以在其他线程中调用。stats 不为 None 时切出的帧数(包括 poll() 和 flush()
+    完成的帧)累加到 stats.frames; 同一数据流上只应有一个分帧回调传入引擎的
+    TrafficStats, 否则帧数会被重复统计。
+    """
+    def __init__(self, deframer, on_frame, stats=None):
+        self.deframer = deframer
+        self.on_frame = on_frame
+        self.stats = stats
+        self._lock = threading.Lock()
+
+    def __call__(self, data, timestamp_ns):
+        with self._lock:
+            frames = self.deframer.feed(data, timestamp_ns)
+        self._deliver(frames)
+
+    def poll(self, now_ns=None):
+        with self._lock:
+            frames = self.deframer.poll(now_ns)
+        self._deliver(frames)
+
+    def flush(self):
+        with self._lock:
+            frames = self.deframer.flush()
+        self._deliver(frames)
+
+    def _deliver(self, frames):
+        if frames and self.stats is not None:
+            self.stats.frames += len(frames)
+        for frame in frames:
+            self.on_frame(*frame)
+
+
+def _parse_options(text):
+    options = {}
+    for item in filter(None, text.split(',')):
+        key, _, value = item.partition('=')
+        options[key.strip()] = value.strip()
+    return options
+
+
+def parse_deframer(spec):
+    """按规格字符串创建分帧器(语法见模块说明), 规格无效时抛出 ValueError"""
+    kind, _, argument = spec.partition(':')
+    kind = kind.strip().lower()
+    argument = argument.strip()
+    if kind == 'delimiter':
+        return DelimiterDeframer(bytes.fromhex(argument or '0a'))
+    if kind == 'fixed':
+        return FixedLengthDeframer(int(argument))
+    if kind == 'length':
+        options = _parse_options(argument)
+        return LengthPrefixDeframer(
+            length_offset=int(options.get('offset', 0)),
+            length_size=int(options.get('size', 1)),
+            byteorder=options.get('order', 'big'),
+            length_adjust=int(options.get('adjust', 0)),
+            header=bytes.fromhex(options.get('header', '')),
+        )
+    if kind == 'slip':
+        return SlipDeframer()
+    if kind == 'cobs':
+        return CobsDeframer()
+    if kind == 'idle':
+        return IdleGapDeframer(float(argument or 5))
+    raise ValueError(f"未知的分帧方式 {kind}")
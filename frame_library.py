@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""数据帧库
+
+每个数据帧有唯一的 ID、名称、原始文本和发送选项, 以及按选项编码好的字节。
+编辑文本或选项时立即重新编码, 发送时直接使用缓存的字节, 不经过发送框。
+按 ID 和名称都可以 O(1) 查找。
+
+库文件格式(小端):
+    文件头: 魔数 b'SMFL', 版本(u16), 帧数(u32), 下一个 ID(u32)
+    每帧:   ID(u32), 标志(u8, bit0=十六进制 bit1=追加换行),
+            名称长度(u16), 文本长度(u32), 编码数据长度(u32),
+            名称(UTF-8), 文本(UTF-8), 编码数据
+编码数据随文件保存, 加载时无需重新解析文本。
+"""
+import os
+import re
+import sys
+import struct
+
+LIBRARY_MAGIC = b'SMFL'
+LIBRARY_VERSION = 1
+
+LIBRARY_HEADER = struct.Struct('<4sHII')
+FRAME_HEADER = struct.Struct('<IBHII')
+
+FLAG_HEX = 0x01
+FLAG_NEWLINE = 0x02
+
+_NON_HEX = re.compile(r'[^0-9A-Fa-f]')
+
+
+def encode_payload(text, hex_mode=False, append_newline=False, checksum=None):
+    """按发送选项把文本编码为字节
+
+    十六进制模式忽略所有非十六进制字符, 奇数个字符时末尾补 0。checksum 为
+    checksum 模块的校验算法时, 校验值追加在数据之后、换行之前。
+    """
+    if hex_mode:
+        hex_text = _NON_HEX.sub('', text)
+        if len(hex_text) % 2 != 0:
+            hex_text += '0'
+        data = bytes.fromhex(hex_text)
+    else:
+        data = text.encode('utf-8')
+    if checksum is not None:
+        data = checksum.append(data)
+    if append_newline:
+        data += b'\r\n'
+    return data
+
+
+def default_library_path():
+    """返回默认的数据帧库文件路径"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'SerialMonitor', 'frames.smfl')
+
+
+class FrameLibraryError(Exception):
+    """数据帧库文件格式错误"""
+
+
+class Frame:
+    """一个数据帧, data 为按 hex_mode / append_newline 编码好的字节
+
+    checksummed 缓存追加了各校验算法的校验值后的字节, 以 checksum.key 为键;
+    文本或选项变化时由 FrameLibrary.update() 清空。
+    """
+    __slots__ = ('id', 'name', 'text', 'hex_mode', 'append_newline', 'data', 'checksummed')
+
+    def __init__(self, frame_id, name, text, hex_mode=False, append_newline=False, data=None):
+        self.id = frame_id
+        self.name = name
+        self.text = text
+        self.hex_mode = hex_mode
+        self.append_newline = append_newline
+        self.data = encode_payload(text, hex_mode, append_newline) if data is None else data
+        self.checksummed = {}
+
+    def encode(self, checksum=None):
+        """发送的字节: 没有校验时为 data, 否则为缓存的追加了校验值的字节
+
+        校验值在换行之前, 由已编码的 data 计算, 不重新解析文本。
+        """
+        if checksum is None:
+            return self.data
+        data = self.checksummed.get(checksum.key)
+        if data is None:
+            body = self.data[:-2] if self.append_newline else self.data
+            data = checksum.append(body) + self.data[len(body):]
+            self.checksummed[checksum.key] = data
+        return data
+
+
+class FrameLibrary:
+    """按 ID 和名称索引的数据帧集合, 迭代顺序为添加顺序"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.next_id = 1
+        self._frames = {}
+        self._by_name = {}
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __iter__(self):
+        return iter(list(self._frames.values()))
+
+    def __contains__(self, frame_id):
+        return frame_id in self._frames
+
+    def get(self, frame_id):
+        """按 ID 查找, 不存在时返回 None"""
+        return self._frames.get(frame_id)
+
+    def find(self, name):
+        """按名称查找, 不存在时返回 None"""
+        frame_id = self._by_name.get(name)
+        return self._frames[frame_id] if frame_id is not None else None
+
+    def add(self, name, text, hex_mode=False, append_newline=False):
+        """添加数据帧并返回; 名称已存在时抛出 ValueError"""
+        if name in self._by_name:
+            raise ValueError(f"名称 {name} 已存在")
+        frame = Frame(self.next_id, name, text, hex_mode, append_newline)
+        self.next_id += 1
+        self._frames[frame.id] = frame
+        self._by_name[name] = frame.id
+        return frame
+
+    def update(self, frame_id, name=None, text=None, hex_mode=None, append_newline=None):
+        """修改数据帧, 文本或选项变化时重新编码"""
+        frame = self._frames[frame_id]
+        if name is not None and name != frame.name:
+            if name in self._by_name:
+                raise ValueError(f"名称 {name} 已存在")
+            del self._by_name[frame.name]
+            self._by_name[name] = frame_id
+            frame.name = name
+        if text is not None:
+            frame.text = text
+        if hex_mode is not None:
+            frame.hex_mode = hex_mode
+        if append_newline is not None:
+            frame.append_newline = append_newline
+        frame.data = encode_payload(frame.text, frame.hex_mode, frame.append_newline)
+        frame.checksummed = {}
+        return frame
+
+    def remove(self, frame_id):
+        frame = self._frames.pop(frame_id)
+        del self._by_name[frame.name]
+        return frame
+
+    def clear(self):
+        self._frames.clear()
+        self._by_name.clear()
+
+    def load(self, path=None):
+        """从库文件加载, 文件不存在时得到空库"""
+        path = path or self.path
+        self.clear()
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return self
+        if len(content) < LIBRARY_HEADER.size:
+            raise FrameLibraryError("文件太短, 不是数据帧库")
+        magic, version, count, self.next_id = LIBRARY_HEADER.unpack_from(content, 0)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+            raise FrameLibraryError("不支持的数据帧库格式")
+        position = LIBRARY_HEADER.size
+        try:
+            for _ in range(count):
+                frame_id, flags, name_length, text_length, data_length = FRAME_HEADER.unpack_from(content, position)
+                position += FRAME_HEADER.size
+                name = content[position:position + name_length].decode('utf-8')
+                position += name_length
+                text = content[position:position + text_length].decode('utf-8')
+                position += text_length
+                data = content[position:position + data_length]
+                position += data_length
+                frame = Frame(frame_id, name, text, bool(flags & FLAG_HEX), bool(flags & FLAG_NEWLINE), data)
+                self._frames[frame_id] = frame
+                self._by_name[name] = frame_id
+        except (struct.error, UnicodeDecodeError) as e:
+            self.clear()
+            raise FrameLibraryError(f"数据帧库已损坏: {e}") from e
+        return self
+
+    def save(self, path=None):
+        """写入库文件; 先写临时文件再替换, 中途失败不会损坏原文件"""
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        parts = [LIBRARY_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, len(self._frames), self.next_id)]
+        for frame in self._frames.values():
+            name = frame.name.encode('utf-8')
+            text = frame.text.encode('utf-8')
+            flags = (FLAG_HEX if frame.hex_mode else 0) | (FLAG_NEWLINE if frame.append_newline else 0)
+            parts.append(FRAME_HEADER.pack(frame.id, flags, len(name), len(text), len(frame.data)))
+            parts.append(name)
+            parts.append(text)
+            parts.append(frame.data)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(b''.join(parts))
+        os.replace(temporary, path)
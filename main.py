@@ -1,73 +1,1639 @@
 import sys
 import sys
 import re
-from datetime import datetime
+import os
+import time
+import json
+import bisect
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime, timedelta
 
 # 使用pyserial包进行串口通信
 import serial
 import serial.tools.list_ports
 
+from serial_engine import (
+    SerialEngine, SerialReader, TxQueueFull, SequencePlayer, ScriptError, parse_sequence,
+    ReceiveFormatter, HexDumpFormatter, RxRingBuffer, format_capture_time,
+    LatencyProbe, ResponseMatcher, format_latency, unescape, IoLoop, COMMON_BAUDRATES
+)
+from session_search import SessionSearchIndex, sweep_stale_files
+from frame_library import FrameLibrary, FrameLibraryError, encode_payload, default_library_path
+from xmodem import ModemTransfer, TransferCancelled, MODES, YMODEM
+from deframer import DeframingListener, parse_deframer
+from checksum import checksum_names, parse_checksum
+from plot_data import LineParser, PlotFeed, PlotStore
+from modbus import ModbusMonitor, ModbusMaster, PollItem, KIND_NAMES, frame_gap_ms, format_master_stats
+from capture_file import (
+    CaptureReader, CaptureFormatError, CAPTURE_SUFFIX, DIRECTION_RX
+)
+
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QComboBox, QPushButton, QTextEdit, QCheckBox, QMessageBox,
     QSplitter, QGroupBox, QFormLayout, QSpinBox, QSizePolicy, QTabWidget,
     QAction, QMenuBar, QMenu, QDialog, QGridLayout, QDoubleSpinBox,
-    QTableWidget, QTableWidgetItem, QHeaderView
+    QTableWidget, QTableWidgetItem, QHeaderView, QListView, QAbstractItemView, QFileDialog,
+    QLineEdit, QProgressDialog, QProgressBar
+)
+from PyQt5.QtCore import (
+    Qt, QObject, pyqtSignal, QTimer, QSettings, QAbstractListModel, QModelIndex, QPointF, QRectF
+)
+from PyQt5.QtGui import (
+    QFont, QPalette, QColor, QIcon, QBrush, QFontDatabase, QKeySequence, QPainter, QPen, QPolygonF
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QSettings
-from PyQt5.QtGui import QFont, QPalette, QColor, QIcon, QBrush, QFontDatabase
 
-class SerialThread(QThread):
-    """串口数据接收线程"""
-    data_received = pyqtSignal(str)
-    connection_closed = pyqtSignal()
-    error_occurred = pyqtSignal(str)
+class ReceiveHistory:
+    """有界的接收历史
+
+    以行为单位保存显示文本, 行数或字符数超过上限时最旧的行写入磁盘上的溢出
+    文件而不是直接丢弃。超长的行按 max_line_length 强制折行, 保证单行大小有界。
+    first_line_no 为内存中第一行的全局行号, 即已溢出到磁盘的行数。
     
-    def __init__(self, serial_port):
-        super().__init__()
-        self.serial_port = serial_port
-        self.running = False
+    溢出文件在退出后保留供查看, 文件名包含进程号; sweep() 在启动时删除已退出
+    的进程留下的、超过 SPILL_KEEP_DAYS 天的溢出文件。
+    """
+    SPILL_KEEP_DAYS = 3
+    
+    def __init__(self, max_lines=100000, max_chars=32 * 1024 * 1024, max_line_length=4096,
+                 spill_dir=None):
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.max_line_length = max_line_length
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "SerialMonitor")
+        self.lines = deque()
+        self.chars = 0
+        self.first_line_no = 0
+        self.spill_path = None
+        self._spill_file = None
+        # 最后一行尚未以换行结束
+        self._partial = False
+        
+    def __len__(self):
+        return len(self.lines)
+        
+    @property
+    def line_open(self):
+        """最后一行是否尚未以换行结束"""
+        return self._partial
+        
+    @property
+    def next_line_no(self):
+        """下一段追加文本起始处的全局行号"""
+        return self.first_line_no + len(self.lines) - (1 if self._partial else 0)
+        
+    def append(self, text):
+        """追加文本, 返回 (最后一行是否被续写, 新增行数, 移出行数)"""
+        if not text:
+            return False, 0, 0
+        parts = text.split('\n')
+        changed = False
+        added = 0
+        for i, part in enumerate(parts):
+            if i == 0 and self._partial:
+                if part:
+                    line = self.lines[-1] + part
+                    self.chars -= len(self.lines[-1])
+                    self.lines[-1] = line[:self.max_line_length]
+                    self.chars += len(self.lines[-1])
+                    if len(line) > self.max_line_length:
+                        added += self._push(line[self.max_line_length:])
+                    changed = True
+            elif i == len(parts) - 1 and not part:
+                # 以换行结尾, 不产生新行
+                break
+            else:
+                added += self._push(part)
+        self._partial = bool(parts[-1])
+        return changed, added, self._evict()
+        
+    def _push(self, line):
+        """追加新行, 超长时折成多行, 返回新增行数"""
+        count = 0
+        while True:
+            self.lines.append(line[:self.max_line_length])
+            self.chars += len(self.lines[-1])
+            count += 1
+            line = line[self.max_line_length:]
+            if not line:
+                return count
+        
+    def _evict(self):
+        """移出超过上限的旧行并写入溢出文件, 返回移出行数"""
+        removed = 0
+        while len(self.lines) > 1 and (len(self.lines) > self.max_lines or self.chars > self.max_chars):
+            line = self.lines.popleft()
+            self.chars -= len(line)
+            self._spill(line)
+            removed += 1
+        self.first_line_no += removed
+        if removed and self._spill_file:
+            self._spill_file.flush()
+        return removed
+        
+    def _spill(self, line):
+        if self._spill_file is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            prefix = datetime.now().strftime(f"receive_{os.getpid()}_%Y%m%d_%H%M%S_")
+            fd, self.spill_path = tempfile.mkstemp(prefix=prefix, suffix=".log", dir=self.spill_dir)
+            self._spill_file = os.fdopen(fd, 'w', encoding='utf-8', newline='')
+        self._spill_file.write(line)
+        self._spill_file.write('\n')
+        
+    def retract_partial(self):
+        """移除未以换行结束的最后一行, 返回是否有行被移除"""
+        if not self._partial or not self.lines:
+            return False
+        self.chars -= len(self.lines.pop())
+        self._partial = False
+        return True
+        
+    def end_line(self):
+        """结束当前未完成的行, 之后的文本从新行开始"""
+        self._partial = False
+        
+    def line(self, index):
+        """按内存中的行号取一行"""
+        return self.lines[index]
+        
+    def clear(self):
+        """清空内存中的历史, 关闭当前溢出文件"""
+        self.lines.clear()
+        self.chars = 0
+        self.first_line_no = 0
+        self._partial = False
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+        self.spill_path = None
+        
+    @classmethod
+    def sweep(cls, spill_dir=None):
+        """清理以前的会话留下的溢出文件和检索索引临时文件"""
+        spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "SerialMonitor")
+        # 检索索引只在会话期间有用, 进程退出后立即删除
+        sweep_stale_files(spill_dir, "session_", ".bin")
+        sweep_stale_files(spill_dir, "receive_", ".log", cls.SPILL_KEEP_DAYS * 24 * 3600)
+
+class ReceiveLogModel(QAbstractListModel):
+    """接收历史的列表模型, 视图只请求可见行"""
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self._rows = len(history)
+        
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._rows
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        if 0 <= row < len(self.history):
+            return self.history.line(row)
+        return None
+        
+    def append_text(self, text):
+        """追加文本到历史并通知视图"""
+        changed, added, removed = self.history.append(text)
+        if changed and self._rows:
+            last = self.index(self._rows - 1)
+            self.dataChanged.emit(last, last)
+        if added:
+            self.beginInsertRows(QModelIndex(), self._rows, self._rows + added - 1)
+            self._rows += added
+            self.endInsertRows()
+        if removed:
+            self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+            self._rows -= removed
+            self.endRemoveRows()
+        return removed
+        
+    def retract_partial(self):
+        """移除未完成的最后一行并通知视图"""
+        if self.history.retract_partial():
+            self.beginRemoveRows(QModelIndex(), self._rows - 1, self._rows - 1)
+            self._rows -= 1
+            self.endRemoveRows()
+        
+    def clear(self):
+        self.beginResetModel()
+        self.history.clear()
+        self._rows = 0
+        self.endResetModel()
+        
+    def reload(self):
+        """历史被整体替换后刷新视图"""
+        self.beginResetModel()
+        self._rows = len(self.history)
+        self.endResetModel()
+
+class ReceiveView(QListView):
+    """虚拟化的接收显示视图, 支持 Ctrl+C 复制选中的行"""
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            text = ''.join(self.model().data(self.model().index(row)) + '\n' for row in rows)
+            QApplication.clipboard().setText(text)
+            return
+        super().keyPressEvent(event)
+
+class PlotView(QWidget):
+    """实时曲线视图
+
+    每次重绘从 PlotStore 取窗口内各通道按像素列汇总的 min/max, 每列画两个点
+    连成折线, 绘制代价只与控件宽度和通道数有关。纵轴按窗口内的数据自动缩放。
+    """
+    COLORS = [QColor(31, 119, 180), QColor(255, 127, 14), QColor(44, 160, 44), QColor(214, 39, 40),
+              QColor(148, 103, 189), QColor(140, 86, 75), QColor(227, 119, 194), QColor(127, 127, 127)]
+    MARGIN_LEFT = 64
+    MARGIN_BOTTOM = 22
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.window_s = 10.0
+        # 暂停时固定的窗口结束时间, None 表示跟随当前时间
+        self.frozen_end_ns = None
+        self.setMinimumSize(400, 240)
+        
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        left, top = self.MARGIN_LEFT, 8
+        width = self.width() - left - 8
+        height = self.height() - top - self.MARGIN_BOTTOM
+        if width <= 0 or height <= 0:
+            return
+        end_ns = self.frozen_end_ns or time.perf_counter_ns()
+        window_ns = int(self.window_s * 1e9)
+        channels = self.store.envelopes(end_ns - window_ns, end_ns, width)
+        lows = [low for envelope, _ in channels.values() for _, low, _ in envelope]
+        highs = [high for envelope, _ in channels.values() for _, _, high in envelope]
+        y_min, y_max = (min(lows), max(highs)) if lows else (0.0, 1.0)
+        if y_max - y_min < 1e-12:
+            y_min, y_max = y_min - 1, y_max + 1
+        span = y_max - y_min
+        y_min -= span * 0.05
+        y_max += span * 0.05
+        scale = height / (y_max - y_min)
+        
+        # 网格和刻度
+        painter.setPen(QPen(QColor(225, 225, 225)))
+        for i in range(6):
+            y = top + height * i / 5
+            painter.drawLine(QPointF(left, y), QPointF(left + width, y))
+        for i in range(6):
+            x = left + width * i / 5
+            painter.drawLine(QPointF(x, top), QPointF(x, top + height))
+        painter.setPen(QPen(QColor(90, 90, 90)))
+        for i in range(6):
+            y = top + height * i / 5
+            painter.drawText(QRectF(0, y - 8, left - 6, 16), Qt.AlignRight | Qt.AlignVCenter,
+                             f"{y_max - (y_max - y_min) * i / 5:.4g}")
+        for i in range(6):
+            x = left + width * i / 5
+            painter.drawText(QRectF(x - 40, top + height + 2, 80, 18), Qt.AlignCenter,
+                             f"{-self.window_s * (5 - i) / 5:.3g}s" if i < 5 else "0s")
+        painter.drawRect(QRectF(left, top, width, height))
+        
+        # 曲线: 每列 (最小值, 最大值) 两个点
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        for index, (name, (envelope, last)) in enumerate(sorted(channels.items())):
+            color = self.COLORS[index % len(self.COLORS)]
+            polygon = QPolygonF()
+            for column, low, high in envelope:
+                x = left + column
+                polygon.append(QPointF(x, top + (y_max - low) * scale))
+                polygon.append(QPointF(x, top + (y_max - high) * scale))
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(polygon)
+            text = f"{name} = {last:.6g}" if last is not None else name
+            painter.fillRect(QRectF(left + 8, top + 6 + index * 16, 10, 10), color)
+            painter.drawText(QPointF(left + 22, top + 15 + index * 16), text)
+
+class CaptureViewerDialog(QDialog):
+    """捕获文件查看器
+
+    以内存映射方式打开捕获文件, 每次只格式化一页(若干个索引块)的记录并
+    显示在与实时接收相同的虚拟化视图中; 滚动到页首/页尾时自动换页。时间和
+    RX 偏移跳转通过索引二分查找定位到块, 与文件大小无关。格式化使用与实时
+    接收相同的 ReceiveFormatter。
+    """
+    PAGE_BYTES = 256 * 1024
+    
+    def __init__(self, reader, parent=None, hex_mode=False):
+        super().__init__(parent)
+        self.reader = reader
+        self.page_start = 0
+        self.page_end = 0
+        # 本页每条记录的 (时间戳, RX 累计偏移, 行号), 用于页内定位
+        self.record_rows = []
+        self._loading = False
+        
+        self.setWindowTitle(f"捕获文件 - {os.path.basename(reader.path)}")
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+        
+        # 显示选项
+        options_layout = QHBoxLayout()
+        self.hex_check = QCheckBox("十六进制显示")
+        self.hex_check.setChecked(hex_mode)
+        self.timestamp_check = QCheckBox("显示时间戳")
+        self.timestamp_check.setChecked(True)
+        self.split_check = QCheckBox("逐行时间戳")
+        self.split_check.setChecked(True)
+        self.tx_check = QCheckBox("显示发送")
+        for check in (self.hex_check, self.timestamp_check, self.split_check, self.tx_check):
+            check.stateChanged.connect(lambda: self.load_page(self.page_start, end=self.page_end))
+            options_layout.addWidget(check)
+        options_layout.addStretch()
+        layout.addLayout(options_layout)
+        
+        # 本页内容
+        self.history = ReceiveHistory(max_lines=sys.maxsize, max_chars=sys.maxsize)
+        self.model = ReceiveLogModel(self.history, self)
+        self.view = ReceiveView(self.model)
+        self.view.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+        layout.addWidget(self.view)
+        
+        # 导航
+        nav_layout = QHBoxLayout()
+        first_button = QPushButton("首页")
+        first_button.clicked.connect(lambda: self.load_page(0))
+        prev_button = QPushButton("上一页")
+        prev_button.clicked.connect(self.previous_page)
+        next_button = QPushButton("下一页")
+        next_button.clicked.connect(self.next_page)
+        last_button = QPushButton("末页")
+        last_button.clicked.connect(self.last_page)
+        
+        self.time_input = QLineEdit()
+        self.time_input.setPlaceholderText("HH:MM:SS.ffffff")
+        self.time_input.setFixedWidth(150)
+        self.time_input.returnPressed.connect(self.goto_time)
+        time_button = QPushButton("跳转时间")
+        time_button.clicked.connect(self.goto_time)
+        
+        self.offset_input = QLineEdit()
+        self.offset_input.setPlaceholderText("RX 字节偏移")
+        self.offset_input.setFixedWidth(120)
+        self.offset_input.returnPressed.connect(self.goto_offset)
+        offset_button = QPushButton("跳转偏移")
+        offset_button.clicked.connect(self.goto_offset)
+        
+        for widget in (first_button, prev_button, next_button, last_button):
+            nav_layout.addWidget(widget)
+        nav_layout.addStretch()
+        for widget in (self.time_input, time_button, self.offset_input, offset_button):
+            nav_layout.addWidget(widget)
+        layout.addLayout(nav_layout)
+        
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
+        
+        self.load_page(0)
+        
+    def _page_end_for(self, start):
+        """从 start 块开始凑满 PAGE_BYTES 的页尾块号(不含)"""
+        end = start
+        begin = self.reader.block_entry(start)[0] if start < self.reader.block_count else 0
+        while end < self.reader.block_count:
+            end += 1
+            if self.reader.block_end(end - 1) - begin >= self.PAGE_BYTES:
+                break
+        return end
+        
+    def _page_start_for(self, end):
+        """以 end 块为页尾(不含)向前凑满 PAGE_BYTES 的页首块号"""
+        start = end
+        finish = self.reader.block_end(end - 1) if end > 0 else 0
+        while start > 0:
+            start -= 1
+            if finish - self.reader.block_entry(start)[0] >= self.PAGE_BYTES:
+                break
+        return start
+        
+    def load_page(self, start, scroll_row=None, end=None):
+        """格式化并显示 [start, end) 块的记录, end 缺省时从 start 开始凑满一页"""
+        if self._loading:
+            return
+        self._loading = True
+        reader = self.reader
+        start = max(0, min(start, reader.block_count - 1)) if reader.block_count else 0
+        if end is None:
+            end = self._page_end_for(start)
+        formatter = ReceiveFormatter(
+            hex_mode=self.hex_check.isChecked(),
+            timestamps=self.timestamp_check.isChecked(),
+            split_lines=self.split_check.isChecked(),
+            clock_offset_ns=reader.clock_offset_ns
+        )
+        show_tx = self.tx_check.isChecked()
+        history = self.history
+        history.clear()
+        self.record_rows = []
+        for block in range(start, end):
+            rx_offset = reader.block_entry(block)[3]
+            for timestamp_ns, direction, payload in reader.iter_block_records(block):
+                self.record_rows.append((timestamp_ns, rx_offset, len(history)))
+                if direction == DIRECTION_RX:
+                    rx_offset += len(payload)
+                    text, retract = formatter.feed(payload, [(0, timestamp_ns)])
+                    if retract:
+                        history.retract_partial()
+                    history.append(text)
+                elif show_tx:
+                    # 发送记录单独成行
+                    formatter.reset()
+                    history.end_line()
+                    line = payload.hex(' ').upper() if formatter.hex_mode else payload.decode('utf-8', errors='replace')
+                    if formatter.timestamps:
+                        line = f"[{format_capture_time(timestamp_ns, reader.clock_offset_ns)}] {line}"
+                    history.append(f"TX> {line}\n")
+        self.page_start = start
+        self.page_end = end
+        self.model.reload()
+        if scroll_row is not None:
+            self.view.scrollTo(self.model.index(max(0, min(scroll_row, len(history) - 1))),
+                               QAbstractItemView.PositionAtTop)
+            self.view.setCurrentIndex(self.model.index(max(0, min(scroll_row, len(history) - 1))))
+        self._update_info()
+        self._loading = False
+        
+    def _update_info(self):
+        reader = self.reader
+        if not reader.block_count:
+            self.info_label.setText("捕获文件中没有记录")
+            return
+        first_time = format_capture_time(reader.block_entry(self.page_start)[1], reader.clock_offset_ns)
+        size_mb = reader.file_size / 1024 / 1024
+        self.info_label.setText(
+            f"块 {self.page_start + 1}-{self.page_end} / {reader.block_count}    "
+            f"本页起始时间 {first_time}    本页 {len(self.record_rows)} 条记录    文件 {size_mb:.1f} MB"
+        )
         
-    def run(self):
-        self.running = True
-        while self.running and self.serial_port.is_open:
+    def next_page(self):
+        if self.page_end < self.reader.block_count:
+            self.load_page(self.page_end, scroll_row=0)
+            
+    def previous_page(self):
+        if self.page_start > 0:
+            self.load_page(self._page_start_for(self.page_start), scroll_row=sys.maxsize, end=self.page_start)
+            
+    def last_page(self):
+        if self.reader.block_count:
+            self.load_page(self._page_start_for(self.reader.block_count), scroll_row=sys.maxsize,
+                           end=self.reader.block_count)
+            
+    def on_scrolled(self, value):
+        """滚动到页首/页尾时自动换页"""
+        if self._loading:
+            return
+        scroll_bar = self.view.verticalScrollBar()
+        if value == scroll_bar.maximum() and value > 0:
+            QTimer.singleShot(0, self.next_page)
+        elif value == scroll_bar.minimum() and scroll_bar.maximum() > 0:
+            QTimer.singleShot(0, self.previous_page)
+            
+    def _scroll_to_record(self, match):
+        """在当前页中滚动到第一条满足 match 的记录"""
+        for record in self.record_rows:
+            if match(record):
+                self.view.scrollTo(self.model.index(record[2]), QAbstractItemView.PositionAtTop)
+                self.view.setCurrentIndex(self.model.index(record[2]))
+                return
+                
+    def goto_time(self):
+        """跳转到指定时刻, 支持 HH:MM:SS[.ffffff] 或 YYYY-MM-DD HH:MM:SS[.ffffff]"""
+        text = self.time_input.text().strip()
+        start_wall = datetime.fromtimestamp((self.reader.start_ns + self.reader.clock_offset_ns) / 1e9)
+        target = None
+        for pattern in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%H:%M:%S.%f", "%H:%M:%S"):
             try:
-                if self.serial_port.in_waiting:
-                    data = self.serial_port.read(self.serial_port.in_waiting)
-                    self.data_received.emit(data.decode('utf-8', errors='replace'))
-                self.msleep(10)
-            except Exception as e:
-                self.error_occurred.emit(str(e))
-                self.running = False
-                if self.serial_port.is_open:
-                    self.serial_port.close()
-                self.connection_closed.emit()
+                target = datetime.strptime(text, pattern)
                 break
+            except ValueError:
+                continue
+        if target is None:
+            QMessageBox.warning(self, "警告", "时间格式应为 HH:MM:SS.ffffff")
+            return
+        if target.year == 1900:
+            target = target.replace(year=start_wall.year, month=start_wall.month, day=start_wall.day)
+            # 早于录制开始的时刻视为跨越午夜后的第二天
+            if target < start_wall.replace(microsecond=0):
+                target += timedelta(days=1)
+        timestamp_ns = int(target.timestamp() * 1e9) - self.reader.clock_offset_ns
+        self.load_page(self.reader.find_block_by_time(timestamp_ns))
+        self._scroll_to_record(lambda record: record[0] >= timestamp_ns)
+        
+    def goto_offset(self):
+        """跳转到 RX 数据流中的指定字节偏移"""
+        try:
+            offset = int(self.offset_input.text().strip(), 0)
+        except ValueError:
+            QMessageBox.warning(self, "警告", "偏移应为整数(支持 0x 前缀)")
+            return
+        self.load_page(self.reader.find_block_by_rx_offset(offset))
+        rows = [record for record in self.record_rows if record[1] <= offset]
+        if rows:
+            self._scroll_to_record(lambda record: record is rows[-1])
+            
+    def done(self, result):
+        self.reader.close()
+        super().done(result)
+
+class SequencePlayerDialog(QDialog):
+    """数据帧序列发送
+
+    序列使用与命令行脚本相同的语法, frame 命令引用数据帧库中的数据帧。
+    序列在引擎的 SequencePlayer 线程中按计划时间执行, 对话框只定时读取
+    各步骤的计时统计, 不参与调度。checksum 为主窗口当前的发送校验。
+    """
+    COLUMNS = ["行", "步骤", "次数", "失败", "延迟均值(us)", "延迟最大(us)",
+               "耗时最小(ms)", "耗时均值(ms)", "耗时最大(ms)"]
+    
+    def __init__(self, engine, frames, text="", loops=1, checksum=None, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.frames = frames
+        self.checksum = checksum
+        self.player = None
+        
+        self.setWindowTitle("序列发送")
+        self.resize(800, 560)
+        layout = QVBoxLayout(self)
+        
+        layout.addWidget(QLabel(
+            "每行一条命令: frame <名称> [*N], send <文本> [*N], sendhex <十六进制> [*N], "
+            "wait <ms>, expect <正则> [超时ms]"
+        ))
+        self.sequence_edit = QTextEdit()
+        self.sequence_edit.setPlainText(text)
+        layout.addWidget(self.sequence_edit)
+        
+        # 运行控制
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel("循环次数:"))
+        self.loops_spin = QSpinBox()
+        self.loops_spin.setRange(0, 100000000)
+        self.loops_spin.setSpecialValueText("无限")
+        self.loops_spin.setValue(loops)
+        control_layout.addWidget(self.loops_spin)
+        self.start_button = QPushButton("开始")
+        self.start_button.clicked.connect(self.start)
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        control_layout.addWidget(self.start_button)
+        control_layout.addWidget(self.stop_button)
+        self.status_label = QLabel("")
+        control_layout.addWidget(self.status_label)
+        control_layout.addStretch()
+        layout.addLayout(control_layout)
+        
+        # 各步骤计时
+        self.timing_table = QTableWidget(0, len(self.COLUMNS))
+        self.timing_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.timing_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.timing_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.timing_table.verticalHeader().setVisible(False)
+        self.timing_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.timing_table)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        
+    @property
+    def text(self):
+        return self.sequence_edit.toPlainText()
+        
+    def start(self):
+        """解析序列并启动播放线程"""
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        try:
+            steps = parse_sequence(self.text.splitlines(), self.frames)
+        except ScriptError as e:
+            QMessageBox.warning(self, "警告", f"序列错误: {str(e)}")
+            return
+        if not steps:
+            return
+        self.stop()
+        self.player = SequencePlayer(self.engine, steps, loops=self.loops_spin.value(), checksum=self.checksum)
+        self.player.start()
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.refresh_timer.start(500)
+        
+    def stop(self):
+        if self.player:
+            self.player.stop()
+            self.refresh()
+        
+    def refresh(self):
+        """显示各步骤的计时统计和播放状态"""
+        player = self.player
+        if player is None:
+            return
+        rows = player.report()
+        self.timing_table.setRowCount(len(rows))
+        for row, entry in enumerate(rows):
+            values = [
+                str(entry['line_no']), entry['text'], str(entry['runs']), str(entry['failures']),
+                f"{entry['late_mean_us']:.1f}", f"{entry['late_max_us']:.1f}",
+                f"{entry['duration_min_ms']:.3f}", f"{entry['duration_mean_ms']:.3f}",
+                f"{entry['duration_max_ms']:.3f}",
+            ]
+            for column, value in enumerate(values):
+                self.timing_table.setItem(row, column, QTableWidgetItem(value))
+        if player.is_alive():
+            self.status_label.setText(f"运行中, 已完成 {player.loops_done} 次循环")
+            return
+        self.refresh_timer.stop()
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        if player.error:
+            self.status_label.setText(f"已停止: {player.error}")
+        else:
+            self.status_label.setText(f"已完成 {player.loops_done} 次循环")
+            
+    def done(self, result):
+        self.stop()
+        super().done(result)
+
+class ModemTransferDialog(QDialog):
+    """XMODEM / YMODEM 文件发送与接收
+
+    传输在工作线程中通过引擎的字节通道进行, 对话框定时读取传输统计。
+    """
+    def __init__(self, engine, receive=False, mode=None, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.receive = receive
+        self.transfer = None
+        self.thread = None
+        self.channel = None
+        self.result = None
+        
+        self.setWindowTitle("XMODEM/YMODEM 接收" if receive else "XMODEM/YMODEM 发送")
+        self.resize(520, 200)
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(MODES)
+        if mode in MODES:
+            self.mode_combo.setCurrentText(mode)
+        form.addRow("协议:", self.mode_combo)
+        path_layout = QHBoxLayout()
+        self.path_edit = QLineEdit()
+        browse_button = QPushButton("浏览...")
+        browse_button.clicked.connect(self.browse)
+        path_layout.addWidget(self.path_edit)
+        path_layout.addWidget(browse_button)
+        form.addRow("保存到:" if receive else "文件:", path_layout)
+        layout.addLayout(form)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.start_button = QPushButton("开始")
+        self.start_button.clicked.connect(self.start)
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        button_layout.addWidget(self.start_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        
+    @property
+    def mode(self):
+        return self.mode_combo.currentText()
+        
+    def browse(self):
+        if not self.receive:
+            paths, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", "所有文件 (*)")
+            if paths:
+                self.path_edit.setText(";".join(paths))
+        elif self.mode == YMODEM:
+            path = QFileDialog.getExistingDirectory(self, "选择保存目录")
+            if path:
+                self.path_edit.setText(path)
+        else:
+            path, _ = QFileDialog.getSaveFileName(self, "保存文件", "", "所有文件 (*)")
+            if path:
+                self.path_edit.setText(path)
+                
+    def start(self):
+        """在工作线程中开始传输"""
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        path = self.path_edit.text().strip()
+        if not path:
+            QMessageBox.warning(self, "警告", "请选择文件")
+            return
+        paths = [p for p in path.split(";") if p]
+        if not self.receive and self.mode != YMODEM and len(paths) != 1:
+            QMessageBox.warning(self, "警告", "XMODEM 一次只能发送一个文件")
+            return
+        self.channel = self.engine.open_channel()
+        self.transfer = ModemTransfer(self.channel, self.mode)
+        self.result = None
+        
+        def run():
+            try:
+                if self.receive:
+                    self.transfer.receive(path)
+                else:
+                    self.transfer.send(paths)
+            except Exception as e:
+                self.result = e
+                
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        self.start_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText("等待对端...")
+        self.refresh_timer.start(200)
+        
+    def cancel(self):
+        if self.transfer:
+            self.transfer.cancel()
+            
+    def refresh(self):
+        """显示传输进度, 结束后报告结果"""
+        stats = self.transfer.stats
+        if stats.file_size:
+            self.progress_bar.setValue(int(min(stats.file_bytes / stats.file_size, 1.0) * 1000))
+        if stats.blocks:
+            self.status_label.setText(
+                f"{stats.file_name}  {stats.file_bytes} 字节  {stats.rate / 1024:.1f} KB/s  "
+                f"重传 {stats.retries}  降块 {stats.downshifts}"
+            )
+        if self.thread.is_alive():
+            return
+        self.refresh_timer.stop()
+        self.channel.close()
+        self.start_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        if isinstance(self.result, TransferCancelled):
+            self.status_label.setText(f"已取消: {self.result}")
+        elif self.result is not None:
+            self.status_label.setText(f"传输失败: {self.result}")
+        else:
+            self.progress_bar.setValue(1000)
+            self.status_label.setText(
+                f"完成: {len(stats.files)} 个文件, {stats.total_bytes} 字节, {stats.elapsed:.2f} 秒, "
+                f"{stats.rate / 1024:.1f} KB/s, 重传 {stats.retries} 次"
+            )
+            
+    def done(self, result):
+        if self.thread and self.thread.is_alive():
+            self.transfer.cancel()
+            self.thread.join(2.0)
+            self.channel.close()
+        super().done(result)
+
+class LatencyDialog(QDialog):
+    """请求/应答往返时间测量
+
+    测量在引擎的 LatencyProbe 线程中进行, 往返时间在 I/O 线程中取时间戳;
+    对话框定时显示 p50/p99/最大值和直方图, 结果可导出为 CSV。
+    """
+    MATCH_MODES = ["前缀", "正则", "长度"]
+    
+    def __init__(self, engine, settings, request="", parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.settings = settings
+        self.probe = None
+        
+        self.setWindowTitle("往返时间测量")
+        self.resize(720, 560)
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        
+        request_layout = QHBoxLayout()
+        self.request_edit = QLineEdit(settings.value("latency_request", request))
+        self.request_hex_check = QCheckBox("十六进制")
+        self.request_hex_check.setChecked(settings.value("latency_request_hex", False, type=bool))
+        request_layout.addWidget(self.request_edit)
+        request_layout.addWidget(self.request_hex_check)
+        form.addRow("请求:", request_layout)
+        
+        match_layout = QHBoxLayout()
+        self.match_combo = QComboBox()
+        self.match_combo.addItems(self.MATCH_MODES)
+        self.match_combo.setCurrentIndex(settings.value("latency_match_mode", 0, type=int))
+        self.pattern_edit = QLineEdit(settings.value("latency_pattern", ""))
+        self.pattern_edit.setPlaceholderText("前缀支持 \\r \\n \\xNN 转义")
+        self.length_spin = QSpinBox()
+        self.length_spin.setRange(0, 65536)
+        self.length_spin.setSpecialValueText("不限")
+        self.length_spin.setSuffix(" 字节")
+        self.length_spin.setValue(settings.value("latency_length", 0, type=int))
+        match_layout.addWidget(self.match_combo)
+        match_layout.addWidget(self.pattern_edit)
+        match_layout.addWidget(QLabel("长度:"))
+        match_layout.addWidget(self.length_spin)
+        form.addRow("应答匹配:", match_layout)
+        
+        run_layout = QHBoxLayout()
+        self.iterations_spin = QSpinBox()
+        self.iterations_spin.setRange(1, 10000000)
+        self.iterations_spin.setValue(settings.value("latency_iterations", 1000, type=int))
+        self.timeout_spin = QDoubleSpinBox()
+        self.timeout_spin.setRange(1, 600000)
+        self.timeout_spin.setSuffix(" ms")
+        self.timeout_spin.setValue(settings.value("latency_timeout", 1000, type=float))
+        self.interval_spin = QDoubleSpinBox()
+        self.interval_spin.setRange(0, 600000)
+        self.interval_spin.setDecimals(1)
+        self.interval_spin.setSuffix(" ms")
+        self.interval_spin.setValue(settings.value("latency_interval", 0, type=float))
+        run_layout.addWidget(QLabel("次数:"))
+        run_layout.addWidget(self.iterations_spin)
+        run_layout.addWidget(QLabel("超时:"))
+        run_layout.addWidget(self.timeout_spin)
+        run_layout.addWidget(QLabel("间隔:"))
+        run_layout.addWidget(self.interval_spin)
+        run_layout.addStretch()
+        form.addRow(run_layout)
+        layout.addLayout(form)
+        
+        control_layout = QHBoxLayout()
+        self.start_button = QPushButton("开始")
+        self.start_button.clicked.connect(self.start)
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        self.export_button = QPushButton("导出 CSV...")
+        self.export_button.setEnabled(False)
+        self.export_button.clicked.connect(self.export_csv)
+        control_layout.addWidget(self.start_button)
+        control_layout.addWidget(self.stop_button)
+        control_layout.addWidget(self.export_button)
+        self.status_label = QLabel("")
+        control_layout.addWidget(self.status_label)
+        control_layout.addStretch()
+        layout.addLayout(control_layout)
+        
+        # 统计和直方图
+        self.report_view = QTextEdit()
+        self.report_view.setReadOnly(True)
+        self.report_view.setLineWrapMode(QTextEdit.NoWrap)
+        self.report_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.report_view)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        
+    def build_matcher(self):
+        """按界面选项创建 ResponseMatcher, 参数无效时抛出 ValueError"""
+        mode = self.match_combo.currentIndex()
+        pattern = self.pattern_edit.text()
+        length = self.length_spin.value()
+        if mode == 0:
+            if not pattern:
+                raise ValueError("请输入应答前缀")
+            return ResponseMatcher(prefix=unescape(pattern), length=length)
+        if mode == 1:
+            if not pattern:
+                raise ValueError("请输入应答正则")
+            try:
+                return ResponseMatcher(regex=pattern.encode('utf-8'))
+            except re.error as e:
+                raise ValueError(f"正则表达式错误: {e}") from e
+        if not length:
+            raise ValueError("请输入应答长度")
+        return ResponseMatcher(length=length)
+        
+    def start(self):
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        payload = encode_payload(self.request_edit.text(), self.request_hex_check.isChecked())
+        if not payload:
+            QMessageBox.warning(self, "警告", "请输入请求数据")
+            return
+        try:
+            matcher = self.build_matcher()
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.stop()
+        self.probe = LatencyProbe(
+            self.engine, payload, matcher, self.iterations_spin.value(),
+            timeout=self.timeout_spin.value() / 1000, interval=self.interval_spin.value() / 1000
+        )
+        self.probe.start()
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.export_button.setEnabled(False)
+        self.refresh_timer.start(300)
+        
+    def stop(self):
+        if self.probe:
+            self.probe.stop()
+            self.refresh()
+            
+    def refresh(self):
+        """显示进度、统计和直方图"""
+        probe = self.probe
+        if probe is None:
+            return
+        self.report_view.setPlainText(format_latency(probe))
+        if probe.is_alive():
+            self.status_label.setText(f"运行中 {probe.completed}/{probe.iterations}")
+            return
+        self.refresh_timer.stop()
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.export_button.setEnabled(bool(probe.samples))
+        if probe.error:
+            self.status_label.setText(f"已停止: {probe.error}")
+        else:
+            self.status_label.setText(f"已完成 {probe.completed} 次")
+            
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出 CSV", "latency.csv", "CSV 文件 (*.csv)")
+        if not path:
+            return
+        try:
+            self.probe.write_csv(path)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"无法导出: {str(e)}")
+            
+    def done(self, result):
+        self.stop()
+        self.settings.setValue("latency_request", self.request_edit.text())
+        self.settings.setValue("latency_request_hex", self.request_hex_check.isChecked())
+        self.settings.setValue("latency_match_mode", self.match_combo.currentIndex())
+        self.settings.setValue("latency_pattern", self.pattern_edit.text())
+        self.settings.setValue("latency_length", self.length_spin.value())
+        self.settings.setValue("latency_iterations", self.iterations_spin.value())
+        self.settings.setValue("latency_timeout", self.timeout_spin.value())
+        self.settings.setValue("latency_interval", self.interval_spin.value())
+        super().done(result)
+
+class FrameViewDialog(QDialog):
+    """按帧显示接收数据
+
+    分帧和校验都在接收线程中进行(deframer.DeframingListener), 完整的帧连同
+    首字节的采集时间戳和校验结果放入队列, 界面定时取出显示, 表格只保留最近的
+    MAX_ROWS 帧。
+    """
+    MAX_ROWS = 5000
+    SPEC_EXAMPLES = [
+        "delimiter:0d0a", "fixed:16", "length:offset=2,size=2,order=big,adjust=0,header=aa55",
+        "slip", "cobs", "idle:5",
+    ]
+    
+    def __init__(self, engine, settings, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.settings = settings
+        self.listener = None
+        self.pending = deque()
+        self.checksum = None
+        self.checksum_errors = 0
+        
+        self.setWindowTitle("帧解析")
+        self.resize(820, 560)
+        layout = QVBoxLayout(self)
+        
+        control_layout = QHBoxLayout()
+        self.spec_combo = QComboBox()
+        self.spec_combo.setEditable(True)
+        self.spec_combo.addItems(self.SPEC_EXAMPLES)
+        self.spec_combo.setCurrentText(settings.value("deframe_spec", self.SPEC_EXAMPLES[0]))
+        self.spec_combo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.start_button = QPushButton("开始")
+        self.start_button.clicked.connect(self.start)
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        self.checksum_combo = QComboBox()
+        self.checksum_combo.addItem("不校验", None)
+        for name in checksum_names():
+            self.checksum_combo.addItem(name, name)
+        index = self.checksum_combo.findData(settings.value("deframe_checksum", None))
+        self.checksum_combo.setCurrentIndex(max(index, 0))
+        self.clear_button = QPushButton("清空")
+        self.clear_button.clicked.connect(lambda: self.table.setRowCount(0))
+        control_layout.addWidget(QLabel("分帧方式:"))
+        control_layout.addWidget(self.spec_combo)
+        control_layout.addWidget(self.checksum_combo)
+        control_layout.addWidget(self.start_button)
+        control_layout.addWidget(self.stop_button)
+        control_layout.addWidget(self.clear_button)
+        layout.addLayout(control_layout)
+        
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["时间", "长度", "校验", "数据"])
+        for column in range(3):
+            self.table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.table)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        
+    def start(self):
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        try:
+            deframer = parse_deframer(self.spec_combo.currentText())
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", f"分帧参数错误: {e}")
+            return
+        self.stop()
+        checksum_name = self.checksum_combo.currentData()
+        self.checksum = parse_checksum(checksum_name) if checksum_name else None
+        self.checksum_errors = 0
+        # deque.append 是线程安全的, 接收线程直接入队; 收发统计的帧数只来自本视图
+        self.listener = DeframingListener(deframer, self.on_frame, stats=self.engine.stats)
+        self.engine.add_listener(self.listener)
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.refresh_timer.start(50)
         
     def stop(self):
-        self.running = False
-        self.wait()
+        if self.listener is None:
+            return
+        self.engine.remove_listener(self.listener)
+        self.listener.flush()
+        self.refresh()
+        self.refresh_timer.stop()
+        self.listener = None
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        
+    def on_frame(self, data, start_ns, end_ns):
+        """在接收线程中调用: 校验后入队, 未选择校验算法时结果为 None"""
+        checksum = self.checksum
+        ok = checksum.verify(data) if checksum else None
+        self.pending.append((data, start_ns, ok))
+        
+    def refresh(self):
+        """把队列中的帧追加到表格"""
+        listener = self.listener
+        if listener is None:
+            return
+        listener.poll()
+        frames = []
+        while self.pending:
+            frames.append(self.pending.popleft())
+        if frames:
+            self.checksum_errors += sum(1 for frame in frames if frame[2] is False)
+            frames = frames[-self.MAX_ROWS:]
+            table = self.table
+            table.setUpdatesEnabled(False)
+            excess = table.rowCount() + len(frames) - self.MAX_ROWS
+            for _ in range(max(excess, 0)):
+                table.removeRow(0)
+            for data, start_ns, ok in frames:
+                row = table.rowCount()
+                table.insertRow(row)
+                table.setItem(row, 0, QTableWidgetItem(format_capture_time(start_ns)))
+                table.setItem(row, 1, QTableWidgetItem(str(len(data))))
+                check_item = QTableWidgetItem("" if ok is None else "正确" if ok else "错误")
+                if ok is False:
+                    check_item.setForeground(QBrush(QColor(200, 0, 0)))
+                table.setItem(row, 2, check_item)
+                table.setItem(row, 3, QTableWidgetItem(data.hex(' ').upper()))
+            table.setUpdatesEnabled(True)
+            table.scrollToBottom()
+        deframer = listener.deframer
+        self.status_label.setText(f"帧数: {deframer.frames}  校验错误: {self.checksum_errors}  "
+                                  f"丢弃: {deframer.dropped} 字节  未成帧: {deframer.pending} 字节")
+        
+    def done(self, result):
+        self.stop()
+        self.settings.setValue("deframe_spec", self.spec_combo.currentText())
+        self.settings.setValue("deframe_checksum", self.checksum_combo.currentData())
+        super().done(result)
+
+class ModbusDialog(QDialog):
+    """Modbus RTU 监视和主站轮询
+
+    监视: 按当前串口参数计算的 3.5 字符空闲间隔在接收线程中分帧、校验 CRC
+    并解码, 界面定时把解码结果追加到表格。主站: ModbusMaster 线程按周期轮询
+    表格中的寄存器块, 界面定时显示最近读到的值和每个从站的统计。串口关闭时
+    on_connection_changed() 停止监视和轮询。
+    """
+    MAX_ROWS = 5000
+    POLL_COLUMNS = ["从站", "功能码", "地址", "数量", "值"]
+    
+    def __init__(self, engine, settings, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.settings = settings
+        self.monitor = None
+        # 开始监视时按当时的串口参数计算, 串口关闭后 engine.port 为 None
+        self.monitor_gap_ms = 0.0
+        self.master = None
+        self.pending = deque()
+        
+        self.setWindowTitle("Modbus RTU")
+        self.resize(900, 620)
+        layout = QVBoxLayout(self)
+        tabs = QTabWidget()
+        layout.addWidget(tabs)
+        
+        # 监视页
+        monitor_page = QWidget()
+        monitor_layout = QVBoxLayout(monitor_page)
+        control_layout = QHBoxLayout()
+        self.monitor_button = QPushButton("开始监视")
+        self.monitor_button.clicked.connect(self.toggle_monitor)
+        self.clear_button = QPushButton("清空")
+        self.clear_button.clicked.connect(lambda: self.frame_table.setRowCount(0))
+        self.monitor_status_label = QLabel("")
+        control_layout.addWidget(self.monitor_button)
+        control_layout.addWidget(self.clear_button)
+        control_layout.addWidget(self.monitor_status_label)
+        control_layout.addStretch()
+        monitor_layout.addLayout(control_layout)
+        self.frame_table = QTableWidget(0, 6)
+        self.frame_table.setHorizontalHeaderLabels(["时间", "从站", "功能", "类型", "CRC", "内容"])
+        for column in range(5):
+            self.frame_table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        self.frame_table.horizontalHeader().setStretchLastSection(True)
+        self.frame_table.verticalHeader().setVisible(False)
+        self.frame_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        monitor_layout.addWidget(self.frame_table)
+        tabs.addTab(monitor_page, "监视")
+        
+        # 主站页
+        master_page = QWidget()
+        master_layout = QVBoxLayout(master_page)
+        master_control = QHBoxLayout()
+        self.interval_spin = QDoubleSpinBox()
+        self.interval_spin.setRange(1, 3600000)
+        self.interval_spin.setDecimals(0)
+        self.interval_spin.setSuffix(" ms")
+        self.interval_spin.setValue(settings.value("modbus_interval", 1000, type=float))
+        self.timeout_spin = QDoubleSpinBox()
+        self.timeout_spin.setRange(1, 60000)
+        self.timeout_spin.setDecimals(0)
+        self.timeout_spin.setSuffix(" ms")
+        self.timeout_spin.setValue(settings.value("modbus_timeout", 500, type=float))
+        add_button = QPushButton("添加")
+        add_button.clicked.connect(lambda: self.add_poll_row("1:3:0:10"))
+        remove_button = QPushButton("删除")
+        remove_button.clicked.connect(lambda: self.poll_table.removeRow(self.poll_table.currentRow()))
+        self.master_button = QPushButton("开始轮询")
+        self.master_button.clicked.connect(self.toggle_master)
+        master_control.addWidget(QLabel("周期:"))
+        master_control.addWidget(self.interval_spin)
+        master_control.addWidget(QLabel("超时:"))
+        master_control.addWidget(self.timeout_spin)
+        master_control.addWidget(add_button)
+        master_control.addWidget(remove_button)
+        master_control.addWidget(self.master_button)
+        master_control.addStretch()
+        master_layout.addLayout(master_control)
+        self.poll_table = QTableWidget(0, len(self.POLL_COLUMNS))
+        self.poll_table.setHorizontalHeaderLabels(self.POLL_COLUMNS)
+        for column in range(4):
+            self.poll_table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        self.poll_table.horizontalHeader().setStretchLastSection(True)
+        self.poll_table.verticalHeader().setVisible(False)
+        master_layout.addWidget(self.poll_table)
+        self.stats_view = QTextEdit()
+        self.stats_view.setReadOnly(True)
+        self.stats_view.setLineWrapMode(QTextEdit.NoWrap)
+        self.stats_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.stats_view.setMaximumHeight(160)
+        master_layout.addWidget(self.stats_view)
+        tabs.addTab(master_page, "主站")
+        for text in filter(None, settings.value("modbus_items", "1:3:0:10").split(';')):
+            self.add_poll_row(text)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(100)
+        
+    def frame_gap_ms(self):
+        port = self.engine.port
+        return frame_gap_ms(port.baudrate, port.bytesize, port.parity, port.stopbits)
+        
+    def add_poll_row(self, text):
+        row = self.poll_table.rowCount()
+        self.poll_table.insertRow(row)
+        for column, value in enumerate(text.split(':')[:4]):
+            self.poll_table.setItem(row, column, QTableWidgetItem(value))
+        value_item = QTableWidgetItem("")
+        value_item.setFlags(value_item.flags() & ~Qt.ItemIsEditable)
+        self.poll_table.setItem(row, 4, value_item)
+        
+    def poll_texts(self):
+        """表格中每一行的 "从站:功能码:地址:数量" """
+        texts = []
+        for row in range(self.poll_table.rowCount()):
+            cells = [self.poll_table.item(row, column) for column in range(4)]
+            texts.append(':'.join(cell.text().strip() if cell else '' for cell in cells))
+        return texts
+        
+    def toggle_monitor(self):
+        if self.monitor:
+            self.engine.remove_listener(self.monitor.listener)
+            self.monitor = None
+            self.monitor_button.setText("开始监视")
+            return
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        # deque.append 是线程安全的, 接收线程直接入队
+        self.monitor_gap_ms = self.frame_gap_ms()
+        self.monitor = ModbusMonitor(self.monitor_gap_ms, self.pending.append)
+        self.engine.add_listener(self.monitor.listener)
+        self.monitor_button.setText("停止监视")
+        
+    def toggle_master(self):
+        if self.master:
+            self.master.stop()
+            self.master = None
+            self.master_button.setText("开始轮询")
+            return
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        try:
+            items = [PollItem.parse(text) for text in self.poll_texts()]
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        if not items:
+            QMessageBox.warning(self, "警告", "请添加轮询项")
+            return
+        self.master = ModbusMaster(
+            self.engine, items, interval=self.interval_spin.value() / 1000,
+            timeout=self.timeout_spin.value() / 1000, gap_ms=self.frame_gap_ms()
+        )
+        self.master.start()
+        self.master_button.setText("停止轮询")
+        
+    def refresh(self):
+        """显示新解码的帧、轮询的值和统计"""
+        monitor = self.monitor
+        if monitor:
+            monitor.poll()
+            frames = []
+            while self.pending:
+                frames.append(self.pending.popleft())
+            if frames:
+                self.append_frames(frames[-self.MAX_ROWS:])
+            self.monitor_status_label.setText(f"帧数: {monitor.frames}  CRC 错误: {monitor.crc_errors}  "
+                                              f"帧间隔: {self.monitor_gap_ms:.2f}ms")
+        master = self.master
+        if master:
+            for row, item in enumerate(master.items):
+                cell = self.poll_table.item(row, 4)
+                if cell is None:
+                    continue
+                if item.error:
+                    cell.setText(item.error)
+                elif item.values is not None:
+                    cell.setText(' '.join(map(str, item.values)))
+            self.stats_view.setPlainText(format_master_stats(master))
+            if not master.is_alive():
+                if master.error:
+                    self.stats_view.append(f"轮询已停止: {master.error}")
+                self.master = None
+                self.master_button.setText("开始轮询")
+                
+    def append_frames(self, frames):
+        table = self.frame_table
+        table.setUpdatesEnabled(False)
+        excess = table.rowCount() + len(frames) - self.MAX_ROWS
+        for _ in range(max(excess, 0)):
+            table.removeRow(0)
+        for frame in frames:
+            row = table.rowCount()
+            table.insertRow(row)
+            crc_item = QTableWidgetItem("正确" if frame.crc_ok else "错误")
+            if not frame.crc_ok:
+                crc_item.setForeground(QBrush(QColor(200, 0, 0)))
+            cells = [
+                format_capture_time(frame.timestamp_ns), str(frame.slave), frame.function_name,
+                KIND_NAMES[frame.kind], None, frame.describe(),
+            ]
+            for column, text in enumerate(cells):
+                table.setItem(row, column, crc_item if text is None else QTableWidgetItem(text))
+        table.setUpdatesEnabled(True)
+        table.scrollToBottom()
+        
+    def on_connection_changed(self):
+        """串口关闭时停止监视和轮询"""
+        if self.engine.is_open:
+            return
+        if self.monitor:
+            self.toggle_monitor()
+        if self.master:
+            self.toggle_master()
+        
+    def done(self, result):
+        self.refresh_timer.stop()
+        if self.monitor:
+            self.toggle_monitor()
+        if self.master:
+            self.toggle_master()
+        self.settings.setValue("modbus_items", ';'.join(self.poll_texts()))
+        self.settings.setValue("modbus_interval", self.interval_spin.value())
+        self.settings.setValue("modbus_timeout", self.timeout_spin.value())
+        super().done(result)
+
+class PlotDialog(QDialog):
+    """实时曲线面板
+
+    数值在接收线程中解析(plot_data.PlotFeed)并写入每个通道的抽取环形缓冲区,
+    界面按固定帧率重绘, 接收路径不等待界面。串口重新打开后自动重新挂接。
+    """
+    REFRESH_MS = 33
+    
+    def __init__(self, monitor, settings, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.settings = settings
+        self.store = PlotStore()
+        self.feed = None
+        self.last_samples = 0
+        self.last_refresh = time.monotonic()
+        
+        self.setWindowTitle("实时曲线")
+        self.resize(900, 520)
+        layout = QVBoxLayout(self)
+        control_layout = QHBoxLayout()
+        self.pattern_edit = QLineEdit(settings.value("plot_pattern", ""))
+        self.pattern_edit.setPlaceholderText("默认解析 名称=数值 或 名称:数值, 如 T=23.4,H=55")
+        self.window_spin = QDoubleSpinBox()
+        self.window_spin.setRange(0.1, 3600)
+        self.window_spin.setDecimals(1)
+        self.window_spin.setSuffix(" s")
+        self.window_spin.setValue(settings.value("plot_window", 10, type=float))
+        self.start_button = QPushButton("开始")
+        self.start_button.clicked.connect(self.toggle)
+        self.pause_check = QCheckBox("暂停")
+        self.pause_check.stateChanged.connect(self.on_pause_changed)
+        clear_button = QPushButton("清空")
+        clear_button.clicked.connect(self.store.clear)
+        control_layout.addWidget(QLabel("模式:"))
+        control_layout.addWidget(self.pattern_edit)
+        control_layout.addWidget(QLabel("窗口:"))
+        control_layout.addWidget(self.window_spin)
+        control_layout.addWidget(self.start_button)
+        control_layout.addWidget(self.pause_check)
+        control_layout.addWidget(clear_button)
+        layout.addLayout(control_layout)
+        
+        self.plot_view = PlotView(self.store)
+        self.plot_view.window_s = self.window_spin.value()
+        self.window_spin.valueChanged.connect(lambda value: setattr(self.plot_view, 'window_s', value))
+        layout.addWidget(self.plot_view)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        monitor.connection_changed.connect(self.attach)
+        
+    def toggle(self):
+        if self.feed:
+            self.monitor.engine.remove_listener(self.feed.listener)
+            self.feed = None
+            self.refresh_timer.stop()
+            self.start_button.setText("开始")
+            return
+        try:
+            parser = LineParser(self.pattern_edit.text().strip() or None)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.feed = PlotFeed(self.store, parser)
+        self.attach()
+        self.start_button.setText("停止")
+        self.refresh_timer.start(self.REFRESH_MS)
+        
+    def attach(self):
+        """把解析回调挂到当前打开的串口上"""
+        if self.feed and self.monitor.engine.is_open:
+            self.monitor.engine.remove_listener(self.feed.listener)
+            self.monitor.engine.add_listener(self.feed.listener)
+            
+    def on_pause_changed(self):
+        self.plot_view.frozen_end_ns = time.perf_counter_ns() if self.pause_check.isChecked() else None
+        self.plot_view.update()
+        
+    def refresh(self):
+        if not self.pause_check.isChecked():
+            self.plot_view.update()
+        now = time.monotonic()
+        if now - self.last_refresh >= 1:
+            samples = self.store.samples
+            rate = (samples - self.last_samples) / (now - self.last_refresh)
+            self.last_samples, self.last_refresh = samples, now
+            self.status_label.setText(f"通道: {len(self.store.channels)}  行: {self.feed.lines}  "
+                                      f"采样: {samples}  {rate:.0f} 采样/秒")
+            
+    def done(self, result):
+        if self.feed:
+            self.toggle()
+        self.settings.setValue("plot_pattern", self.pattern_edit.text())
+        self.settings.setValue("plot_window", self.window_spin.value())
+        super().done(result)
+
+class StatsDialog(QDialog):
+    """收发统计面板
+
+    计数器由引擎在接收/发送线程中累加(serial_engine.TrafficStats), 主窗口每秒
+    取样一次并通过 traffic_sampled 信号送到这里显示, 面板不增加接收路径的开销。
+    """
+    RATE_ROWS = (("接收 (B/s)", 'rx_bytes', 'rx_utilisation'),
+                 ("发送 (B/s)", 'tx_bytes', 'tx_utilisation'),
+                 ("帧 (帧/秒)", 'frames', None))
+    
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        
+        self.setWindowTitle("收发统计")
+        self.resize(620, 300)
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(len(self.RATE_ROWS), 5)
+        self.table.setHorizontalHeaderLabels(["累计", "瞬时", "平均", "峰值", "线路利用率"])
+        self.table.setVerticalHeaderLabels([row[0] for row in self.RATE_ROWS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for row in range(self.table.rowCount()):
+            for column in range(self.table.columnCount()):
+                item = QTableWidgetItem("-")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        layout.addWidget(self.table)
+        self.error_label = QLabel("")
+        layout.addWidget(self.error_label)
+        note = QLabel(f"平均为最近 {monitor.engine.stats.average_window:.0f} 秒; "
+                      "帧数在启用帧解析、Modbus 监视或实时曲线时统计")
+        note.setStyleSheet("color: #6c757d;")
+        layout.addWidget(note)
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        reset_button = QPushButton("重置")
+        reset_button.clicked.connect(self.reset)
+        export_button = QPushButton("导出 CSV...")
+        export_button.clicked.connect(self.export_csv)
+        button_layout.addWidget(reset_button)
+        button_layout.addWidget(export_button)
+        layout.addLayout(button_layout)
+        
+        monitor.traffic_sampled.connect(self.show_stats)
+        if monitor.traffic is not None:
+            self.show_stats(monitor.traffic)
+            
+    def show_stats(self, stats):
+        if not self.isVisible():
+            return
+        for row, (_, name, utilisation) in enumerate(self.RATE_ROWS):
+            decimals = 1 if name == 'frames' else 0
+            values = [f"{stats[name]}", f"{stats[name + '_rate']:.{decimals}f}",
+                      f"{stats[name + '_avg']:.{decimals}f}", f"{stats[name + '_peak']:.{decimals}f}"]
+            if utilisation is None or stats[utilisation] is None:
+                values.append("-")
+            else:
+                values.append(f"{stats[utilisation] * 100:.1f}%")
+            for column, text in enumerate(values):
+                self.table.item(row, column).setText(text)
+        self.error_label.setText(
+            f"错误: 接收 {stats['rx_errors']}  发送 {stats['tx_errors']}  发送队列满 {stats['tx_rejected']}  "
+            f"接收缓冲区丢弃 {stats['rx_dropped']} 字节    统计时长 {stats['elapsed']:.0f} 秒"
+        )
+        
+    def reset(self):
+        self.monitor.reset_traffic_stats()
+        
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出 CSV", "traffic.csv", "CSV 文件 (*.csv)")
+        if not path:
+            return
+        try:
+            self.monitor.engine.stats.write_csv(path)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"无法导出: {str(e)}")
+
+class EngineEvents(QObject):
+    """把引擎在接收/发送线程中的回调转发到界面线程"""
+    error_occurred = pyqtSignal(str)
+    connection_closed = pyqtSignal()
+    data_sent = pyqtSignal(int)
+    send_failed = pyqtSignal(str)
 
 class SerialMonitor(QMainWindow):
-    """串口调试工具主窗口"""
-    def __init__(self):
+    """串口调试工具主窗口
+
+    也作为 MultiPortWindow 中的一个会话标签页: io_loop 为多个会话共用的接收
+    线程, frames 为共用的数据帧库; 单独使用时均为 None。
+    """
+    # 串口打开或关闭
+    connection_changed = pyqtSignal()
+    traffic_sampled = pyqtSignal(dict)
+    
+    def __init__(self, io_loop=None, frames=None):
         super().__init__()
         self.serial_port = None
-        self.receive_thread = None
         
-        # 数据帧功能相关变量
-        self.data_frames = []
+        # 接收环形缓冲区, 由界面刷新定时器批量取出
+        self.rx_buffer = RxRingBuffer()
+        # 已经在状态栏报告过的溢出字节数, 只在丢弃量增加时提示
+        self.rx_dropped_reported = 0
+        
+        # 实时曲线和收发统计面板, 第一次打开时创建
+        self.plot_dialog = None
+        self.stats_dialog = None
+        
+        # 最近一次收发统计取样, 由 traffic_timer 每秒更新
+        self.traffic = None
+        
+        # 串口引擎: 接收线程、发送和录制, 捕获文件由接收线程直接写入
+        self.engine_events = EngineEvents(self)
+        self.engine_events.error_occurred.connect(self.on_serial_error)
+        self.engine_events.connection_closed.connect(self.on_connection_closed)
+        self.engine_events.data_sent.connect(self.on_data_sent)
+        self.engine_events.send_failed.connect(self.on_send_failed)
+        self.engine = SerialEngine(
+            ring_buffer=self.rx_buffer,
+            on_error=self.engine_events.error_occurred.emit,
+            on_closed=self.engine_events.connection_closed.emit,
+            on_sent=lambda request: self.engine_events.data_sent.emit(request.written),
+            on_send_error=self.engine_events.send_failed.emit,
+            io_loop=io_loop
+        )
+        
+        # 数据帧库: 按 ID 和名称索引, 保存编码好的字节, 启动时从磁盘加载
+        self.frame_table = None
+        if frames is not None:
+            self.data_frames = frames
+        else:
+            self.data_frames = FrameLibrary(default_library_path())
+            try:
+                self.data_frames.load()
+            except (OSError, FrameLibraryError) as e:
+                print(f"无法加载数据帧库: {e}")
+        
+        # 接收显示格式化器: 文本增量解码 / 十六进制批量格式化 / 采集时间戳
+        self.rx_formatter = ReceiveFormatter()
+        
+        # 会话接收数据检索索引(由接收线程直接写入, 不受接收缓冲区溢出影响),
+        # 以及 RX 偏移到显示行号的检查点
+        self.search_index = SessionSearchIndex()
+        # 本次打开串口时索引中已有的字节数, 接收缓冲区的流位置加上它即为 RX 偏移
+        self.rx_offset_base = 0
+        self.line_map_offsets = []
+        self.line_map = []
+        self.search_results = []
+        self.search_position = -1
         
         # 加载用户设置
         self.settings = QSettings("SerialMonitor", "Settings")
         self.load_settings()
+        self.search_index.max_size = self.rx_search_mb * 1024 * 1024
         
         self.init_ui()
         self.refresh_ports()
         
         # 设置定时器定期刷新端口列表
         self.port_timer = QTimer(self)
-        self.port_timer.timeout.connect(self.refresh_ports)
+        self.port_timer.timeout.connect(self.on_port_timer)
         self.port_timer.start(5000)  # 每5秒刷新一次
         
 
@@ -101,18 +1667,22 @@ class SerialMonitor(QMainWindow):
         # 添加状态栏
         self.statusBar().showMessage("就绪")
         
-        # 初始化数据计数器
+        # 已显示的接收字节数; 状态栏的收发字节数取自引擎的收发统计, 清空时记下基数
         self.received_bytes_count = 0
-        self.sent_bytes_count = 0
+        self.rx_bytes_base = 0
+        self.tx_bytes_base = 0
         
         # 创建状态栏标签
         self.received_bytes_label = QLabel("接收: 0 字节")
         self.sent_bytes_label = QLabel("发送: 0 字节")
+        self.tx_status_label = QLabel("发送队列: 0")
         
         # 将标签添加到状态栏
         self.statusBar().addPermanentWidget(self.received_bytes_label)
         self.statusBar().addPermanentWidget(QLabel("   "))  # 间隔
         self.statusBar().addPermanentWidget(self.sent_bytes_label)
+        self.statusBar().addPermanentWidget(QLabel("   "))  # 间隔
+        self.statusBar().addPermanentWidget(self.tx_status_label)
         
         # 顶部控制区域 - 采用卡片式布局
         control_group = QGroupBox("串口设置")
@@ -143,8 +1713,7 @@ class SerialMonitor(QMainWindow):
         baudrate_label = QLabel("波特率:")
         baudrate_label.setFixedWidth(60)
         self.baudrate_combo = QComboBox()
-        common_baudrates = [9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
-        for baudrate in common_baudrates:
+        for baudrate in COMMON_BAUDRATES:
             self.baudrate_combo.addItem(str(baudrate), baudrate)
         self.baudrate_combo.setCurrentText("115200")
         self.baudrate_combo.setMinimumWidth(120)
@@ -287,7 +1856,9 @@ class SerialMonitor(QMainWindow):
         receive_control_layout = QHBoxLayout()
         receive_control_layout.setSpacing(15)
         self.receive_hex_check = QCheckBox("十六进制显示")
+        self.receive_hex_check.stateChanged.connect(self.on_receive_mode_changed)
         self.receive_timestamp_check = QCheckBox("显示时间戳")
+        self.receive_timestamp_split_check = QCheckBox("逐行时间戳")
         self.auto_scroll_check = QCheckBox("自动滚动")
         self.auto_scroll_check.setChecked(True)
         self.clear_receive_button = QPushButton("清空接收")
@@ -296,19 +1867,53 @@ class SerialMonitor(QMainWindow):
         
         receive_control_layout.addWidget(self.receive_hex_check)
         receive_control_layout.addWidget(self.receive_timestamp_check)
+        receive_control_layout.addWidget(self.receive_timestamp_split_check)
         receive_control_layout.addWidget(self.auto_scroll_check)
         receive_control_layout.addStretch()
         receive_control_layout.addWidget(self.clear_receive_button)
         
         receive_layout.addLayout(receive_control_layout)
         
-        # 接收文本框 - 使用更现代的字体和样式
-        self.receive_text = QTextEdit()
-        self.receive_text.setReadOnly(True)
-        self.receive_text.setLineWrapMode(QTextEdit.WidgetWidth)
+        # 搜索栏 - 在整个会话的接收历史中查找
+        search_layout = QHBoxLayout()
+        search_layout.setSpacing(10)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索接收历史 (回车查找下一个)")
+        self.search_input.returnPressed.connect(self.find_next)
+        self.search_input.textChanged.connect(self.reset_search)
+        self.search_regex_check = QCheckBox("正则")
+        self.search_regex_check.stateChanged.connect(self.reset_search)
+        self.search_hex_check = QCheckBox("十六进制")
+        self.search_hex_check.stateChanged.connect(self.reset_search)
+        search_prev_button = QPushButton("上一个")
+        search_prev_button.setFixedWidth(80)
+        search_prev_button.clicked.connect(self.find_previous)
+        search_next_button = QPushButton("下一个")
+        search_next_button.setFixedWidth(80)
+        search_next_button.clicked.connect(self.find_next)
+        self.search_result_label = QLabel("")
+        # 索引大小, 达到上限时提示之后的数据不能搜索
+        self.search_index_label = QLabel("")
+        
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.search_regex_check)
+        search_layout.addWidget(self.search_hex_check)
+        search_layout.addWidget(search_prev_button)
+        search_layout.addWidget(search_next_button)
+        search_layout.addWidget(self.search_result_label)
+        search_layout.addWidget(self.search_index_label)
+        receive_layout.addLayout(search_layout)
+        
+        # 接收显示视图 - 有界历史 + 虚拟化列表, 只绘制可见行
+        self.receive_history = ReceiveHistory(
+            max_lines=self.rx_history_lines,
+            max_chars=self.rx_history_mb * 1024 * 1024
+        )
+        self.receive_model = ReceiveLogModel(self.receive_history, self)
+        self.receive_view = ReceiveView(self.receive_model)
         font = QFont("Consolas", 12)
-        self.receive_text.setFont(font)
-        receive_layout.addWidget(self.receive_text)
+        self.receive_view.setFont(font)
+        receive_layout.addWidget(self.receive_view)
         
         splitter.addWidget(receive_group)
         
@@ -324,14 +1929,27 @@ class SerialMonitor(QMainWindow):
         send_control_layout.setSpacing(15)
         self.send_hex_check = QCheckBox("十六进制发送")
         self.append_newline_check = QCheckBox("追加换行")
+        # 校验值追加在数据之后、换行之前, 发送框、自动发送、数据帧和序列发送都经过 send_checksum()
+        self.send_checksum_combo = QComboBox()
+        self.send_checksum_combo.addItem("无校验", None)
+        for name in checksum_names():
+            self.send_checksum_combo.addItem(name, name)
+        self.send_checksum_combo.setToolTip("追加到发送框、自动发送、数据帧和序列发送的数据之后; 发送文件时原样发送")
         self.auto_send_check = QCheckBox("自动发送")
         
-        self.auto_send_interval = QSpinBox()
-        self.auto_send_interval.setRange(10, 3600000)
+        # 自动发送由引擎的调度线程按绝对截止时间执行, 支持 10ms 以下的间隔
+        self.auto_send_interval = QDoubleSpinBox()
+        self.auto_send_interval.setDecimals(1)
+        self.auto_send_interval.setRange(0.1, 3600000)
         self.auto_send_interval.setValue(1000)
         self.auto_send_interval.setSuffix("ms")
         self.auto_send_interval.setEnabled(False)
-        self.auto_send_interval.setFixedWidth(100)
+        self.auto_send_interval.setFixedWidth(110)
+        self.auto_send_interval.setToolTip("每个周期末尾忙等最多 0.2ms 且不超过间隔的 1/4, 间隔越短 CPU 占用越高, 最多约一个核心的 1/4")
+        # 输入过程中不重新调度, 按回车、离开焦点或点击箭头后才生效
+        self.auto_send_interval.setKeyboardTracking(False)
+        self.auto_send_interval.valueChanged.connect(self.on_auto_send_interval_changed)
+        self.auto_send_status_label = QLabel("")
         
         self.auto_send_check.stateChanged.connect(
             lambda: self.auto_send_interval.setEnabled(self.auto_send_check.isChecked())
@@ -342,9 +1960,11 @@ class SerialMonitor(QMainWindow):
         
         send_control_layout.addWidget(self.send_hex_check)
         send_control_layout.addWidget(self.append_newline_check)
+        send_control_layout.addWidget(self.send_checksum_combo)
         send_control_layout.addWidget(self.auto_send_check)
         send_control_layout.addWidget(QLabel("间隔:"))
         send_control_layout.addWidget(self.auto_send_interval)
+        send_control_layout.addWidget(self.auto_send_status_label)
         send_control_layout.addStretch()
         
         send_layout.addLayout(send_control_layout)
@@ -355,6 +1975,13 @@ class SerialMonitor(QMainWindow):
         self.send_text.setFont(font)  # 使用相同的字体设置
         send_layout.addWidget(self.send_text)
         
+        # 发送内容变化时重新编码, 发送和自动发送直接使用编码好的数据
+        self.send_payload = None
+        self.send_text.textChanged.connect(self.on_send_payload_changed)
+        self.send_hex_check.stateChanged.connect(self.on_send_payload_changed)
+        self.append_newline_check.stateChanged.connect(self.on_send_payload_changed)
+        self.send_checksum_combo.currentIndexChanged.connect(self.on_send_payload_changed)
+        
         # 发送按钮 - 更醒目的样式
         send_button_layout = QHBoxLayout()
         send_button_layout.setSpacing(10)
@@ -381,9 +2008,18 @@ class SerialMonitor(QMainWindow):
         
         main_layout.addWidget(splitter)
         
-        # 自动发送定时器
-        self.auto_send_timer = QTimer(self)
-        self.auto_send_timer.timeout.connect(self.send_data)
+        # 接收刷新定时器, 按固定帧率从环形缓冲区取出数据
+        self.rx_refresh_timer = QTimer(self)
+        self.rx_refresh_timer.timeout.connect(self.drain_receive_buffer)
+        
+        # 发送状态刷新定时器: 队列深度和发送速率
+        self.tx_status_timer = QTimer(self)
+        self.tx_status_timer.timeout.connect(self.update_tx_status)
+        
+        # 收发统计定时器: 每秒取样一次, 更新状态栏字节数和统计面板
+        self.traffic_timer = QTimer(self)
+        self.traffic_timer.timeout.connect(self.update_traffic)
+        self.traffic_timer.start(1000)
         
         # 设置样式
         self.set_style()
@@ -399,10 +2035,30 @@ class SerialMonitor(QMainWindow):
         # 文件菜单
         file_menu = menubar.addMenu("文件")
         
+        # 录制动作
+        self.record_action = QAction("开始录制...", self)
+        self.record_action.setShortcut("Ctrl+R")
+        self.record_action.triggered.connect(self.toggle_recording)
+        file_menu.addAction(self.record_action)
+        
+        # 打开捕获文件动作
+        open_capture_action = QAction("打开捕获文件...", self)
+        open_capture_action.setShortcut("Ctrl+O")
+        open_capture_action.triggered.connect(self.open_capture)
+        file_menu.addAction(open_capture_action)
+        
+        # 发送文件动作
+        send_file_action = QAction("发送文件...", self)
+        send_file_action.setShortcut("Ctrl+Shift+S")
+        send_file_action.triggered.connect(self.send_file)
+        file_menu.addAction(send_file_action)
+        file_menu.addSeparator()
+        
         # 退出动作
         exit_action = QAction("退出", self)
         exit_action.setShortcut("Ctrl+Q")
-        exit_action.triggered.connect(self.close)
+        # 作为标签页嵌入时关闭整个窗口而不只是本会话
+        exit_action.triggered.connect(lambda: self.window().close())
         file_menu.addAction(exit_action)
         
         # 工具菜单
@@ -418,6 +2074,45 @@ class SerialMonitor(QMainWindow):
         frame_manager_action.triggered.connect(self.show_frame_manager)
         tools_menu.addAction(frame_manager_action)
         
+        # 序列发送动作
+        sequence_action = QAction("序列发送", self)
+        sequence_action.triggered.connect(self.show_sequence_player)
+        tools_menu.addAction(sequence_action)
+        
+        # 往返时间测量动作
+        latency_action = QAction("往返时间测量", self)
+        latency_action.triggered.connect(self.show_latency_dialog)
+        tools_menu.addAction(latency_action)
+        
+        # 帧解析动作
+        frame_view_action = QAction("帧解析", self)
+        frame_view_action.triggered.connect(self.show_frame_view)
+        tools_menu.addAction(frame_view_action)
+        
+        # Modbus RTU 动作
+        modbus_action = QAction("Modbus RTU", self)
+        modbus_action.triggered.connect(self.show_modbus_dialog)
+        tools_menu.addAction(modbus_action)
+        
+        # 实时曲线动作
+        plot_action = QAction("实时曲线", self)
+        plot_action.triggered.connect(self.show_plot_dialog)
+        tools_menu.addAction(plot_action)
+        
+        # 收发统计动作
+        stats_action = QAction("收发统计", self)
+        stats_action.triggered.connect(self.show_stats_dialog)
+        tools_menu.addAction(stats_action)
+        tools_menu.addSeparator()
+        
+        # XMODEM/YMODEM 传输动作
+        modem_send_action = QAction("XMODEM/YMODEM 发送...", self)
+        modem_send_action.triggered.connect(lambda: self.show_modem_transfer(receive=False))
+        tools_menu.addAction(modem_send_action)
+        modem_receive_action = QAction("XMODEM/YMODEM 接收...", self)
+        modem_receive_action.triggered.connect(lambda: self.show_modem_transfer(receive=True))
+        tools_menu.addAction(modem_receive_action)
+        
         # 帮助菜单
         help_menu = menubar.addMenu("帮助")
         
@@ -529,6 +2224,80 @@ class SerialMonitor(QMainWindow):
         ok_button = QPushButton("确定")
         cancel_button = QPushButton("取消")
         
+        # 接收设置组
+        receive_group = QGroupBox("接收设置")
+        receive_layout = QGridLayout(receive_group)
+        
+        wake_policy_label = QLabel("唤醒策略:")
+        wake_policy_combo = QComboBox()
+        wake_policy_combo.addItem("数据到达立即唤醒", SerialReader.WAKE_IMMEDIATE)
+        wake_policy_combo.addItem("合并批量唤醒", SerialReader.WAKE_BATCH)
+        wake_policy_index = wake_policy_combo.findData(self.rx_wake_policy)
+        if wake_policy_index >= 0:
+            wake_policy_combo.setCurrentIndex(wake_policy_index)
+        
+        batch_delay_label = QLabel("合并等待:")
+        batch_delay_spin = QSpinBox()
+        batch_delay_spin.setRange(0, 100)
+        batch_delay_spin.setSuffix("ms")
+        batch_delay_spin.setValue(self.rx_batch_delay_ms)
+        
+        receive_layout.addWidget(wake_policy_label, 0, 0)
+        receive_layout.addWidget(wake_policy_combo, 0, 1)
+        receive_layout.addWidget(batch_delay_label, 1, 0)
+        receive_layout.addWidget(batch_delay_spin, 1, 1)
+        
+        refresh_hz_label = QLabel("刷新频率:")
+        refresh_hz_spin = QSpinBox()
+        refresh_hz_spin.setRange(1, 120)
+        refresh_hz_spin.setSuffix("Hz")
+        refresh_hz_spin.setValue(self.rx_refresh_hz)
+        
+        frame_bytes_label = QLabel("每帧最大字节:")
+        frame_bytes_spin = QSpinBox()
+        frame_bytes_spin.setRange(256, 16 * 1024 * 1024)
+        frame_bytes_spin.setSingleStep(1024)
+        frame_bytes_spin.setValue(self.rx_frame_bytes)
+        
+        receive_layout.addWidget(refresh_hz_label, 2, 0)
+        receive_layout.addWidget(refresh_hz_spin, 2, 1)
+        receive_layout.addWidget(frame_bytes_label, 3, 0)
+        receive_layout.addWidget(frame_bytes_spin, 3, 1)
+        
+        history_lines_label = QLabel("历史行数上限:")
+        history_lines_spin = QSpinBox()
+        history_lines_spin.setRange(1000, 10000000)
+        history_lines_spin.setSingleStep(10000)
+        history_lines_spin.setValue(self.rx_history_lines)
+        
+        history_mb_label = QLabel("历史内存上限:")
+        history_mb_spin = QSpinBox()
+        history_mb_spin.setRange(1, 4096)
+        history_mb_spin.setSuffix("MB")
+        history_mb_spin.setValue(self.rx_history_mb)
+        
+        search_mb_label = QLabel("检索索引上限:")
+        search_mb_spin = QSpinBox()
+        search_mb_spin.setRange(16, 64 * 1024)
+        search_mb_spin.setSingleStep(256)
+        search_mb_spin.setSuffix("MB")
+        search_mb_spin.setValue(self.rx_search_mb)
+        
+        receive_layout.addWidget(history_lines_label, 4, 0)
+        receive_layout.addWidget(history_lines_spin, 4, 1)
+        receive_layout.addWidget(history_mb_label, 5, 0)
+        receive_layout.addWidget(history_mb_spin, 5, 1)
+        receive_layout.addWidget(search_mb_label, 6, 0)
+        receive_layout.addWidget(search_mb_spin, 6, 1)
+        
+        receive_hint_label = QLabel("提示: 唤醒策略、合并等待和刷新频率在下次连接串口时生效, 其余接收设置立即生效; "
+                                    f"超出历史上限的行写入临时目录, 保留 {ReceiveHistory.SPILL_KEEP_DAYS} 天")
+        receive_hint_label.setStyleSheet("color: #666;")
+        receive_hint_label.setWordWrap(True)
+        receive_layout.addWidget(receive_hint_label, 7, 0, 1, 2)
+        
+        layout.addWidget(receive_group)
+        
         # 连接信号
         def apply_settings():
             # 应用字体设置
@@ -536,6 +2305,20 @@ class SerialMonitor(QMainWindow):
             self.current_font = new_font
             self.apply_font_settings()
             
+            # 应用接收设置
+            self.rx_wake_policy = wake_policy_combo.currentData()
+            self.rx_batch_delay_ms = batch_delay_spin.value()
+            self.rx_refresh_hz = refresh_hz_spin.value()
+            self.rx_frame_bytes = frame_bytes_spin.value()
+            self.rx_history_lines = history_lines_spin.value()
+            self.rx_history_mb = history_mb_spin.value()
+            self.receive_history.max_lines = self.rx_history_lines
+            self.receive_history.max_chars = self.rx_history_mb * 1024 * 1024
+            self.rx_search_mb = search_mb_spin.value()
+            self.search_index.max_size = self.rx_search_mb * 1024 * 1024
+            self.update_search_index_status()
+            self.save_settings()
+            
         def accept_settings():
             apply_settings()
             dialog.accept()
@@ -566,15 +2349,15 @@ class SerialMonitor(QMainWindow):
         self.set_font_recursive(self.statusBar())
         
         # 强制刷新字体设置
-        self.receive_text.document().setDefaultFont(self.current_font)
+        self.receive_view.setFont(self.current_font)
         self.send_text.document().setDefaultFont(self.current_font)
         
         # 立即更新显示
-        self.receive_text.update()
+        self.receive_view.update()
         self.send_text.update()
         
         # 强制重绘
-        self.receive_text.repaint()
+        self.receive_view.viewport().repaint()
         self.send_text.repaint()
         
         # 保存字体设置
@@ -583,7 +2366,7 @@ class SerialMonitor(QMainWindow):
         self.settings.sync()
         
         # 强制应用样式
-        self.style().polish(self.receive_text)
+        self.style().polish(self.receive_view)
         self.style().polish(self.send_text)
         
     def set_font_recursive(self, widget):
@@ -646,24 +2429,25 @@ class SerialMonitor(QMainWindow):
     def set_style_no_font(self):
         """设置界面样式，但不包含字体设置，避免覆盖通过代码设置的字体"""
         # 设置接收区域的样式（不含字体）
-        receive_style = """QTextEdit {
-            background-color: #ffffff;
+        receive_style = """QListView {
+            background-color: #f9f9f9;
             color: #1d1d1f;
             border: 1px solid #d2d2d7;
             border-radius: 6px;
             padding: 8px;
         }
         
-        QTextEdit:focus {
+        QListView:focus {
             border-color: #007aff;
             border-width: 1px;
             outline: none;
         }
         
-        QTextEdit:read-only {
-            background-color: #f9f9f9;
+        QListView::item:selected {
+            background-color: #cce4ff;
+            color: #1d1d1f;
         }"""
-        self.receive_text.setStyleSheet(receive_style)
+        self.receive_view.setStyleSheet(receive_style)
         
         # 设置发送区域的样式（不含字体）
         send_style = """QTextEdit {
@@ -685,41 +2469,22 @@ class SerialMonitor(QMainWindow):
         # 创建对话框
         dialog = QDialog(self)
         dialog.setWindowTitle("数据帧管理")
-        dialog.resize(600, 400)
+        dialog.resize(700, 400)
         
         # 创建布局
         layout = QVBoxLayout(dialog)
         
-        # 创建表格
-        self.frame_table = QTableWidget(len(self.data_frames), 3)
-        self.frame_table.setHorizontalHeaderLabels(["名称", "数据内容", "操作"])
+        # 创建表格: 名称和数据内容可直接编辑, 修改后立即重新编码并保存
+        self.frame_table = QTableWidget(0, 5)
+        self.frame_table.setHorizontalHeaderLabels(["ID", "名称", "数据内容", "十六进制", "追加换行"])
         self.frame_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        
-        # 填充表格
-        for row, frame in enumerate(self.data_frames):
-            name_item = QTableWidgetItem(frame["name"])
-            data_item = QTableWidgetItem(frame["data"])
-            
-            # 创建操作按钮
-            action_widget = QWidget()
-            action_layout = QHBoxLayout(action_widget)
-            action_layout.setContentsMargins(2, 2, 2, 2)
-            
-            send_button = QPushButton("发送")
-            send_button.setFixedSize(60, 24)
-            send_button.clicked.connect(lambda checked, r=row: self.send_saved_frame(r))
-            
-            delete_button = QPushButton("删除")
-            delete_button.setFixedSize(60, 24)
-            delete_button.clicked.connect(lambda checked, r=row: self.delete_frame(r))
-            
-            action_layout.addWidget(send_button)
-            action_layout.addWidget(delete_button)
-            action_layout.addStretch()
-            
-            self.frame_table.setItem(row, 0, name_item)
-            self.frame_table.setItem(row, 1, data_item)
-            self.frame_table.setCellWidget(row, 2, action_widget)
+        self.frame_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.frame_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.frame_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
+        self.frame_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.frame_table.verticalHeader().setVisible(False)
+        self.populate_frame_table()
+        self.frame_table.itemChanged.connect(self.on_frame_item_changed)
         
         # 添加表格到布局
         layout.addWidget(self.frame_table)
@@ -727,6 +2492,12 @@ class SerialMonitor(QMainWindow):
         # 底部操作区
         bottom_layout = QHBoxLayout()
         
+        # 发送和删除选中的数据帧
+        send_button = QPushButton("发送")
+        send_button.clicked.connect(lambda: self.send_saved_frame(self.selected_frame_id()))
+        delete_button = QPushButton("删除")
+        delete_button.clicked.connect(lambda: self.delete_frame(self.selected_frame_id()))
+        
         # 添加数据帧按钮
         add_frame_button = QPushButton("添加数据帧")
         add_frame_button.clicked.connect(self.add_new_frame)
@@ -736,15 +2507,87 @@ class SerialMonitor(QMainWindow):
         add_from_send_button.clicked.connect(self.add_frame_from_send)
         
         # 添加按钮到布局
+        bottom_layout.addWidget(send_button)
+        bottom_layout.addWidget(delete_button)
+        bottom_layout.addStretch()
         bottom_layout.addWidget(add_frame_button)
         bottom_layout.addWidget(add_from_send_button)
-        bottom_layout.addStretch()
         
         # 添加底部布局到主布局
         layout.addLayout(bottom_layout)
         
         # 显示对话框
         dialog.exec_()
+        self.frame_table = None
+        
+    def populate_frame_table(self):
+        """用数据帧库填充管理对话框的表格"""
+        table = self.frame_table
+        if table is None:
+            return
+        table.blockSignals(True)
+        table.setRowCount(len(self.data_frames))
+        for row, frame in enumerate(self.data_frames):
+            id_item = QTableWidgetItem(str(frame.id))
+            id_item.setFlags(id_item.flags() & ~Qt.ItemIsEditable)
+            id_item.setData(Qt.UserRole, frame.id)
+            hex_item = QTableWidgetItem()
+            hex_item.setFlags((hex_item.flags() | Qt.ItemIsUserCheckable) & ~Qt.ItemIsEditable)
+            hex_item.setCheckState(Qt.Checked if frame.hex_mode else Qt.Unchecked)
+            newline_item = QTableWidgetItem()
+            newline_item.setFlags((newline_item.flags() | Qt.ItemIsUserCheckable) & ~Qt.ItemIsEditable)
+            newline_item.setCheckState(Qt.Checked if frame.append_newline else Qt.Unchecked)
+            
+            table.setItem(row, 0, id_item)
+            table.setItem(row, 1, QTableWidgetItem(frame.name))
+            table.setItem(row, 2, QTableWidgetItem(frame.text))
+            table.setItem(row, 3, hex_item)
+            table.setItem(row, 4, newline_item)
+        table.blockSignals(False)
+        
+    def selected_frame_id(self):
+        """返回表格中选中行的数据帧 ID, 未选中时返回 None"""
+        row = self.frame_table.currentRow()
+        if row < 0:
+            return None
+        return self.frame_table.item(row, 0).data(Qt.UserRole)
+        
+    def on_frame_item_changed(self, item):
+        """表格中编辑数据帧后更新数据帧库"""
+        frame_id = self.frame_table.item(item.row(), 0).data(Qt.UserRole)
+        frame = self.data_frames.get(frame_id)
+        if frame is None:
+            return
+        column = item.column()
+        try:
+            if column == 1:
+                self.data_frames.update(frame_id, name=item.text().strip())
+            elif column == 2:
+                self.data_frames.update(frame_id, text=item.text())
+            elif column == 3:
+                self.data_frames.update(frame_id, hex_mode=item.checkState() == Qt.Checked)
+            elif column == 4:
+                self.data_frames.update(frame_id, append_newline=item.checkState() == Qt.Checked)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            self.populate_frame_table()
+            return
+        self.save_frame_library()
+        
+    def add_frame(self, name, text):
+        """按当前发送选项添加数据帧, 名称重复时提示并返回 False"""
+        try:
+            self.data_frames.add(
+                name, text,
+                hex_mode=self.send_hex_check.isChecked(),
+                append_newline=self.append_newline_check.isChecked()
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return False
+        self.save_frame_library()
+        self.populate_frame_table()
+        return True
         
     def add_new_frame(self):
         """添加新的数据帧"""
@@ -776,9 +2619,8 @@ class SerialMonitor(QMainWindow):
             data = data_input.toPlainText().strip()
             
             if name and data:
-                self.data_frames.append({"name": name, "data": data})
-                self.show_frame_manager()
-                dialog.accept()
+                if self.add_frame(name, data):
+                    dialog.accept()
             else:
                 QMessageBox.warning(self, "警告", "名称和数据内容不能为空")
         
@@ -825,9 +2667,8 @@ class SerialMonitor(QMainWindow):
                 name = name_input.toPlainText().strip()
                 
                 if name:
-                    self.data_frames.append({"name": name, "data": data})
-                    self.show_frame_manager()
-                    dialog.accept()
+                    if self.add_frame(name, data):
+                        dialog.accept()
                 else:
                     QMessageBox.warning(self, "警告", "名称不能为空")
             
@@ -846,22 +2687,95 @@ class SerialMonitor(QMainWindow):
         else:
             QMessageBox.warning(self, "警告", "发送区没有数据")
         
-    def send_saved_frame(self, row):
-        """发送保存的数据帧"""
-        if 0 <= row < len(self.data_frames):
-            frame = self.data_frames[row]
-            self.send_text.setPlainText(frame["data"])
-            self.send_data()
-        
-    def delete_frame(self, row):
+    def send_saved_frame(self, frame_id):
+        """发送保存的数据帧, 不经过发送框; 没有选择校验时直接使用编码好的字节"""
+        frame = self.data_frames.get(frame_id)
+        if frame is None or not self.engine.is_open:
+            return
+        try:
+            self.engine.submit(frame.encode(self.send_checksum()))
+        except TxQueueFull as e:
+            self.statusBar().showMessage(f"{str(e)}, 本次数据未发送", 2000)
+        
+    def send_frame_by_name(self, name):
+        """按名称发送数据帧, 不存在时返回 False"""
+        frame = self.data_frames.find(name)
+        if frame is None:
+            return False
+        self.send_saved_frame(frame.id)
+        return True
+        
+    def delete_frame(self, frame_id):
         """删除数据帧"""
-        if 0 <= row < len(self.data_frames):
+        if frame_id in self.data_frames:
             reply = QMessageBox.question(self, "确认", "确定要删除这个数据帧吗？", 
                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             
             if reply == QMessageBox.Yes:
-                del self.data_frames[row]
-                self.show_frame_manager()
+                self.data_frames.remove(frame_id)
+                self.save_frame_library()
+                self.populate_frame_table()
+                
+    def save_frame_library(self):
+        """保存数据帧库到磁盘"""
+        try:
+            self.data_frames.save()
+        except OSError as e:
+            self.statusBar().showMessage(f"无法保存数据帧库: {str(e)}", 3000)
+        
+    def show_sequence_player(self):
+        """显示数据帧序列发送对话框"""
+        dialog = SequencePlayerDialog(
+            self.engine, self.data_frames,
+            text=self.settings.value("sequence_text", ""),
+            loops=self.settings.value("sequence_loops", 1, type=int),
+            checksum=self.send_checksum(),
+            parent=self
+        )
+        dialog.exec_()
+        self.settings.setValue("sequence_text", dialog.text)
+        self.settings.setValue("sequence_loops", dialog.loops_spin.value())
+        
+    def show_latency_dialog(self):
+        """显示往返时间测量对话框"""
+        dialog = LatencyDialog(self.engine, self.settings, request=self.send_text.toPlainText(), parent=self)
+        dialog.exec_()
+        
+    def show_frame_view(self):
+        """显示帧解析对话框"""
+        dialog = FrameViewDialog(self.engine, self.settings, parent=self)
+        dialog.exec_()
+        
+    def show_plot_dialog(self):
+        """显示实时曲线面板(非模态, 关闭后再次打开保留数据)"""
+        if self.plot_dialog is None:
+            self.plot_dialog = PlotDialog(self, self.settings, parent=self)
+        self.plot_dialog.show()
+        self.plot_dialog.raise_()
+        
+    def show_stats_dialog(self):
+        """显示收发统计面板(非模态)"""
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self, parent=self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+        if self.traffic is not None:
+            self.stats_dialog.show_stats(self.traffic)
+        
+    def show_modbus_dialog(self):
+        """显示 Modbus RTU 监视和主站对话框"""
+        dialog = ModbusDialog(self.engine, self.settings, parent=self)
+        self.connection_changed.connect(dialog.on_connection_changed)
+        dialog.exec_()
+        self.connection_changed.disconnect(dialog.on_connection_changed)
+        
+    def show_modem_transfer(self, receive=False):
+        """显示 XMODEM/YMODEM 传输对话框"""
+        dialog = ModemTransferDialog(
+            self.engine, receive=receive, mode=self.settings.value("modem_mode", ""), parent=self
+        )
+        dialog.exec_()
+        self.settings.setValue("modem_mode", dialog.mode)
         
     def show_about(self):
         """显示关于对话框"""
@@ -882,6 +2796,19 @@ class SerialMonitor(QMainWindow):
         # 加载界面缩放设置
         ui_scale = self.settings.value("ui_scale", 1.0, type=float)
         
+        # 加载接收线程唤醒策略
+        self.rx_wake_policy = self.settings.value("rx_wake_policy", SerialReader.WAKE_IMMEDIATE)
+        self.rx_batch_delay_ms = self.settings.value("rx_batch_delay_ms", 2, type=int)
+        
+        # 加载接收刷新设置
+        self.rx_refresh_hz = self.settings.value("rx_refresh_hz", 50, type=int)
+        self.rx_frame_bytes = self.settings.value("rx_frame_bytes", 64 * 1024, type=int)
+        
+        # 加载接收历史上限
+        self.rx_history_lines = self.settings.value("rx_history_lines", 100000, type=int)
+        self.rx_history_mb = self.settings.value("rx_history_mb", 32, type=int)
+        self.rx_search_mb = self.settings.value("rx_search_mb", 1024, type=int)
+        
     def save_settings(self):
         """保存用户设置"""
         # 保存字体设置
@@ -892,6 +2819,19 @@ class SerialMonitor(QMainWindow):
         # ui_scale = ... (获取当前缩放比例)
         # self.settings.setValue("ui_scale", ui_scale)
         
+        # 保存接收线程唤醒策略
+        self.settings.setValue("rx_wake_policy", self.rx_wake_policy)
+        self.settings.setValue("rx_batch_delay_ms", self.rx_batch_delay_ms)
+        
+        # 保存接收刷新设置
+        self.settings.setValue("rx_refresh_hz", self.rx_refresh_hz)
+        self.settings.setValue("rx_frame_bytes", self.rx_frame_bytes)
+        
+        # 保存接收历史上限
+        self.settings.setValue("rx_history_lines", self.rx_history_lines)
+        self.settings.setValue("rx_history_mb", self.rx_history_mb)
+        self.settings.setValue("rx_search_mb", self.rx_search_mb)
+        
     def on_signal_changed(self):
         """流控信号变化时的处理"""
         if self.serial_port and self.serial_port.is_open:
@@ -1232,6 +3172,61 @@ class SerialMonitor(QMainWindow):
             if index >= 0:
                 self.port_combo.setCurrentIndex(index)
         
+    def rx_refresh_interval(self):
+        """接收显示刷新间隔(毫秒); 所在标签页不可见时降到 5 次/秒, 数据暂存在环形缓冲区中"""
+        if self.isVisible():
+            return max(1, 1000 // self.rx_refresh_hz)
+        return 200
+        
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.rx_refresh_timer.isActive():
+            self.rx_refresh_timer.setInterval(self.rx_refresh_interval())
+            
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if self.rx_refresh_timer.isActive():
+            self.rx_refresh_timer.setInterval(self.rx_refresh_interval())
+            
+    def on_port_timer(self):
+        """定时刷新串口列表; 已连接或所在标签页不可见时跳过, 多个会话不重复枚举"""
+        if self.isVisible() and not self.engine.is_open:
+            self.refresh_ports()
+            
+    def session_state(self):
+        """返回本会话的串口设置, 用于保存和恢复多串口会话"""
+        return {
+            'port': self.port_combo.currentData(),
+            'baudrate': self.baudrate_combo.currentData(),
+            'data_bits': self.data_bits_combo.currentData(),
+            'stop_bits': self.stop_bits_combo.currentData(),
+            'parity': self.parity_combo.currentData(),
+            'flow_control': self.flow_control_combo.currentData(),
+            'send_checksum': self.send_checksum_combo.currentData(),
+        }
+        
+    def restore_session_state(self, state):
+        """恢复 session_state() 保存的串口设置, 不存在的选项保持默认"""
+        port = state.get('port')
+        if port and self.port_combo.findData(port) < 0:
+            self.port_combo.addItem(port, port)
+        combos = [
+            (self.port_combo, port), (self.baudrate_combo, state.get('baudrate')),
+            (self.data_bits_combo, state.get('data_bits')), (self.stop_bits_combo, state.get('stop_bits')),
+            (self.parity_combo, state.get('parity')), (self.flow_control_combo, state.get('flow_control')),
+            (self.send_checksum_combo, state.get('send_checksum')),
+        ]
+        for combo, value in combos:
+            index = combo.findData(value)
+            if value is not None and index >= 0:
+                combo.setCurrentIndex(index)
+                
+    def session_title(self):
+        """标签页标题: 已连接时为串口名"""
+        if self.engine.is_open:
+            return f"● {self.port_combo.currentData()}"
+        return self.port_combo.currentData() or "未连接"
+        
     def toggle_connection(self):
         """切换串口连接状态"""
         if self.serial_port and self.serial_port.is_open:
@@ -1254,26 +3249,23 @@ class SerialMonitor(QMainWindow):
             parity = self.parity_combo.currentData()
             flow_control = self.flow_control_combo.currentData()
             
-            # 确定流控制参数
-            xonxoff = False
-            rtscts = False
-            if flow_control == 'X' or flow_control == 'B':
-                xonxoff = True
-            if flow_control == 'R' or flow_control == 'B':
-                rtscts = True
-            
-            # 简化串口打开逻辑，直接使用serial.Serial
+            # 打开串口并启动接收线程, 数据写入接收环形缓冲区和检索索引
+            self.rx_formatter.reset()
+            self.rx_buffer.clear()
+            self.rx_dropped_reported = 0
+            self.rx_offset_base = self.search_index.total
             try:
-                self.serial_port = serial.Serial(
-                    port=port_name,
+                self.serial_port = self.engine.open(
+                    port_name,
                     baudrate=baudrate,
                     bytesize=data_bits,
                     parity=parity,
                     stopbits=stop_bits,
-                    timeout=0,
-                    xonxoff=xonxoff,
-                    rtscts=rtscts
+                    flow_control=flow_control,
+                    wake_policy=self.rx_wake_policy,
+                    batch_delay_ms=self.rx_batch_delay_ms
                 )
+                self.engine.add_listener(self.search_index)
                 self.statusBar().showMessage(f"成功打开端口 {port_name}")
             except Exception as e:
                 # 提供更详细的错误信息
@@ -1293,16 +3285,14 @@ class SerialMonitor(QMainWindow):
             self.status_label.setText("已连接")
             self.status_label.setStyleSheet("color: #28a745; font-weight: bold;")
             
-            # 启动接收线程
-            self.receive_thread = SerialThread(self.serial_port)
-            self.receive_thread.data_received.connect(self.append_received_data)
-            self.receive_thread.connection_closed.connect(self.on_connection_closed)
-            self.receive_thread.error_occurred.connect(self.on_serial_error)
-            self.receive_thread.start()
+            # 启动界面刷新定时器
+            self.rx_refresh_timer.start(self.rx_refresh_interval())
+            self.tx_status_timer.start(500)
             
-            # 如果启用了自动发送，启动定时器
+            # 如果启用了自动发送，启动调度线程
             if self.auto_send_check.isChecked():
-                self.auto_send_timer.start(self.auto_send_interval.value())
+                self.start_auto_send()
+            self.connection_changed.emit()
                 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法打开串口: {str(e)}")
@@ -1313,17 +3303,17 @@ class SerialMonitor(QMainWindow):
             
     def close_serial(self):
         """关闭串口"""
-        # 停止自动发送定时器
-        self.auto_send_timer.stop()
-        
-        # 停止接收线程
-        if self.receive_thread:
-            self.receive_thread.stop()
-            self.receive_thread = None
+        # 停止收发线程并关闭串口, 未写出的发送请求被取消
+        self.engine.close()
+        self.serial_port = None
+        self.tx_status_timer.stop()
+        self.update_tx_status()
+        self.update_traffic()
         
-        # 关闭串口
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+        # 停止刷新定时器并显示缓冲区中剩余的数据
+        self.rx_refresh_timer.stop()
+        while len(self.rx_buffer):
+            self.drain_receive_buffer()
         
         # 启用串口设置
         self.port_combo.setEnabled(True)
@@ -1338,57 +3328,148 @@ class SerialMonitor(QMainWindow):
         self.status_indicator.setStyleSheet("background-color: #dc3545; border-radius: 8px;")
         self.status_label.setText("未连接")
         self.status_label.setStyleSheet("color: #dc3545; font-weight: bold;")
+        self.connection_changed.emit()
         
-    def append_received_data(self, data):
-        """追加接收的数据到文本框，优化十六进制显示格式"""
-        # 更新接收字节计数
+    def drain_receive_buffer(self):
+        """刷新定时器回调: 从环形缓冲区取出一批数据显示"""
+        data, stamps = self.rx_buffer.read_with_stamps(self.rx_frame_bytes)
+        if data:
+            self.append_received_data(data, stamps)
+        dropped = self.rx_buffer.dropped
+        if dropped > self.rx_dropped_reported:
+            self.rx_dropped_reported = dropped
+            self.statusBar().showMessage(f"接收缓冲区溢出, 已丢弃 {dropped} 字节", 2000)
+        
+    def append_received_data(self, data, stamps=None):
+        """追加接收的原始字节到文本框，优化十六进制显示格式
+
+        stamps 为 [(批内偏移, perf_counter_ns 采集时间戳), ...], 由接收线程在
+        读取时记录; 未提供时使用当前时间。
+        """
         self.received_bytes_count += len(data)
-        self.received_bytes_label.setText(f"接收: {self.received_bytes_count} 字节")
-        
-        # 如果选择了十六进制显示
-        if self.receive_hex_check.isChecked():
-            # 将字节数据转换为十六进制字符串
-            hex_data = []
-            for byte in data:
-                hex_data.append(f'{ord(byte):02X}')
-            
-            # 格式化十六进制数据，每行显示16个字节
-            formatted_hex = []
-            for i in range(0, len(hex_data), 16):
-                line_hex = ' '.join(hex_data[i:i+16])
-                # 添加ASCII字符表示
-                ascii_part = ''.join([c if 32 <= ord(c) <= 126 else '.' for c in data[i:i+16]])
-                formatted_hex.append(f"{line_hex:<47}  {ascii_part}")
-            
-            display_data = '\n'.join(formatted_hex) + '\n'
-        else:
-            # 确保中文正确显示
-            display_data = data
-            
-        # 如果选择了显示时间戳
-        if self.receive_timestamp_check.isChecked():
-            timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-            if self.receive_hex_check.isChecked():
-                # 为十六进制模式添加时间戳前缀
-                lines = display_data.split('\n')
-                timestamped_lines = [f"[{timestamp}] {line}" for line in lines]
-                display_data = '\n'.join(timestamped_lines)
-            else:
-                display_data = f"[{timestamp}] {display_data}"
+        
+        formatter = self.rx_formatter
+        formatter.hex_mode = self.receive_hex_check.isChecked()
+        formatter.timestamps = self.receive_timestamp_check.isChecked()
+        formatter.split_lines = self.receive_timestamp_split_check.isChecked()
+        
+        # 记录本批数据起始的 RX 偏移对应的显示行, 供搜索结果跳转
+        self.add_line_checkpoint()
+        
+        display_data, retract = formatter.feed(data, stamps)
+        # 上次显示的不完整十六进制行被替换为完整行
+        if retract:
+            self.receive_model.retract_partial()
+        if not display_data:
+            return
             
         # 追加数据
-        self.receive_text.insertPlainText(display_data)
+        spill_started = self.receive_history.spill_path is None
+        self.receive_model.append_text(display_data)
+        if spill_started and self.receive_history.spill_path:
+            self.statusBar().showMessage(f"接收历史超出上限, 旧数据写入: {self.receive_history.spill_path}", 5000)
         
         # 如果选择了自动滚动
         if self.auto_scroll_check.isChecked():
             # 使用QTimer确保文本框更新后再滚动到底部
             QTimer.singleShot(0, self.scroll_to_bottom)
     
+    def add_line_checkpoint(self):
+        """记录当前 RX 偏移对应的显示行号, 并丢弃已移出显示历史的检查点"""
+        formatter = self.rx_formatter
+        history = self.receive_history
+        # 未结束的最后一行(文本续写或被替换的不完整十六进制行)即本批数据的起始行
+        line = history.next_line_no
+        pending = formatter.hex_formatter.pending_length if formatter.hex_mode else 0
+        self.line_map_offsets.append(self.rx_offset_base + self.rx_buffer.last_read_start)
+        self.line_map.append((line, formatter.hex_mode, pending))
+        # 批量丢弃已移出的检查点, 避免频繁移动列表
+        if len(self.line_map) > 4096 and self.line_map[1024][0] < history.first_line_no:
+            del self.line_map_offsets[:1024]
+            del self.line_map[:1024]
+        
+    def line_for_offset(self, offset):
+        """返回 RX 偏移 offset 处字节所在的全局显示行号"""
+        index = bisect.bisect_right(self.line_map_offsets, offset) - 1
+        if index < 0:
+            return None
+        start = self.line_map_offsets[index]
+        line, hex_mode, pending = self.line_map[index]
+        if hex_mode:
+            return line + (offset - start + pending) // HexDumpFormatter.BYTES_PER_ROW
+        return line + self.search_index.read(start, offset).count(b'\n')
+        
+    def search_pattern(self):
+        """把搜索框内容转换为字节模式"""
+        text = self.search_input.text()
+        if self.search_hex_check.isChecked() and not self.search_regex_check.isChecked():
+            hex_text = re.sub(r'[^0-9A-Fa-f]', '', text)
+            if len(hex_text) % 2 != 0:
+                hex_text += '0'
+            return bytes.fromhex(hex_text)
+        return text.encode('utf-8')
+        
+    def reset_search(self):
+        """搜索条件变化时从头开始"""
+        self.search_results = []
+        self.search_position = -1
+        self.search_result_label.setText("")
+        
+    def run_search(self):
+        """执行搜索, 只扫描上次查询之后新增的数据"""
+        pattern = self.search_pattern()
+        if not pattern:
+            return False
+        try:
+            self.search_results = self.search_index.search(pattern, regex=self.search_regex_check.isChecked())
+        except re.error as e:
+            QMessageBox.warning(self, "警告", f"正则表达式错误: {str(e)}")
+            return False
+        if not self.search_results:
+            self.search_result_label.setText("无匹配")
+            return False
+        return True
+        
+    def find_next(self):
+        if self.run_search():
+            self.search_position = (self.search_position + 1) % len(self.search_results)
+            self.show_search_result()
+            
+    def find_previous(self):
+        if self.run_search():
+            self.search_position = (self.search_position - 1) % len(self.search_results)
+            self.show_search_result()
+            
+    def show_search_result(self):
+        """在接收视图中定位当前搜索结果"""
+        start, end = self.search_results[self.search_position]
+        self.search_result_label.setText(f"{self.search_position + 1} / {len(self.search_results)}")
+        line = self.line_for_offset(start)
+        if line is None:
+            return
+        row = line - self.receive_history.first_line_no
+        if row < 0:
+            self.statusBar().showMessage(
+                f"匹配位于偏移 {start}, 已移出显示历史 (溢出文件第 {line + 1} 行: {self.receive_history.spill_path})",
+                5000
+            )
+            return
+        row = min(row, len(self.receive_history) - 1)
+        # 查看历史时停止自动滚动
+        self.auto_scroll_check.setChecked(False)
+        index = self.receive_model.index(row)
+        self.receive_view.setCurrentIndex(index)
+        self.receive_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
+        self.statusBar().showMessage(f"匹配位于偏移 {start} - {end}", 3000)
+        
+    def on_receive_mode_changed(self):
+        """切换文本/十六进制显示时重置解码状态, 新数据从新行开始"""
+        self.rx_formatter.reset()
+        self.receive_history.end_line()
+        
     def scroll_to_bottom(self):
         """滚动到文本框底部"""
-        self.receive_text.verticalScrollBar().setValue(
-            self.receive_text.verticalScrollBar().maximum()
-        )
+        self.receive_view.scrollToBottom()
             
     def send_data(self):
         """发送数据"""
@@ -1396,71 +3477,259 @@ class SerialMonitor(QMainWindow):
             return
             
         try:
-            # 获取发送文本
-            text = self.send_text.toPlainText()
-            if not text:
+            data = self.current_send_payload()
+            if not data:
                 return
                 
-            # 如果选择了十六进制发送
-            if self.send_hex_check.isChecked():
-                # 移除所有非十六进制字符
-                hex_text = re.sub(r'[^0-9A-Fa-f]', '', text)
-                # 检查十六进制字符串长度是否为偶数
-                if len(hex_text) % 2 != 0:
-                    hex_text += '0'  # 补齐
-                # 转换为字节
-                data = bytes.fromhex(hex_text)
-            else:
-                # 普通文本发送
-                data = text.encode('utf-8')
-                
-            # 如果选择了追加换行
-            if self.append_newline_check.isChecked():
-                data += b'\r\n'
-                
-            # 发送数据
-            bytes_sent = self.serial_port.write(data)
-            
-            # 更新发送字节计数
-            self.sent_bytes_count += bytes_sent
-            self.sent_bytes_label.setText(f"发送: {self.sent_bytes_count} 字节")
-            
-            # 在状态栏显示发送成功信息
-            self.statusBar().showMessage(f"成功发送 {bytes_sent} 字节", 2000)
+            # 放入发送队列, 由发送线程写出, 完成后更新计数
+            self.engine.submit(data)
             
+        except TxQueueFull as e:
+            self.statusBar().showMessage(f"{str(e)}, 本次数据未发送", 2000)
         except Exception as e:
             error_msg = f"发送数据失败: {str(e)}"
             QMessageBox.critical(self, "错误", error_msg)
             self.statusBar().showMessage(error_msg, 3000)
             
+    def encode_send_payload(self):
+        """把发送框内容按当前选项编码为字节, 内容为空时返回 b''"""
+        # 获取发送文本
+        text = self.send_text.toPlainText()
+        if not text:
+            return b''
+        return encode_payload(text, self.send_hex_check.isChecked(),
+                              self.append_newline_check.isChecked(), self.send_checksum())
+        
+    def send_checksum(self):
+        """当前选择的发送校验算法, 无校验时返回 None"""
+        checksum_name = self.send_checksum_combo.currentData()
+        return parse_checksum(checksum_name) if checksum_name else None
+        
+    def current_send_payload(self):
+        """返回编码好的发送数据, 只在内容或选项变化后重新编码"""
+        if self.send_payload is None:
+            self.send_payload = self.encode_send_payload()
+        return self.send_payload
+        
+    def on_send_payload_changed(self):
+        """发送内容或编码选项变化"""
+        self.send_payload = None
+        if self.engine.periodic:
+            self.engine.periodic.set_payload(self.current_send_payload())
+            
+    def on_data_sent(self, bytes_sent):
+        """发送线程写出一个请求后的处理"""
+        # 在状态栏显示发送成功信息
+        self.statusBar().showMessage(f"成功发送 {bytes_sent} 字节", 2000)
+        
+    def on_send_failed(self, error_msg):
+        """发送线程写入失败"""
+        error_msg = f"发送数据失败: {error_msg}"
+        self.statusBar().showMessage(error_msg, 3000)
+        QMessageBox.critical(self, "错误", error_msg)
+        
+    def update_tx_status(self):
+        """显示发送队列深度和最近一秒的发送速率, 以及自动发送的实际频率和抖动"""
+        periodic = self.engine.periodic
+        if periodic:
+            stats = periodic.stats()
+            self.auto_send_status_label.setText(
+                f"实际 {stats['achieved_hz']:.1f}/{stats['target_hz']:.1f} 次/秒  "
+                f"延迟 均值 {stats['mean_us']:.0f}us p99 {stats['p99_us']:.0f}us 最大 {stats['max_us']:.0f}us  "
+                f"跳过 {stats['skipped']} 队列满 {stats['rejected']}"
+            )
+        
+        writer = self.engine.writer
+        if writer is None:
+            self.tx_status_label.setText("发送队列: 0")
+            return
+        self.tx_status_label.setText(
+            f"发送队列: {writer.depth} ({writer.pending_bytes} 字节)  {writer.rate} 字节/秒"
+        )
+        
+    def update_traffic(self):
+        """收发统计取样, 更新状态栏的收发字节数和速率"""
+        stats = self.traffic = self.engine.sample_stats()
+        self.received_bytes_label.setText(
+            f"接收: {stats['rx_bytes'] - self.rx_bytes_base} 字节  {stats['rx_bytes_rate']:.0f} B/s"
+        )
+        self.sent_bytes_label.setText(
+            f"发送: {stats['tx_bytes'] - self.tx_bytes_base} 字节  {stats['tx_bytes_rate']:.0f} B/s"
+        )
+        self.traffic_sampled.emit(stats)
+        self.update_search_index_status()
+        
+    def update_search_index_status(self):
+        index = self.search_index
+        if index.full:
+            self.search_index_label.setText(f"索引已满 ({index.max_size // (1024 * 1024)} MB)")
+            self.search_index_label.setToolTip(f"之后收到的 {index.skipped} 字节不能搜索, 清空接收区后重新开始索引")
+            self.search_index_label.setStyleSheet("color: #dc3545;")
+        else:
+            self.search_index_label.setText(f"已索引 {index.size / (1024 * 1024):.1f} MB" if index.size else "")
+            self.search_index_label.setToolTip("")
+            self.search_index_label.setStyleSheet("")
+        
+    def reset_traffic_stats(self):
+        """重置收发统计和状态栏字节数"""
+        self.engine.reset_stats()
+        self.rx_bytes_base = self.tx_bytes_base = 0
+        self.update_traffic()
+        
     def clear_receive(self):
-        """清空接收文本框"""
-        self.receive_text.clear()
+        """清空接收显示"""
+        self.receive_model.clear()
+        self.rx_formatter.reset()
+        self.search_index.clear()
+        self.rx_offset_base = 0
+        self.update_search_index_status()
+        self.line_map_offsets = []
+        self.line_map = []
+        self.reset_search()
+        self.rx_buffer.clear()
+        self.rx_dropped_reported = 0
         # 重置接收字节计数
         self.received_bytes_count = 0
-        self.received_bytes_label.setText(f"接收: {self.received_bytes_count} 字节")
+        self.rx_bytes_base = self.engine.stats.rx_bytes
+        self.received_bytes_label.setText("接收: 0 字节")
         
     def clear_send(self):
         """清空发送文本框"""
         self.send_text.clear()
         # 重置发送字节计数
-        self.sent_bytes_count = 0
-        self.sent_bytes_label.setText(f"发送: {self.sent_bytes_count} 字节")
+        self.tx_bytes_base = self.engine.stats.tx_bytes
+        self.sent_bytes_label.setText("发送: 0 字节")
         
     def toggle_auto_send(self):
         """切换自动发送功能的状态"""
         if self.auto_send_check.isChecked():
-            # 获取自动发送间隔
-            interval = self.auto_send_interval.value()
-            # 启动定时器
-            self.auto_send_timer.start(interval)
-            # 在状态栏显示自动发送已启动
-            self.statusBar().showMessage(f"自动发送已启动，间隔: {interval}ms", 2000)
+            if self.engine.is_open:
+                self.start_auto_send()
         else:
-            # 停止定时器
-            self.auto_send_timer.stop()
+            # 停止调度线程
+            self.engine.stop_periodic()
+            self.auto_send_status_label.setText("")
             # 在状态栏显示自动发送已停止
             self.statusBar().showMessage("自动发送已停止", 2000)
+            
+    def start_auto_send(self):
+        """按当前间隔启动自动发送调度线程"""
+        # 获取自动发送间隔
+        interval = self.auto_send_interval.value()
+        self.engine.start_periodic(self.current_send_payload(), interval / 1000)
+        # 在状态栏显示自动发送已启动
+        self.statusBar().showMessage(f"自动发送已启动，间隔: {interval:g}ms", 2000)
+        
+    def on_auto_send_interval_changed(self):
+        """自动发送运行中修改间隔时按新间隔重新调度"""
+        if self.engine.periodic:
+            self.start_auto_send()
+        
+    def toggle_recording(self):
+        """开始或停止把收发数据录制到捕获文件"""
+        if self.engine.recorder:
+            self.stop_recording()
+            return
+        default_name = datetime.now().strftime("capture_%Y%m%d_%H%M%S") + CAPTURE_SUFFIX
+        path, _ = QFileDialog.getSaveFileName(
+            self, "开始录制", default_name, f"捕获文件 (*{CAPTURE_SUFFIX});;所有文件 (*)"
+        )
+        if path:
+            self.start_recording(path)
+        
+    def start_recording(self, path):
+        """开始录制到指定的捕获文件"""
+        try:
+            self.engine.start_recording(path)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法创建捕获文件: {str(e)}")
+            return
+        self.record_action.setText("停止录制")
+        self.statusBar().showMessage(f"正在录制到 {path}", 3000)
+        
+    def stop_recording(self):
+        """停止录制并关闭捕获文件"""
+        recorder = self.engine.stop_recording()
+        if not recorder:
+            return
+        self.record_action.setText("开始录制...")
+        self.statusBar().showMessage(
+            f"录制已停止: {recorder.records} 条记录, 接收 {recorder.rx_bytes} 字节, 发送 {recorder.tx_bytes} 字节",
+            5000
+        )
+        
+    def open_capture(self):
+        """以内存映射方式打开捕获文件查看"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "打开捕获文件", "", f"捕获文件 (*{CAPTURE_SUFFIX});;所有文件 (*)"
+        )
+        if not path:
+            return
+        try:
+            reader = CaptureReader(path)
+        except (CaptureFormatError, OSError, ValueError) as e:
+            QMessageBox.critical(self, "错误", f"无法打开捕获文件: {str(e)}")
+            return
+        dialog = CaptureViewerDialog(reader, self, hex_mode=self.receive_hex_check.isChecked())
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        self.set_font_recursive(dialog)
+        dialog.view.setStyleSheet(self.receive_view.styleSheet())
+        dialog.show()
+        
+    def send_file(self):
+        """从磁盘流式发送原始或十六进制文本文件"""
+        if not self.engine.is_open:
+            QMessageBox.warning(self, "警告", "请先打开串口")
+            return
+        if self.engine.file_sender:
+            QMessageBox.warning(self, "警告", "已有文件正在发送")
+            return
+        hex_filter = "十六进制文本 (*.hex *.txt)"
+        path, selected_filter = QFileDialog.getOpenFileName(
+            self, "发送文件", "", f"所有文件 (*);;{hex_filter}"
+        )
+        if not path:
+            return
+        try:
+            sender = self.engine.start_file_send(path, hex_mode=selected_filter == hex_filter)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法发送文件: {str(e)}")
+            return
+        
+        # 进度对话框, 定时读取发送进度, 取消时停止发送
+        progress = QProgressDialog(f"正在发送 {os.path.basename(path)}", "取消", 0, 1000, self)
+        progress.setWindowTitle("发送文件")
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        timer = QTimer(progress)
+        
+        def update_progress():
+            sent, fraction, rate, remaining = sender.progress()
+            progress.setValue(int(fraction * 1000))
+            progress.setLabelText(
+                f"{os.path.basename(path)}\n已发送 {sent} 字节  {rate / 1024:.1f} KB/s  剩余约 {remaining:.0f} 秒"
+            )
+            if not sender.finished:
+                return
+            timer.stop()
+            progress.close()
+            if self.engine.file_sender is sender:
+                self.engine.file_sender = None
+            if sender.error:
+                QMessageBox.critical(self, "错误", f"文件发送失败: {sender.error}")
+            elif not sender.cancelled:
+                self.statusBar().showMessage(f"文件发送完成: {sent} 字节, 平均 {rate / 1024:.1f} KB/s", 5000)
+                
+        def cancel():
+            if self.engine.file_sender is sender:
+                self.engine.stop_file_send()
+            self.statusBar().showMessage("文件发送已取消", 3000)
+            
+        progress.canceled.connect(cancel)
+        timer.timeout.connect(update_progress)
+        timer.start(200)
+        progress.show()
         
     def on_connection_closed(self):
         """连接关闭时的处理"""
@@ -1476,14 +3745,113 @@ class SerialMonitor(QMainWindow):
     def closeEvent(self, event):
         """窗口关闭事件"""
         self.close_serial()
+        self.stop_recording()
+        self.search_index.close()
         self.save_settings()  # 保存用户设置
         event.accept()
 
+class MultiPortWindow(QMainWindow):
+    """多串口会话窗口
+
+    每个标签页是一个独立的 SerialMonitor 会话, 有自己的串口设置、接收显示和
+    发送。所有会话的接收由同一个 IoLoop 线程服务, 数据帧库在会话之间共享。
+    关闭窗口时保存各会话的串口设置, 下次启动时恢复标签页(不自动连接)。
+    """
+    def __init__(self):
+        super().__init__()
+        self.settings = QSettings("SerialMonitor", "Settings")
+        self.io_loop = IoLoop()
+        self.io_loop.start()
+        self.data_frames = FrameLibrary(default_library_path())
+        try:
+            self.data_frames.load()
+        except (OSError, FrameLibraryError) as e:
+            print(f"无法加载数据帧库: {e}")
+            
+        self.setWindowTitle("现代串口调试工具")
+        self.setWindowIcon(QIcon("LOGO/NEWLOGO.jpg"))
+        self.setGeometry(100, 100, 1080, 800)
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.tabCloseRequested.connect(self.close_session)
+        self.tabs.currentChanged.connect(self.on_current_changed)
+        new_button = QPushButton("+")
+        new_button.setToolTip("新建会话 (Ctrl+T)")
+        new_button.setFixedWidth(32)
+        new_button.clicked.connect(lambda: self.add_session())
+        self.tabs.setCornerWidget(new_button, Qt.TopRightCorner)
+        self.setCentralWidget(self.tabs)
+        
+        new_action = QAction("新建会话", self)
+        new_action.setShortcut("Ctrl+T")
+        new_action.triggered.connect(lambda: self.add_session())
+        self.addAction(new_action)
+        close_action = QAction("关闭会话", self)
+        close_action.setShortcut("Ctrl+W")
+        close_action.triggered.connect(lambda: self.close_session(self.tabs.currentIndex()))
+        self.addAction(close_action)
+        
+        try:
+            states = json.loads(self.settings.value("sessions", "[]"))
+        except ValueError:
+            states = []
+        for state in states or [{}]:
+            self.add_session(state, activate=False)
+        
+    @property
+    def sessions(self):
+        return [self.tabs.widget(i) for i in range(self.tabs.count())]
+        
+    def add_session(self, state=None, activate=True):
+        """新建一个会话标签页并返回其 SerialMonitor"""
+        monitor = SerialMonitor(io_loop=self.io_loop, frames=self.data_frames)
+        monitor.setWindowFlags(Qt.Widget)
+        if state:
+            monitor.restore_session_state(state)
+        monitor.connection_changed.connect(lambda: self.update_tab_title(monitor))
+        index = self.tabs.addTab(monitor, monitor.session_title())
+        if activate:
+            self.tabs.setCurrentIndex(index)
+        return monitor
+        
+    def update_tab_title(self, monitor):
+        index = self.tabs.indexOf(monitor)
+        if index >= 0:
+            self.tabs.setTabText(index, monitor.session_title())
+            
+    def on_current_changed(self, index):
+        """切换到未连接的会话时刷新其串口列表"""
+        monitor = self.tabs.widget(index)
+        if monitor is not None and not monitor.engine.is_open:
+            monitor.refresh_ports()
+            
+    def close_session(self, index):
+        """关闭会话; 关闭最后一个会话时新建一个空会话"""
+        monitor = self.tabs.widget(index)
+        if monitor is None:
+            return
+        monitor.close()
+        self.tabs.removeTab(index)
+        monitor.deleteLater()
+        if not self.tabs.count():
+            self.add_session()
+            
+    def closeEvent(self, event):
+        """保存各会话的串口设置, 关闭所有会话和共用的接收线程"""
+        self.settings.setValue("sessions", json.dumps([monitor.session_state() for monitor in self.sessions]))
+        for monitor in self.sessions:
+            monitor.close()
+        self.io_loop.stop()
+        event.accept()
+
 if __name__ == "__main__":
     try:
         # 尝试导入必要的模块
         app = QApplication(sys.argv)
-        window = SerialMonitor()
+        ReceiveHistory.sweep()
+        window = MultiPortWindow()
         window.show()
         sys.exit(app.exec_())
     except ImportError as e:
@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+"""Modbus RTU
+
+帧检测: Modbus RTU 以 3.5 个字符时间的线路空闲分隔帧。frame_gap_ms() 按
+串口的波特率和字符格式计算该间隔(波特率高于 19200 时按规范固定为 1.75ms),
+ModbusMonitor 在接收线程中用 IdleGapDeframer 按该间隔切分, 再逐帧校验
+CRC-16/MODBUS 并解码。USB 转串口的延迟定时器可能把相邻的请求和应答合并到
+一次读取中, 因此间隔切出的数据 CRC 不对时, 再按功能码推算的帧长尝试拆分。
+
+主站: ModbusMaster 按固定周期轮询一组寄存器块(功能码 1-4), 应答按功能码
+推算的长度在接收线程中判定完整并取时间戳, 按从站统计往返时间、超时、CRC
+错误和异常应答。
+
+命令行:
+    python modbus.py monitor <串口> [-b 9600] [--parity E]
+    python modbus.py poll <串口> --read 1:3:0:10 [--read 2:4:100:2] [--interval 100] [--duration 10]
+    python modbus.py selftest        通过 pty 对模拟从站测试主站和监视(Linux/macOS)
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+import threading
+from collections import deque
+
+import serial
+
+from checksum import parse_checksum
+from deframer import DeframingListener, IdleGapDeframer
+from serial_engine import SerialEngine, bits_per_char, format_capture_time, sleep_until
+
+CRC = parse_checksum('CRC-16/MODBUS')
+
+READ_COILS = 1
+READ_DISCRETE_INPUTS = 2
+READ_HOLDING_REGISTERS = 3
+READ_INPUT_REGISTERS = 4
+WRITE_SINGLE_COIL = 5
+WRITE_SINGLE_REGISTER = 6
+WRITE_MULTIPLE_COILS = 15
+WRITE_MULTIPLE_REGISTERS = 16
+
+FUNCTION_NAMES = {
+    READ_COILS: "读线圈",
+    READ_DISCRETE_INPUTS: "读离散输入",
+    READ_HOLDING_REGISTERS: "读保持寄存器",
+    READ_INPUT_REGISTERS: "读输入寄存器",
+    WRITE_SINGLE_COIL: "写单个线圈",
+    WRITE_SINGLE_REGISTER: "写单个寄存器",
+    WRITE_MULTIPLE_COILS: "写多个线圈",
+    WRITE_MULTIPLE_REGISTERS: "写多个寄存器",
+}
+READ_FUNCTIONS = (READ_COILS, READ_DISCRETE_INPUTS, READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS)
+
+EXCEPTION_NAMES = {
+    1: "非法功能",
+    2: "非法数据地址",
+    3: "非法数据值",
+    4: "从站设备故障",
+    5: "确认",
+    6: "从站设备忙",
+    8: "存储奇偶性差错",
+    10: "网关路径不可用",
+    11: "网关目标设备无响应",
+}
+
+# 帧类型
+REQUEST = 'request'
+RESPONSE = 'response'
+EXCEPTION = 'exception'
+UNKNOWN = 'unknown'
+
+KIND_NAMES = {REQUEST: "请求", RESPONSE: "应答", EXCEPTION: "异常", UNKNOWN: "未知"}
+
+
+def char_time_s(baudrate, bytesize=8, parity='N', stopbits=1):
+    """一个字符(起始位 + 数据位 + 校验位 + 停止位)的传输时间, 秒"""
+    return bits_per_char(bytesize, parity, stopbits) / baudrate
+
+
+def frame_gap_ms(baudrate, bytesize=8, parity='N', stopbits=1):
+    """3.5 个字符时间, 毫秒; 波特率高于 19200 时为规范规定的 1.75ms"""
+    if baudrate > 19200:
+        return 1.75
+    return 3.5 * char_time_s(baudrate, bytesize, parity, stopbits) * 1000
+
+
+def build_request(slave, function, address, value):
+    """功能码 1-6 的请求: 从站, 功能码, 地址, 数量或写入值, CRC"""
+    return CRC.append(struct.pack('>BBHH', slave, function, address, value))
+
+
+def response_length(function, count):
+    """读功能码正常应答的总字节数"""
+    if function in (READ_COILS, READ_DISCRETE_INPUTS):
+        return 5 + (count + 7) // 8
+    if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+        return 5 + 2 * count
+    return 8
+
+
+def _candidate_lengths(data, position):
+    """按功能码推算从 position 开始的帧可能的长度, 用于拆分合并在一起的帧"""
+    if len(data) - position < 4:
+        return []
+    function = data[position + 1]
+    if function & 0x80:
+        return [5]
+    if function in READ_FUNCTIONS:
+        return [8, 5 + data[position + 2]]
+    if function in (WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER):
+        return [8]
+    if function in (WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS):
+        lengths = [8]
+        if len(data) - position >= 7:
+            lengths.append(9 + data[position + 6])
+        return lengths
+    return []
+
+
+def split_frames(data):
+    """把一段空闲间隔切出的数据拆分为 CRC 正确的帧; 无法拆分的剩余部分作为一帧"""
+    if CRC.verify(data):
+        return [bytes(data)]
+    frames = []
+    position = 0
+    while position < len(data):
+        for length in _candidate_lengths(data, position):
+            if position + length <= len(data) and CRC.verify(data[position:position + length]):
+                frames.append(bytes(data[position:position + length]))
+                position += length
+                break
+        else:
+            frames.append(bytes(data[position:]))
+            break
+    return frames
+
+
+class ModbusFrame:
+    """解码后的一帧
+
+    kind 为 REQUEST / RESPONSE / EXCEPTION / UNKNOWN; 读请求和写请求/应答
+    有 address 和 count (写单个时 count 为写入值); 读应答的 values 为寄存器值
+    或线圈状态(0/1)列表; 异常应答的 exception 为异常码。
+    """
+    __slots__ = ('data', 'timestamp_ns', 'slave', 'function', 'crc_ok', 'kind',
+                 'address', 'count', 'values', 'exception')
+
+    def __init__(self, data, timestamp_ns=0):
+        self.data = data
+        self.timestamp_ns = timestamp_ns
+        self.slave = data[0] if data else None
+        self.function = data[1] if len(data) > 1 else None
+        self.crc_ok = len(data) >= 4 and CRC.verify(data)
+        self.kind = UNKNOWN
+        self.address = None
+        self.count = None
+        self.values = None
+        self.exception = None
+
+    @property
+    def function_name(self):
+        if self.function is None:
+            return ""
+        return FUNCTION_NAMES.get(self.function & 0x7F, f"功能码 {self.function & 0x7F}")
+
+    def describe(self):
+        """一行文字说明"""
+        if self.kind == EXCEPTION:
+            return f"异常 {self.exception}: {EXCEPTION_NAMES.get(self.exception, '未知异常')}"
+        if self.kind == RESPONSE and self.values is not None:
+            return f"{len(self.values)} 个值: {' '.join(map(str, self.values))}"
+        if self.function in (WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER):
+            return f"地址 {self.address} 值 {self.count}"
+        if self.address is not None:
+            return f"地址 {self.address} 数量 {self.count}"
+        return self.data.hex(' ').upper()
+
+
+def decode_frame(data, timestamp_ns=0, expect_response=None):
+    """解码一帧
+
+    读功能码的 8 字节请求与字节数为 3 的读线圈应答长度相同, expect_response
+    为真时按应答解码(监视时由上一帧是否为同一从站的同一请求决定)。
+    """
+    frame = ModbusFrame(bytes(data), timestamp_ns)
+    if not frame.crc_ok:
+        return frame
+    function = frame.function
+    body = frame.data[2:-2]
+    if function & 0x80:
+        if len(body) == 1:
+            frame.kind = EXCEPTION
+            frame.exception = body[0]
+        return frame
+    if function in READ_FUNCTIONS:
+        is_response = len(body) == 1 + body[0] and (expect_response or len(body) != 4)
+        if is_response:
+            frame.kind = RESPONSE
+            payload = body[1:]
+            if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+                frame.values = [value for value, in struct.iter_unpack('>H', payload)]
+            else:
+                frame.values = [(byte >> bit) & 1 for byte in payload for bit in range(8)]
+        elif len(body) == 4:
+            frame.kind = REQUEST
+            frame.address, frame.count = struct.unpack('>HH', body)
+    elif function in (WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER):
+        if len(body) == 4:
+            # 请求和应答相同
+            frame.kind = RESPONSE if expect_response else REQUEST
+            frame.address, frame.count = struct.unpack('>HH', body)
+    elif function in (WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS):
+        if len(body) == 4:
+            frame.kind = RESPONSE
+            frame.address, frame.count = struct.unpack('>HH', body)
+        elif len(body) >= 5 and len(body) == 5 + body[4]:
+            frame.kind = REQUEST
+            frame.address, frame.count = struct.unpack('>HH', body[:4])
+            if function == WRITE_MULTIPLE_REGISTERS:
+                frame.values = [value for value, in struct.iter_unpack('>H', body[5:5 + body[4] // 2 * 2])]
+    return frame
+
+
+class ModbusMonitor:
+    """监视线路上的 Modbus RTU 帧
+
+    engine.add_listener(monitor.listener) 之后在接收线程中按 3.5 字符空闲
+    分帧、拆分、解码, 每帧调用一次 on_frame(ModbusFrame)。最后一帧在下一批
+    数据到达或 poll() 时完成。
+    """
+    def __init__(self, gap_ms, on_frame):
+        self.on_frame = on_frame
+        self.frames = 0
+        self.crc_errors = 0
+        self._last_request = None
+        self.listener = DeframingListener(IdleGapDeframer(gap_ms), self._on_chunk)
+
+    def _on_chunk(self, data, start_ns, end_ns):
+        for frame_data in split_frames(data):
+            last = self._last_request
+            expect_response = last is not None and frame_data[:2] == last
+            frame = decode_frame(frame_data, start_ns, expect_response)
+            self._last_request = frame.data[:2] if frame.kind == REQUEST else None
+            self.frames += 1
+            if not frame.crc_ok:
+                self.crc_errors += 1
+            self.on_frame(frame)
+
+    def poll(self):
+        self.listener.poll()
+
+
+class PollItem:
+    """轮询的一个寄存器块; values 为最近一次成功读到的值"""
+    def __init__(self, slave, function, address, count):
+        if function not in READ_FUNCTIONS:
+            raise ValueError(f"轮询只支持功能码 1-4, 不支持 {function}")
+        if not 1 <= slave <= 247:
+            raise ValueError("从站地址必须在 1-247 之间")
+        limit = 2000 if function in (READ_COILS, READ_DISCRETE_INPUTS) else 125
+        if not 1 <= count <= limit:
+            raise ValueError(f"功能码 {function} 的数量必须在 1-{limit} 之间")
+        self.slave = slave
+        self.function = function
+        self.address = address
+        self.count = count
+        self.request = build_request(slave, function, address, count)
+        self.values = None
+        self.updated_ns = 0
+        self.error = None
+
+    @classmethod
+    def parse(cls, text):
+        """从 "从站:功能码:地址:数量" 创建"""
+        try:
+            slave, function, address, count = (int(field, 0) for field in text.split(':'))
+        except ValueError:
+            raise ValueError(f"轮询项格式应为 从站:功能码:地址:数量, 而不是 {text}") from None
+        return cls(slave, function, address, count)
+
+    def __str__(self):
+        return f"{self.slave}:{self.function}:{self.address}:{self.count}"
+
+
+class SlaveStats:
+    """一个从站的轮询统计, 往返时间只保留最近 window 次"""
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.crc_errors = 0
+        self.exceptions = 0
+        self.rtts = deque(maxlen=window)
+
+    def summary(self):
+        """返回统计: 请求/应答/超时/CRC 错误/异常次数, 最小/均值/p99/最大往返时间(毫秒)"""
+        values = sorted(self.rtts)
+        n = len(values)
+        return {
+            'requests': self.requests,
+            'responses': self.responses,
+            'timeouts': self.timeouts,
+            'crc_errors': self.crc_errors,
+            'exceptions': self.exceptions,
+            'min_ms': values[0] / 1e6 if n else 0,
+            'mean_ms': sum(values) / n / 1e6 if n else 0,
+            'p99_ms': values[min(n - 1, int(n * 0.99))] / 1e6 if n else 0,
+            'max_ms': values[-1] / 1e6 if n else 0,
+        }
+
+
+class ModbusMaster(threading.Thread):
+    """Modbus RTU 主站轮询线程
+
+    每 interval 秒(按绝对时间调度)依次轮询 items 中的每个寄存器块。请求之间
+    至少间隔 gap_ms 毫秒(3.5 字符时间); 应答在接收线程中按功能码推算的长度
+    判定完整, 往返时间为请求开始写出到应答完整的那次读取之间的时间。timeout
+    秒内应答不完整计为超时。错过的周期被跳过, 不会补发。
+    """
+    def __init__(self, engine, items, interval=1.0, timeout=0.5, gap_ms=1.75, on_result=None):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.items = list(items)
+        self.interval_ns = max(1, int(interval * 1e9))
+        self.timeout = timeout
+        self.gap_ns = int(gap_ms * 1e6)
+        # on_result(item, 结果说明) 在轮询线程中调用
+        self.on_result = on_result
+        self.stats = {}
+        self.cycles = 0
+        self.skipped = 0
+        self.error = None
+        self._stopped = threading.Event()
+        self._complete = threading.Event()
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._expected = None
+        self._matched_ns = 0
+        self._last_rx_ns = 0
+
+    def slave_stats(self, slave):
+        stats = self.stats.get(slave)
+        if stats is None:
+            stats = self.stats[slave] = SlaveStats()
+        return stats
+
+    def _on_data(self, data, timestamp_ns):
+        with self._lock:
+            self._last_rx_ns = timestamp_ns
+            if self._expected is None:
+                return
+            self._buffer += data
+            buffer = self._buffer
+            if len(buffer) < 2:
+                return
+            length = 5 if buffer[1] & 0x80 else self._expected
+            if len(buffer) >= length:
+                self._expected = None
+                self._matched_ns = timestamp_ns
+                self._complete.set()
+
+    def run(self):
+        self.engine.add_listener(self._on_data)
+        start = time.perf_counter_ns()
+        tick = 0
+        try:
+            while not self._stopped.is_set():
+                if not sleep_until(start + tick * self.interval_ns, self._stopped):
+                    return
+                for item in self.items:
+                    if self._stopped.is_set() or not self._poll(item):
+                        return
+                self.cycles += 1
+                tick += 1
+                due = (time.perf_counter_ns() - start) // self.interval_ns + 1
+                if due > tick:
+                    self.skipped += due - tick
+                    tick = due
+        finally:
+            self.engine.remove_listener(self._on_data)
+
+    def _poll(self, item):
+        """轮询一个寄存器块, 发送失败时记录 error 并返回 False"""
+        # 保证与上一次线路活动之间至少有 3.5 字符的空闲
+        if not sleep_until(max(self._last_rx_ns, self.engine.last_send_ns) + self.gap_ns, self._stopped):
+            return False
+        with self._lock:
+            self._buffer.clear()
+            self._complete.clear()
+            self._expected = response_length(item.function, item.count)
+        stats = self.slave_stats(item.slave)
+        stats.requests += 1
+        try:
+            request = self.engine.submit(item.request, background=True)
+        except Exception as e:
+            self.error = str(e)
+            return False
+        request.wait()
+        if request.error:
+            self.error = request.error
+            return False
+        if not self._complete.wait(self.timeout):
+            with self._lock:
+                self._expected = None
+            stats.timeouts += 1
+            self._report(item, "超时")
+            return True
+        with self._lock:
+            response = bytes(self._buffer)
+        length = 5 if response[1] & 0x80 else response_length(item.function, item.count)
+        frame = decode_frame(response[:length], self._matched_ns, expect_response=True)
+        if not frame.crc_ok or frame.slave != item.slave or frame.function & 0x7F != item.function:
+            stats.crc_errors += 1
+            self._report(item, "CRC 错误" if not frame.crc_ok else "应答不匹配")
+            return True
+        stats.responses += 1
+        stats.rtts.append(self._matched_ns - request.start_ns)
+        if frame.kind == EXCEPTION:
+            stats.exceptions += 1
+            self._report(item, frame.describe())
+            return True
+        item.values = frame.values[:item.count]
+        item.updated_ns = self._matched_ns
+        item.error = None
+        if self.on_result:
+            self.on_result(item, None)
+        return True
+
+    def _report(self, item, error):
+        item.error = error
+        if self.on_result:
+            self.on_result(item, error)
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+def format_master_stats(master):
+    """按从站格式化轮询统计"""
+    lines = [f"{'从站':>4} {'请求':>8} {'应答':>8} {'超时':>6} {'CRC错误':>7} {'异常':>6}  往返时间 ms"]
+    for slave, stats in sorted(master.stats.items()):
+        s = stats.summary()
+        lines.append(f"{slave:>6} {s['requests']:>10} {s['responses']:>10} {s['timeouts']:>8} "
+                     f"{s['crc_errors']:>10} {s['exceptions']:>8}  最小 {s['min_ms']:.2f} 均值 {s['mean_ms']:.2f} "
+                     f"p99 {s['p99_ms']:.2f} 最大 {s['max_ms']:.2f}")
+    return '\n'.join(lines)
+
+
+class _SlaveSimulator(threading.Thread):
+    """selftest 用的从站: 寄存器 n 的值为 n, 地址 >= 1000 时返回非法数据地址,
+    不在 slaves 中的从站不应答"""
+    def __init__(self, fd, slaves):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.slaves = slaves
+
+    def run(self):
+        buffer = b''
+        while True:
+            try:
+                buffer += os.read(self.fd, 4096)
+            except OSError:
+                return
+            # 读请求固定为 8 字节, 直接按长度切分
+            while len(buffer) >= 8:
+                self._respond(decode_frame(buffer[:8]))
+                buffer = buffer[8:]
+
+    def _respond(self, frame):
+        if frame.kind != REQUEST or frame.slave not in self.slaves:
+            return
+        if frame.address >= 1000:
+            os.write(self.fd, CRC.append(bytes([frame.slave, frame.function | 0x80, 2])))
+            return
+        if frame.function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            payload = b''.join(struct.pack('>H', (frame.address + i) & 0xFFFF) for i in range(frame.count))
+        else:
+            bits = [(frame.address + i) & 1 for i in range(frame.count)]
+            payload = bytes(sum(bit << i for i, bit in enumerate(bits[k:k + 8])) for k in range(0, len(bits), 8))
+        os.write(self.fd, CRC.append(bytes([frame.slave, frame.function, len(payload)]) + payload))
+
+
+def selftest():
+    """通过 pty 对和模拟从站测试主站轮询与监视解码, 全部成功时返回 True"""
+    import tty
+
+    ok = True
+    # 解码与拆分
+    request = build_request(1, READ_HOLDING_REGISTERS, 10, 2)
+    response = CRC.append(bytes([1, 3, 4, 0, 10, 0, 11]))
+    frames = [decode_frame(data) for data in split_frames(request + response)]
+    passed = [(f.kind, f.address, f.values) for f in frames] == [(REQUEST, 10, None), (RESPONSE, None, [10, 11])]
+    ok &= passed
+    print(f"合并帧拆分与解码 {'通过' if passed else '失败'}")
+
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(master_fd)
+    simulator = _SlaveSimulator(master_fd, {1, 2})
+    simulator.start()
+    engine = SerialEngine()
+    engine.open(os.ttyname(slave_fd), baudrate=115200)
+    items = [PollItem(1, READ_HOLDING_REGISTERS, 0, 10), PollItem(2, READ_INPUT_REGISTERS, 100, 125),
+             PollItem(2, READ_COILS, 0, 20), PollItem(1, READ_HOLDING_REGISTERS, 1000, 1),
+             PollItem(9, READ_HOLDING_REGISTERS, 0, 1)]
+    master = ModbusMaster(engine, items, interval=0.02, timeout=0.05, gap_ms=frame_gap_ms(115200))
+    master.start()
+    time.sleep(1.0)
+    master.stop()
+    engine.close()
+    os.close(master_fd)
+    os.close(slave_fd)
+    print(format_master_stats(master))
+    passed = (
+        items[0].values == list(range(10)) and items[1].values == list(range(100, 225))
+        and items[2].values == [i & 1 for i in range(20)]
+        and master.stats[1].exceptions > 0 and master.stats[9].timeouts == master.stats[9].requests > 0
+        and master.stats[2].timeouts == 0 and master.stats[2].crc_errors == 0
+    )
+    ok &= passed
+    print(f"主站轮询 {master.cycles} 个周期 {'通过' if passed else '失败'} {master.error or ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modbus RTU 监视与主站轮询")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('monitor', 'poll'):
+        command = sub.add_parser(name)
+        command.add_argument('port')
+        command.add_argument('-b', '--baudrate', type=int, default=9600)
+        command.add_argument('--bytesize', type=int, choices=(7, 8), default=8)
+        command.add_argument('--parity', choices=('N', 'E', 'O'), default='N')
+        command.add_argument('--stopbits', type=float, choices=(1, 2), default=1)
+        command.add_argument('--duration', type=float, metavar='SECONDS', help="运行时长, 默认一直运行到 Ctrl+C")
+    poll = sub.choices['poll']
+    poll.add_argument('--read', action='append', required=True, metavar='SLAVE:FUNC:ADDR:COUNT',
+                      help="轮询的寄存器块, 可重复; 功能码 1-4")
+    poll.add_argument('--interval', type=float, default=1000, metavar='MS', help="轮询周期")
+    poll.add_argument('--timeout', type=float, default=500, metavar='MS', help="应答超时")
+    sub.add_parser('selftest')
+    args = parser.parse_args(argv)
+    if args.command == 'selftest':
+        return 0 if selftest() else 1
+
+    try:
+        items = [PollItem.parse(text) for text in args.read] if args.command == 'poll' else []
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    gap_ms = frame_gap_ms(args.baudrate, args.bytesize, args.parity, args.stopbits)
+    engine = SerialEngine()
+    try:
+        engine.open(args.port, baudrate=args.baudrate, bytesize=args.bytesize, parity=args.parity,
+                    stopbits=args.stopbits)
+    except (serial.SerialException, ValueError) as e:
+        print(f"无法打开串口 {args.port}: {e}", file=sys.stderr)
+        return 2
+    worker = None
+    try:
+        if args.command == 'monitor':
+            def show(frame):
+                crc = '' if frame.crc_ok else ' CRC错误'
+                print(f"[{format_capture_time(frame.timestamp_ns)}] 从站 {frame.slave} {frame.function_name} "
+                      f"{KIND_NAMES[frame.kind]} {frame.describe()}{crc}")
+
+            worker = ModbusMonitor(gap_ms, show)
+            engine.add_listener(worker.listener)
+        else:
+            def show(item, error):
+                print(f"{item}: {error or ' '.join(map(str, item.values))}")
+
+            worker = ModbusMaster(engine, items, args.interval / 1000, args.timeout / 1000, gap_ms, on_result=show)
+            worker.start()
+        deadline = time.monotonic() + args.duration if args.duration is not None else None
+        while engine.is_open and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.05)
+            if args.command == 'monitor':
+                worker.poll()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.command == 'poll':
+            worker.stop()
+            print(format_master_stats(worker), file=sys.stderr)
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""实时曲线的数据: 字段解析和抽取环形缓冲区
+
+LineParser 从接收的文本行中解析数值字段, 例如 "T=23.4,H=55"。PlotFeed 作为
+串口引擎的接收回调在接收线程中按行切分(DelimiterDeframer)、解析, 把数值
+连同该行的采集时间戳写入每个通道的 DecimatingRing, 界面线程只在重绘时读取。
+
+DecimatingRing 是定长的 array 环形缓冲区, 除原始采样外还维护若干级 min/max
+摘要: 第 k 级的每一项汇总 FACTOR**k 个连续采样, 随采样写入增量更新(每个
+采样均摊 O(1))。envelope() 按每个像素列包含的采样数选择合适的级别, 读取的
+项数约为 宽度 * FACTOR, 与窗口内的采样总数无关, 因此重绘代价只取决于像素宽度。
+"""
+import re
+import threading
+from array import array
+
+from deframer import DelimiterDeframer, DeframingListener
+
+FACTOR = 8
+
+# 默认模式: 名称=数值 或 名称:数值
+DEFAULT_PATTERN = r'(?P<name>[A-Za-z_][\w.]*)\s*[=:]\s*(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+NUMBER_PATTERN = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+
+
+class LineParser:
+    """从一行文本中解析 [(通道名, 数值), ...]
+
+    pattern 为正则表达式:
+        含 name 和 value 命名组: 在行中查找所有匹配, 通道名取 name 组(默认模式)
+        含其他命名组: 每行匹配一次, 每个命名组是一个通道
+        没有命名组: 在行中查找所有匹配, 第 i 个匹配是通道 "i" (有分组时取第一组)
+    """
+    def __init__(self, pattern=None):
+        self.pattern = pattern or DEFAULT_PATTERN
+        try:
+            self.regex = re.compile(self.pattern)
+        except re.error as e:
+            raise ValueError(f"正则表达式错误: {e}") from e
+        names = set(self.regex.groupindex)
+        if {'name', 'value'} <= names:
+            self.parse = self._parse_pairs
+        elif names:
+            self.parse = self._parse_groups
+        else:
+            self.parse = self._parse_sequence
+
+    def _parse_pairs(self, line):
+        values = []
+        for match in self.regex.finditer(line):
+            try:
+                values.append((match.group('name'), float(match.group('value'))))
+            except (TypeError, ValueError):
+                pass
+        return values
+
+    def _parse_groups(self, line):
+        match = self.regex.search(line)
+        if match is None:
+            return []
+        values = []
+        for name, text in match.groupdict().items():
+            try:
+                values.append((name, float(text)))
+            except (TypeError, ValueError):
+                pass
+        return values
+
+    def _parse_sequence(self, line):
+        values = []
+        group = 1 if self.regex.groups else 0
+        for index, match in enumerate(self.regex.finditer(line), 1):
+            try:
+                values.append((str(index), float(match.group(group))))
+            except (TypeError, ValueError):
+                pass
+        return values
+
+
+class DecimatingRing:
+    """带多级 min/max 摘要的定长采样环形缓冲区(非线程安全, 由 PlotStore 加锁)
+
+    第 0 级保存最近 capacity 个 (时间戳 ns, 值); 第 k 级保存 capacity /
+    FACTOR**k 个块摘要 (块首时间戳, 最小值, 最大值)。各级用单调递增的绝对
+    序号寻址, 序号 n 存放在 n % 容量 处。
+    """
+    def __init__(self, capacity=1 << 18, factor=FACTOR):
+        self.factor = factor
+        self.capacity = capacity
+        self.times = [array('q', bytes(8 * capacity))]
+        self.mins = [array('d', bytes(8 * capacity))]
+        self.maxs = [self.mins[0]]
+        self.capacities = [capacity]
+        self.totals = [0]
+        # 每一级(从第 1 级起)正在累积的块: [块首时间戳, 最小值, 最大值, 已汇总的下级项数]
+        self._pending = []
+        size = capacity // factor
+        while size >= 16:
+            self.times.append(array('q', bytes(8 * size)))
+            self.mins.append(array('d', bytes(8 * size)))
+            self.maxs.append(array('d', bytes(8 * size)))
+            self.capacities.append(size)
+            self.totals.append(0)
+            self._pending.append(None)
+            size //= factor
+        self.last = None
+
+    @property
+    def levels(self):
+        return len(self.capacities)
+
+    def __len__(self):
+        return min(self.totals[0], self.capacity)
+
+    def append(self, timestamp_ns, value):
+        slot = self.totals[0] % self.capacity
+        self.times[0][slot] = timestamp_ns
+        self.mins[0][slot] = value
+        self.totals[0] += 1
+        self.last = value
+        low = high = value
+        for level in range(1, self.levels):
+            pending = self._pending[level - 1]
+            if pending is None:
+                pending = self._pending[level - 1] = [timestamp_ns, low, high, 0]
+            else:
+                if low < pending[1]:
+                    pending[1] = low
+                if high > pending[2]:
+                    pending[2] = high
+            pending[3] += 1
+            if pending[3] < self.factor:
+                return
+            # 块已满: 写入本级, 并作为一项汇总到上一级
+            slot = self.totals[level] % self.capacities[level]
+            timestamp_ns, low, high = pending[0], pending[1], pending[2]
+            self.times[level][slot] = timestamp_ns
+            self.mins[level][slot] = low
+            self.maxs[level][slot] = high
+            self.totals[level] += 1
+            self._pending[level - 1] = None
+
+    def clear(self):
+        for level in range(self.levels):
+            self.totals[level] = 0
+        self._pending = [None] * (self.levels - 1)
+        self.last = None
+
+    def _first_valid(self, level):
+        return max(0, self.totals[level] - self.capacities[level])
+
+    def _time(self, level, n):
+        return self.times[level][n % self.capacities[level]]
+
+    def _search(self, level, timestamp_ns):
+        """返回第 level 级中第一个时间戳 >= timestamp_ns 的绝对序号"""
+        low, high = self._first_valid(level), self.totals[level]
+        while low < high:
+            middle = (low + high) // 2
+            if self._time(level, middle) < timestamp_ns:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def envelope(self, start_ns, end_ns, width):
+        """把 [start_ns, end_ns) 内的采样按 width 个像素列汇总
+
+        返回 [(列号, 最小值, 最大值), ...], 只包含有数据的列, 按列号排序。
+        """
+        if width <= 0 or end_ns <= start_ns or not self.totals[0]:
+            return []
+        first = self._search(0, start_ns)
+        last = self._search(0, end_ns)
+        count = last - first
+        if count <= 0:
+            return []
+        # 每列至少包含一个块的最高级别
+        level = 0
+        while level + 1 < self.levels and self.factor ** (level + 1) * width <= count:
+            level += 1
+        columns_min = {}
+        columns_max = {}
+        scale = width / (end_ns - start_ns)
+
+        def add(timestamp_ns, low, high):
+            column = min(max(int((timestamp_ns - start_ns) * scale), 0), width - 1)
+            if column in columns_min:
+                if low < columns_min[column]:
+                    columns_min[column] = low
+                if high > columns_max[column]:
+                    columns_max[column] = high
+            else:
+                columns_min[column] = low
+                columns_max[column] = high
+
+        def cover(current, low, high):
+            """汇总采样 [low, high): 用第 current 级的完整块, 两端不足一块的部分交给下一级"""
+            if low >= high:
+                return
+            if current == 0:
+                times, values = self.times[0], self.mins[0]
+                for n in range(max(low, self._first_valid(0)), high):
+                    slot = n % self.capacity
+                    add(times[slot], values[slot], values[slot])
+                return
+            block = self.factor ** current
+            begin = max(-(-low // block), self._first_valid(current))
+            end = min(high // block, self.totals[current])
+            if begin >= end:
+                cover(current - 1, low, high)
+                return
+            capacity = self.capacities[current]
+            times, mins, maxs = self.times[current], self.mins[current], self.maxs[current]
+            for n in range(begin, end):
+                slot = n % capacity
+                add(times[slot], mins[slot], maxs[slot])
+            cover(current - 1, low, begin * block)
+            cover(current - 1, end * block, high)
+
+        cover(level, first, last)
+        return [(column, columns_min[column], columns_max[column]) for column in sorted(columns_min)]
+
+
+class PlotStore:
+    """按通道名保存 DecimatingRing, 写入和查询都持有同一把锁"""
+    def __init__(self, capacity=1 << 18, max_channels=16):
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.channels = {}
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp_ns, values):
+        with self.lock:
+            for name, value in values:
+                ring = self.channels.get(name)
+                if ring is None:
+                    if len(self.channels) >= self.max_channels:
+                        continue
+                    ring = self.channels[name] = DecimatingRing(self.capacity)
+                ring.append(timestamp_ns, value)
+                self.samples += 1
+
+    def envelopes(self, start_ns, end_ns, width):
+        """返回 {通道名: (envelope, 最新值)}"""
+        with self.lock:
+            return {name: (ring.envelope(start_ns, end_ns, width), ring.last)
+                    for name, ring in self.channels.items()}
+
+    def clear(self):
+        with self.lock:
+            self.channels.clear()
+            self.samples = 0
+
+
+class PlotFeed:
+    """接收回调: 在接收线程中按行解析数值并写入 PlotStore
+
+    engine.add_listener(feed.listener)。同一行的所有字段使用该行首字节的
+    采集时间戳。不能解码或不含数值的行被忽略。
+    """
+    def __init__(self, store, parser, max_line=4096):
+        self.store = store
+        self.parser = parser
+        self.lines = 0
+        self.listener = DeframingListener(DelimiterDeframer(b'\n', max_length=max_line), self._on_line)
+
+    def _on_line(self, data, start_ns, end_ns):
+        self.lines += 1
+        values = self.parser.parse(data.decode('ascii', errors='ignore'))
+        if values:
+            self.store.append(start_ns, values)
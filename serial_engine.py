@@ -0,0 +1,2153 @@
+# -*- coding: utf-8 -*-
+"""串口引擎
+
+串口的打开、接收线程、发送和录制都在这里实现, 不依赖 Qt。图形界面
+(main.py) 只是这个引擎的一个前端; 测试架上的自动化脚本可以直接使用命令行
+入口, 无需加载 PyQt5:
+
+    python serial_engine.py --list
+    python serial_engine.py COM3 -b 115200 --log rx.log --timestamps
+    python serial_engine.py /dev/ttyUSB0 --capture run.smcap --duration 3600
+    python serial_engine.py COM3 --send "AT\\r\\n" --duration 1
+    python serial_engine.py COM3 --script probe.txt
+    python serial_engine.py COM3 --send "PING\\r\\n" --latency 1000 --match-prefix PONG --csv rtt.csv
+    python serial_engine.py COM3 --deframe "length:offset=2,size=2,header=aa55"
+    python serial_engine.py COM3 --send-hex 010300000002 --checksum CRC-16/MODBUS --deframe idle:4
+    python serial_engine.py COM3 --duration 60 --stats
+
+脚本文件每行一条命令, # 开头为注释:
+    send <文本> [*N]         发送文本, 支持 \\r \\n \\xNN 转义, *N 表示连续发送 N 次
+    sendhex <十六进制> [*N]  发送十六进制数据
+    frame <名称> [*N]        发送数据帧库中的数据帧
+    expect <正则> [超时ms]   等待接收数据匹配正则, 打印距上次发送的往返时间
+    wait <ms>                下一步的计划时间延后 ms 毫秒(可为小数)
+"""
+import os
+import re
+import csv
+import sys
+import time
+import codecs
+import bisect
+import argparse
+import selectors
+import threading
+from collections import deque
+from datetime import datetime
+
+import serial
+import serial.tools.list_ports
+
+from capture_file import CaptureWriter
+from checksum import parse_checksum
+from deframer import DeframingListener, IdleGapDeframer, parse_deframer
+from frame_library import Frame, FrameLibrary, FrameLibraryError, default_library_path
+
+
+# 界面波特率下拉框和基准测试使用的常用波特率
+COMMON_BAUDRATES = [9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
+
+# perf_counter_ns 与系统时间的差值, 用于把采集时间戳换算为墙上时间
+PERF_TO_WALL_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def format_capture_time(timestamp_ns, clock_offset_ns=PERF_TO_WALL_NS):
+    """把 perf_counter_ns 采集时间戳格式化为 HH:MM:SS.ffffff
+
+    clock_offset_ns 为采集进程中 perf_counter_ns 与系统时间的差值, 查看捕获
+    文件时使用文件头中记录的值。
+    """
+    wall = datetime.fromtimestamp((timestamp_ns + clock_offset_ns) / 1e9)
+    return wall.strftime("%H:%M:%S.%f")
+
+
+def stamp_at(stamps, offsets, offset):
+    """返回覆盖 offset 处字节的采集时间戳
+
+    stamps 为按偏移排序的 [(偏移, 时间戳), ...], offsets 为其中的偏移列表。
+    """
+    index = bisect.bisect_right(offsets, offset) - 1
+    return stamps[max(index, 0)][1]
+
+
+# 十六进制视图 ASCII 列的转换表: 可打印字符保持不变, 其余显示为 '.'
+HEX_ASCII_TABLE = bytes(b if 32 <= b <= 126 else 0x2E for b in range(256))
+
+
+class HexDumpFormatter:
+    """批量十六进制格式化
+
+    按整块 bytes 处理: bytes.hex(' ') 生成十六进制列, translate() 生成 ASCII
+    列, 每行只做一次切片拼接。行按数据流偏移对齐, 不足一行的尾部保留到下一次
+    feed(), 因此 16 字节的一行不会在读取边界处被拆开。
+    """
+    BYTES_PER_ROW = 16
+    
+    def __init__(self):
+        self.offset = 0
+        self._pending = b''
+        
+    @property
+    def pending_length(self):
+        """尚未凑满一行的字节数"""
+        return len(self._pending)
+        
+    def reset(self):
+        self.offset = 0
+        self._pending = b''
+        
+    def feed(self, data):
+        """追加数据, 返回 (完整行文本, 未满一行的尾部文本)
+
+        完整行文本以换行结束; 尾部文本不含换行, 下次 feed() 时会并入完整的一行。
+        """
+        self.offset += len(data)
+        buffer = self._pending + data if self._pending else data
+        full = len(buffer) - len(buffer) % self.BYTES_PER_ROW
+        self._pending = buffer[full:]
+        rows = self.format_rows(buffer[:full]) if full else ''
+        partial = self.format_rows(self._pending).rstrip('\n') if self._pending else ''
+        return rows, partial
+        
+    @classmethod
+    def format_rows(cls, data):
+        """格式化整块数据, 每行 16 字节, 每行以换行结束"""
+        n = cls.BYTES_PER_ROW
+        row_chars = n * 3
+        # 末行不足 16 字节时补空格, 使十六进制列保持 47 字符宽
+        hex_all = data.hex(' ').upper() + ' '
+        hex_all += ' ' * (-len(data) % n * 3)
+        ascii_all = data.translate(HEX_ASCII_TABLE).decode('ascii')
+        lines = [
+            hex_all[i * row_chars:(i + 1) * row_chars] + ' ' + ascii_all[i * n:(i + 1) * n] + '\n'
+            for i in range((len(data) + n - 1) // n)
+        ]
+        return ''.join(lines)
+
+
+class ReceiveFormatter:
+    """把接收的原始字节格式化为显示文本
+
+    文本模式使用增量解码器, 跨读取边界的多字节字符不会被拆开; 十六进制模式
+    使用 HexDumpFormatter, 行按数据流偏移对齐。timestamps 为真时为每段数据
+    添加采集时间戳, split_lines 为真时按行(十六进制按行首字节)添加时间戳。
+    实时接收视图和捕获文件查看器共用这一格式化路径。
+    """
+    def __init__(self, hex_mode=False, timestamps=False, split_lines=False,
+                 clock_offset_ns=PERF_TO_WALL_NS, show_partial=True):
+        self.hex_mode = hex_mode
+        # 为假时不完整的十六进制行留到凑满或 flush() 时输出, 用于只能追加的文件流
+        self.show_partial = show_partial
+        self.timestamps = timestamps
+        self.split_lines = split_lines
+        self.clock_offset_ns = clock_offset_ns
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.hex_formatter = HexDumpFormatter()
+        self.hex_partial_shown = False
+        # 未完成的十六进制行首字节的采集时间戳
+        self.hex_pending_stamp = 0
+        # 文本显示当前是否位于行首, 用于逐行时间戳
+        self.line_start = True
+        
+    def reset(self):
+        self.decoder.reset()
+        self.hex_formatter.reset()
+        self.hex_partial_shown = False
+        self.line_start = True
+        
+    def feed(self, data, stamps=None):
+        """格式化一批数据, 返回 (显示文本, 是否需先移除上次显示的不完整行)
+
+        stamps 为 [(批内偏移, perf_counter_ns 采集时间戳), ...], 未提供时使用当前时间。
+        """
+        if not stamps:
+            stamps = [(0, time.perf_counter_ns())]
+        if self.hex_mode:
+            return self._feed_hex(data, stamps)
+        return self._feed_text(data, stamps), False
+        
+    def _feed_hex(self, data, stamps):
+        pending = self.hex_formatter.pending_length
+        rows, partial = self.hex_formatter.feed(data)
+        if not self.show_partial:
+            partial = ''
+        retract = self.hex_partial_shown
+        self.hex_partial_shown = bool(partial)
+        display_data = rows + partial
+        n = HexDumpFormatter.BYTES_PER_ROW
+        offsets = [start for start, _ in stamps]
+        
+        if self.timestamps:
+            # 每行使用其首字节的采集时间戳; 未选择逐行时整批使用同一时间戳
+            lines = display_data.split('\n')
+            batch_stamp = self.hex_pending_stamp if pending else stamps[0][1]
+            timestamped_lines = []
+            for i, line in enumerate(lines):
+                if not line:
+                    timestamped_lines.append(line)
+                    continue
+                offset = i * n - pending
+                if offset < 0:
+                    timestamp_ns = self.hex_pending_stamp
+                elif self.split_lines:
+                    timestamp_ns = stamp_at(stamps, offsets, offset)
+                else:
+                    timestamp_ns = batch_stamp
+                timestamped_lines.append(f"[{format_capture_time(timestamp_ns, self.clock_offset_ns)}] {line}")
+            display_data = '\n'.join(timestamped_lines)
+        
+        # 记录未完成行首字节的时间戳, 下次补全该行时沿用
+        if self.hex_formatter.pending_length:
+            offset = rows.count('\n') * n - pending
+            if offset >= 0:
+                self.hex_pending_stamp = stamp_at(stamps, offsets, offset) if self.split_lines else stamps[0][1]
+        return display_data, retract
+        
+    def flush(self):
+        """返回尚未输出的不完整十六进制行, 仅 show_partial 为假时使用"""
+        if not self.hex_mode or self.show_partial:
+            return ''
+        _, partial = self.hex_formatter.feed(b'')
+        if not partial:
+            return ''
+        if self.timestamps:
+            partial = f"[{format_capture_time(self.hex_pending_stamp, self.clock_offset_ns)}] {partial}"
+        return partial + '\n'
+        
+    def _feed_text(self, data, stamps):
+        # 按读取分段增量解码, 保留不完整的多字节字符到下一次接收
+        segments = []
+        bounds = [offset for offset, _ in stamps[1:]] + [len(data)]
+        for (offset, timestamp_ns), end in zip(stamps, bounds):
+            text = self.decoder.decode(data[offset:end])
+            if text:
+                segments.append((text, timestamp_ns))
+        if not segments:
+            return ''
+        
+        if not self.timestamps:
+            display_data = ''.join(text for text, _ in segments)
+            self.line_start = display_data.endswith('\n')
+            return display_data
+        
+        parts = []
+        for text, timestamp_ns in segments:
+            prefix = f"[{format_capture_time(timestamp_ns, self.clock_offset_ns)}] "
+            if self.split_lines:
+                # 只在行首添加时间戳
+                lines = text.split('\n')
+                for i, line in enumerate(lines):
+                    if line and (i > 0 or self.line_start):
+                        lines[i] = prefix + line
+                parts.append('\n'.join(lines))
+            else:
+                parts.append(prefix + text)
+            self.line_start = text.endswith('\n')
+        return ''.join(parts)
+
+
+class RxRingBuffer:
+    """接收线程与界面之间的环形缓冲区
+
+    接收线程调用 write() 写入, 界面定时器调用 read() 按批取出。锁只在拷贝
+    数据时持有, 两端都不会长时间阻塞。缓冲区满时丢弃最旧的数据并累计到
+    dropped, 保证内存占用固定。
+    
+    每次 write() 附带一个采集时间戳, 与该次写入的起始流位置一起记录,
+    read_with_stamps() 取出数据时一并返回这批数据中各段的时间戳。
+    """
+    def __init__(self, capacity=4 * 1024 * 1024):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._head = 0  # 下一个读取位置
+        self._size = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+        # 流位置: 已读出/已写入的累计字节数
+        self._read_pos = 0
+        self._write_pos = 0
+        # 最近一次 read() 取出的数据的起始流位置; 与 dropped 一起可以确定显示的数据在接收流中的位置
+        self.last_read_start = 0
+        # (写入起始流位置, 采集时间戳)
+        self._marks = deque()
+        
+    def __len__(self):
+        return self._size
+        
+    def write(self, data, timestamp_ns=None):
+        """写入数据, 空间不足时覆盖最旧的数据"""
+        n = len(data)
+        if n == 0:
+            return
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        with self._lock:
+            self._marks.append((self._write_pos, timestamp_ns))
+            self._write_pos += n
+            if n >= self.capacity:
+                # 只保留最新的 capacity 字节
+                self.dropped += self._size + n - self.capacity
+                self._buffer[:] = data[n - self.capacity:]
+                self._head = 0
+                self._size = self.capacity
+                self._read_pos = self._write_pos - self.capacity
+                self._trim_marks(self._read_pos)
+                return
+            overflow = self._size + n - self.capacity
+            if overflow > 0:
+                self.dropped += overflow
+                self._head = (self._head + overflow) % self.capacity
+                self._size -= overflow
+                self._read_pos += overflow
+                self._trim_marks(self._read_pos)
+            tail = (self._head + self._size) % self.capacity
+            first = min(n, self.capacity - tail)
+            self._buffer[tail:tail + first] = data[:first]
+            if first < n:
+                self._buffer[:n - first] = data[first:]
+            self._size += n
+            
+    def _trim_marks(self, position):
+        """丢弃完全位于 position 之前的时间戳记录"""
+        marks = self._marks
+        while len(marks) > 1 and marks[1][0] <= position:
+            marks.popleft()
+            
+    def read(self, max_bytes=None):
+        """取出最多 max_bytes 字节, 返回 bytes"""
+        return self.read_with_stamps(max_bytes)[0]
+        
+    def read_with_stamps(self, max_bytes=None):
+        """取出最多 max_bytes 字节, 返回 (bytes, [(批内偏移, 采集时间戳), ...])"""
+        with self._lock:
+            n = self._size if max_bytes is None else min(self._size, max_bytes)
+            if n == 0:
+                return b'', []
+            end = self._head + n
+            if end <= self.capacity:
+                data = bytes(self._buffer[self._head:end])
+            else:
+                data = bytes(self._buffer[self._head:]) + bytes(self._buffer[:end - self.capacity])
+            self._head = end % self.capacity
+            self._size -= n
+            start = self.last_read_start = self._read_pos
+            self._read_pos += n
+            stamps = []
+            for position, timestamp_ns in self._marks:
+                if position >= self._read_pos:
+                    break
+                stamps.append((max(position - start, 0), timestamp_ns))
+            self._trim_marks(self._read_pos)
+            return data, stamps
+            
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._size = 0
+            self.dropped = 0
+            self._read_pos = 0
+            self._write_pos = 0
+            self.last_read_start = 0
+            self._marks.clear()
+
+
+class SerialReader(threading.Thread):
+    """串口数据接收线程
+
+    使用带超时的阻塞读取代替轮询: 串口空闲时线程阻塞在 read() 中(POSIX 下即
+    对串口描述符的 select), 数据到达后立即唤醒。唤醒策略:
+      - WAKE_IMMEDIATE: 收到第一个字节立即唤醒, 读出缓冲区中已有的全部数据
+      - WAKE_BATCH: 收到第一个字节后再等待 batch_delay_ms, 合并成一批再读出,
+        用于高波特率下减少唤醒次数
+    idle_timeout 为空闲时的最长阻塞时间, 仅用于检查停止标志; stop() 会通过
+    cancel_read() 立即唤醒线程, 不必等待超时。
+    
+    每批数据连同采集时间戳(perf_counter_ns, 在 read() 返回第一个字节时记录)
+    依次交给 recorder (CaptureWriter) 录制、写入 ring_buffer, 并调用 listeners
+    中的每个回调 callback(data, timestamp_ns)。回调在本线程中执行, 应尽快返回。
+    读取出错时调用 on_error(消息), 关闭串口后调用 on_closed()。
+    """
+    WAKE_IMMEDIATE = 'immediate'
+    WAKE_BATCH = 'batch'
+
+    def __init__(self, serial_port, wake_policy=WAKE_IMMEDIATE, idle_timeout=0.5, batch_delay_ms=2,
+                 ring_buffer=None, on_data=None, on_error=None, on_closed=None):
+        super().__init__(daemon=True)
+        self.serial_port = serial_port
+        self.ring_buffer = ring_buffer
+        self.recorder = None
+        self.listeners = [on_data] if on_data else []
+        self.on_error = on_error
+        self.on_closed = on_closed
+        self.wake_policy = wake_policy
+        self.idle_timeout = idle_timeout
+        self.batch_delay_ms = batch_delay_ms
+        self.running = False
+        
+    def start(self):
+        self.running = True
+        super().start()
+        
+    def run(self):
+        # 空闲时阻塞等待数据, 超时仅用于检查停止标志
+        if self.serial_port.timeout != self.idle_timeout:
+            self.serial_port.timeout = self.idle_timeout
+        while self.running and self.serial_port.is_open:
+            try:
+                data = self.serial_port.read(1)
+                if not data:
+                    continue
+                timestamp_ns = time.perf_counter_ns()
+                if self.wake_policy == self.WAKE_BATCH and self.batch_delay_ms > 0:
+                    time.sleep(self.batch_delay_ms / 1000)
+                waiting = self.serial_port.in_waiting
+                if waiting:
+                    data += self.serial_port.read(waiting)
+                self._deliver(data, timestamp_ns)
+            except Exception as e:
+                if self.running:
+                    self._fail(e)
+                break
+                
+    def _deliver(self, data, timestamp_ns):
+        """把一批数据交给录制、环形缓冲区和接收回调"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_rx(data, timestamp_ns)
+        if self.ring_buffer is not None:
+            self.ring_buffer.write(data, timestamp_ns)
+        for callback in self.listeners:
+            callback(data, timestamp_ns)
+            
+    def _fail(self, error):
+        """读取出错: 报告错误并关闭串口"""
+        self.running = False
+        if self.on_error:
+            self.on_error(str(error))
+        if self.serial_port.is_open:
+            self.serial_port.close()
+        if self.on_closed:
+            self.on_closed()
+        
+    def stop(self):
+        self.running = False
+        # 立即唤醒阻塞中的 read()
+        if hasattr(self.serial_port, 'cancel_read') and self.serial_port.is_open:
+            try:
+                self.serial_port.cancel_read()
+            except Exception:
+                pass
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+class IoLoop(threading.Thread):
+    """多个串口共用的接收线程
+
+    用 selectors (Linux 上为 epoll) 同时等待所有已注册串口的描述符, 任一串口
+    可读时读出其缓冲区中的全部数据, 空闲时不占用 CPU, 线程数不随串口数增加。
+    注册和注销通过唤醒管道交给本线程执行, 调用方等待执行完成后返回。
+    
+    只支持有文件描述符的串口(POSIX 串口设备和 pty); 其他串口(Windows 串口、
+    loop:// 等 URL)由 SerialEngine 退回到独立的 SerialReader 线程。
+    """
+    def __init__(self):
+        super().__init__(daemon=True, name="IoLoop")
+        self._selector = selectors.DefaultSelector()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._commands = []
+        self.running = False
+        
+    @staticmethod
+    def supports(serial_port):
+        """串口是否可以由 IoLoop 服务"""
+        if sys.platform == 'win32':
+            return False
+        try:
+            return serial_port.fileno() >= 0
+        except (AttributeError, OSError, ValueError):
+            return False
+            
+    @property
+    def port_count(self):
+        return len(self._selector.get_map()) - 1
+        
+    def start(self):
+        self.running = True
+        super().start()
+        
+    def _call(self, action, reader):
+        """在本线程中执行注册或注销, 从其他线程调用时等待完成"""
+        if threading.current_thread() is self:
+            action(reader)
+            return
+        done = threading.Event()
+        with self._lock:
+            self._commands.append((action, reader, done))
+        os.write(self._wake_write, b'\0')
+        while self.is_alive() and not done.wait(0.5):
+            pass
+            
+    def add(self, reader):
+        self._call(self._register, reader)
+        
+    def remove(self, reader):
+        self._call(self._unregister, reader)
+        
+    def _register(self, reader):
+        self._selector.register(reader.serial_port.fileno(), selectors.EVENT_READ, reader)
+        
+    def _unregister(self, reader):
+        try:
+            self._selector.unregister(reader.fd)
+        except (KeyError, ValueError):
+            pass
+            
+    def run(self):
+        while self.running:
+            for key, _ in self._selector.select():
+                reader = key.data
+                if reader is None:
+                    self._run_commands()
+                elif reader.running:
+                    reader.service()
+        self._run_commands()
+        self._selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+        
+    def _run_commands(self):
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            commands, self._commands = self._commands, []
+        for action, reader, done in commands:
+            try:
+                action(reader)
+            finally:
+                done.set()
+                
+    def stop(self):
+        with self._lock:
+            self.running = False
+        os.write(self._wake_write, b'\0')
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+class SelectorReader(SerialReader):
+    """由 IoLoop 服务的串口接收器
+
+    与 SerialReader 的录制、环形缓冲区、回调和错误处理完全相同, 但不启动自己
+    的线程: start() 把串口注册到共用的 IoLoop, 可读时在 IoLoop 线程中调用
+    service() 读出数据。不支持 WAKE_BATCH, 批量等待会阻塞其他串口。
+    """
+    def __init__(self, io_loop, serial_port, ring_buffer=None, on_data=None, on_error=None, on_closed=None):
+        super().__init__(serial_port, ring_buffer=ring_buffer, on_data=on_data, on_error=on_error,
+                         on_closed=on_closed)
+        self.io_loop = io_loop
+        self.fd = serial_port.fileno()
+        self._registered = False
+        
+    def start(self):
+        self.serial_port.timeout = 0
+        self.running = True
+        self._registered = True
+        self.io_loop.add(self)
+        
+    def is_alive(self):
+        return self._registered
+        
+    def service(self):
+        """串口可读: 读出已到达的全部数据, 在 IoLoop 线程中调用"""
+        try:
+            timestamp_ns = time.perf_counter_ns()
+            data = self.serial_port.read(max(self.serial_port.in_waiting, 1))
+            if data:
+                self._deliver(data, timestamp_ns)
+        except Exception as e:
+            if self.running:
+                # 先注销再关闭串口, 描述符关闭后无法从 epoll 中移除
+                self.io_loop.remove(self)
+                self._registered = False
+                self._fail(e)
+                
+    def stop(self):
+        self.running = False
+        if self._registered:
+            self._registered = False
+            self.io_loop.remove(self)
+
+
+class TxQueueFull(Exception):
+    """发送队列已满"""
+
+
+class TxRequest:
+    """一次发送请求, 写出完成或失败后 done 被置位"""
+    def __init__(self, data, background=False):
+        self.data = data
+        # 由后台任务(周期发送、序列、文件发送)提交的请求
+        self.background = background
+        self.written = 0
+        self.error = None
+        # 第一段数据开始写出的 perf_counter_ns
+        self.start_ns = 0
+        self.done = threading.Event()
+        
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class SerialWriter(threading.Thread):
+    """串口发送线程
+
+    所有写操作都在本线程中执行。submit() 把数据放入有界队列后立即返回, 队列
+    中的请求数或字节数超过上限时抛出 TxQueueFull, 不会阻塞调用方。对端通过
+    RTS/CTS 或 XON/XOFF 暂停接收时只有本线程阻塞在 write() 中; stop() 通过
+    cancel_write() 将其唤醒。
+    
+    数据按 chunk_size 分段写出, 每段写出前录制为 TX 记录并统计速率。请求完成
+    后调用 on_sent(request), 写入失败时调用 on_error(消息), 均在本线程中执行。
+    """
+    def __init__(self, serial_port, max_requests=256, max_bytes=1024 * 1024, chunk_size=4096,
+                 on_sent=None, on_error=None):
+        super().__init__(daemon=True)
+        self.serial_port = serial_port
+        self.recorder = None
+        # TrafficStats, 由引擎设置
+        self.stats = None
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.bytes_written = 0
+        self.pending_bytes = 0
+        self.last_write_ns = 0
+        self.running = False
+        self._queue = deque()
+        self._ready = threading.Condition()
+        # 最近一秒内各段写出完成的 (perf_counter_ns, 字节数), 用于计算速率
+        self._samples = deque()
+        
+    def start(self):
+        self.running = True
+        super().start()
+        
+    @property
+    def depth(self):
+        """队列中等待写出的请求数(含正在写出的请求)"""
+        return len(self._queue)
+        
+    @property
+    def rate(self):
+        """最近一秒的发送速率, 字节/秒"""
+        horizon = time.perf_counter_ns() - 1_000_000_000
+        with self._ready:
+            while self._samples and self._samples[0][0] < horizon:
+                self._samples.popleft()
+            return sum(n for _, n in self._samples)
+        
+    def submit(self, data, background=False):
+        """把数据加入发送队列, 返回 TxRequest; 队列已满时抛出 TxQueueFull"""
+        request = TxRequest(bytes(data), background)
+        with self._ready:
+            if not self.running:
+                raise TxQueueFull("发送线程已停止")
+            # 单个请求超过字节上限时只要队列为空仍然接受
+            if len(self._queue) >= self.max_requests or (
+                    self._queue and self.pending_bytes + len(request.data) > self.max_bytes):
+                if self.stats is not None:
+                    self.stats.tx_rejected += 1
+                raise TxQueueFull(f"发送队列已满 ({len(self._queue)} 个请求, {self.pending_bytes} 字节)")
+            self._queue.append(request)
+            self.pending_bytes += len(request.data)
+            self._ready.notify()
+        return request
+        
+    def run(self):
+        while True:
+            with self._ready:
+                while self.running and not self._queue:
+                    self._ready.wait()
+                if not self.running:
+                    break
+                request = self._queue[0]
+            self._write(request)
+            with self._ready:
+                if self._queue and self._queue[0] is request:
+                    self._queue.popleft()
+                    self.pending_bytes -= len(request.data)
+            request.done.set()
+            if self.stats is not None:
+                if request.error is None:
+                    self.stats.tx_requests += 1
+                elif self.running:
+                    self.stats.tx_errors += 1
+            if request.error is None and self.on_sent:
+                self.on_sent(request)
+        self._cancel_pending("发送线程已停止")
+        
+    def _write(self, request):
+        data = request.data
+        try:
+            for start in range(0, len(data), self.chunk_size):
+                if not self.running:
+                    request.error = "发送已取消"
+                    return
+                chunk = data[start:start + self.chunk_size]
+                timestamp_ns = time.perf_counter_ns()
+                self.last_write_ns = timestamp_ns
+                if not request.start_ns:
+                    request.start_ns = timestamp_ns
+                recorder = self.recorder
+                if recorder is not None:
+                    recorder.record_tx(chunk, timestamp_ns)
+                written = self.serial_port.write(chunk) or 0
+                request.written += written
+                self.bytes_written += written
+                stats = self.stats
+                if stats is not None:
+                    stats.tx_bytes += written
+                with self._ready:
+                    self._samples.append((time.perf_counter_ns(), written))
+        except Exception as e:
+            request.error = str(e) if self.running else "发送已取消"
+            if self.running and self.on_error:
+                self.on_error(request.error)
+                
+    def _cancel_pending(self, reason):
+        with self._ready:
+            pending = list(self._queue)
+            self._queue.clear()
+            self.pending_bytes = 0
+        for request in pending:
+            if request.error is None and not request.done.is_set():
+                request.error = reason
+            request.done.set()
+        
+    def stop(self):
+        with self._ready:
+            self.running = False
+            self._ready.notify_all()
+        # 唤醒因流控阻塞的 write()
+        if hasattr(self.serial_port, 'cancel_write') and self.serial_port.is_open:
+            try:
+                self.serial_port.cancel_write()
+            except Exception:
+                pass
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+def sleep_until(deadline_ns, stopped, spin_ns=200_000):
+    """睡眠到 perf_counter_ns() 时刻 deadline_ns, stopped 被置位时提前返回 False
+
+    先用 Event.wait() 睡到截止时间前 spin_ns, 再忙等剩余的时间。
+    """
+    remaining = deadline_ns - time.perf_counter_ns()
+    if remaining > spin_ns and stopped.wait((remaining - spin_ns) / 1e9):
+        return False
+    while time.perf_counter_ns() < deadline_ns:
+        pass
+    return not stopped.is_set()
+
+
+class PeriodicSender(threading.Thread):
+    """按绝对截止时间周期发送的调度线程
+
+    第 k 次发送的截止时间为 start + k * interval, 单次唤醒的延迟不会累积成
+    漂移。先用 Event.wait() 睡到截止时间前 spin_s 秒, 再忙等到截止时间, 因此
+    支持 10ms 以下的间隔; 忙等时间不超过间隔的 1/4, 间隔很短时 CPU 占用也
+    有上限。落后超过一个周期(发送队列已满或系统繁忙)时跳过错过的周期并计入
+    skipped, 不会补发成串的数据。
+    
+    负载为编码好的 bytes, 由调用方在内容变化时通过 set_payload() 替换, 每个
+    周期只调用一次 submit(payload)。submit 抛出 TxQueueFull 时计入 rejected。
+    """
+    def __init__(self, submit, payload, interval_s, spin_s=0.0002, jitter_window=4096, on_error=None):
+        super().__init__(daemon=True)
+        self.submit = submit
+        self.payload = bytes(payload)
+        self.interval_s = interval_s
+        self.spin_s = spin_s
+        self.on_error = on_error
+        self.fired = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.start_ns = 0
+        # 最近各次发送相对截止时间的延迟(纳秒)
+        self.lateness = deque(maxlen=jitter_window)
+        self._stopped = threading.Event()
+        
+    def set_payload(self, payload):
+        self.payload = bytes(payload)
+        
+    def run(self):
+        interval_ns = max(1, int(self.interval_s * 1e9))
+        # 间隔小于 spin_s 时整个周期都会忙等, 占满一个核心
+        spin_ns = min(int(self.spin_s * 1e9), interval_ns // 4)
+        start = self.start_ns = time.perf_counter_ns()
+        tick = 0
+        while not self._stopped.is_set():
+            deadline = start + tick * interval_ns
+            if not sleep_until(deadline, self._stopped, spin_ns):
+                break
+            self.lateness.append(time.perf_counter_ns() - deadline)
+            payload = self.payload
+            if payload:
+                try:
+                    self.submit(payload)
+                    self.fired += 1
+                except TxQueueFull:
+                    self.rejected += 1
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(str(e))
+                    break
+            tick += 1
+            # 跳过已经错过的周期
+            due = (time.perf_counter_ns() - start) // interval_ns + 1
+            if due > tick:
+                self.skipped += due - tick
+                tick = due
+                
+    def stats(self):
+        """返回调度统计: 目标/实际频率(Hz), 延迟均值/p99/最大值(微秒), 跳过和被拒绝的次数"""
+        elapsed = (time.perf_counter_ns() - self.start_ns) / 1e9 if self.start_ns else 0
+        lateness = sorted(self.lateness)
+        n = len(lateness)
+        return {
+            'target_hz': 1 / self.interval_s if self.interval_s > 0 else 0,
+            'achieved_hz': self.fired / elapsed if elapsed > 0 else 0,
+            'mean_us': sum(lateness) / n / 1000 if n else 0,
+            'p99_us': lateness[min(n - 1, int(n * 0.99))] / 1000 if n else 0,
+            'max_us': lateness[-1] / 1000 if n else 0,
+            'skipped': self.skipped,
+            'rejected': self.rejected,
+        }
+        
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+# 十六进制文件中需要忽略的字符
+_NON_HEX_BYTES = re.compile(rb'[^0-9A-Fa-f]')
+
+
+class FileSender(threading.Thread):
+    """从磁盘流式发送文件的线程
+
+    文件按 chunk_size 分块读取并提交到发送队列, 队列中最多保留 window 块,
+    之前的块写出完成后才读取下一块, 内存占用与文件大小无关; 对端流控暂停时
+    发送线程阻塞, 本线程随之等待。hex_mode 为真时文件按十六进制文本解析,
+    忽略所有非十六进制字符, 跨块的半个字节保留到下一块。rate 限制每秒发送的
+    字节数, 0 表示不限速。
+    
+    progress() 返回已发送字节数、已读取的文件比例、平均速率和预计剩余时间。
+    """
+    READ_SIZE = 64 * 1024
+    
+    def __init__(self, submit, path, hex_mode=False, chunk_size=4096, window=4, rate=0):
+        super().__init__(daemon=True)
+        self.submit = submit
+        self.path = path
+        self.hex_mode = hex_mode
+        self.chunk_size = chunk_size
+        self.window = window
+        self.rate = rate
+        self.file_size = os.path.getsize(path)
+        self.file_position = 0
+        self.bytes_queued = 0
+        self.bytes_sent = 0
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self.cancelled = False
+        self._stopped = threading.Event()
+        
+    def _chunks(self, source):
+        """逐块返回要发送的字节"""
+        if not self.hex_mode:
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    return
+                self.file_position += len(chunk)
+                yield chunk
+        carry = b''
+        pending = bytearray()
+        while True:
+            text = source.read(self.READ_SIZE)
+            if text:
+                self.file_position += len(text)
+                digits = carry + _NON_HEX_BYTES.sub(b'', text)
+                carry = digits[len(digits) // 2 * 2:]
+                pending += bytes.fromhex(digits[:len(digits) // 2 * 2].decode('ascii'))
+            elif carry:
+                # 与发送框一致: 奇数个十六进制字符时末尾补 0
+                pending += bytes.fromhex((carry + b'0').decode('ascii'))
+                carry = b''
+            while len(pending) >= self.chunk_size or (not text and pending):
+                yield bytes(pending[:self.chunk_size])
+                del pending[:self.chunk_size]
+            if not text:
+                return
+                
+    def run(self):
+        self.start_ns = time.perf_counter_ns()
+        in_flight = deque()
+        try:
+            with open(self.path, 'rb') as source:
+                for chunk in self._chunks(source):
+                    if self.rate:
+                        # 按累计字节数计算本块的最早发送时间
+                        deadline = self.start_ns + int(self.bytes_queued / self.rate * 1e9)
+                        if not sleep_until(deadline, self._stopped):
+                            break
+                    while len(in_flight) >= self.window:
+                        if not self._wait_request(in_flight.popleft()):
+                            break
+                    request = self._submit(chunk) if not self._stopped.is_set() else None
+                    if request is None:
+                        break
+                    in_flight.append(request)
+                while in_flight and not self._stopped.is_set():
+                    self._wait_request(in_flight.popleft())
+        except Exception as e:
+            self.error = str(e)
+        self.cancelled = self._stopped.is_set() and self.error is None
+        self.end_ns = time.perf_counter_ns()
+        
+    def _submit(self, chunk):
+        """提交一块, 队列已满时稍后重试; 被取消时返回 None"""
+        while True:
+            try:
+                request = self.submit(chunk)
+                self.bytes_queued += len(chunk)
+                return request
+            except TxQueueFull:
+                if self._stopped.wait(0.005):
+                    return None
+                    
+    def _wait_request(self, request):
+        """等待一块写出完成, 写入失败时抛出异常"""
+        while not request.wait(0.1):
+            if self._stopped.is_set():
+                return False
+        if request.error:
+            raise serial.SerialException(request.error)
+        self.bytes_sent += request.written
+        return True
+        
+    @property
+    def finished(self):
+        return self.end_ns != 0
+        
+    def progress(self):
+        """返回 (已发送字节数, 进度 0~1, 平均速率 字节/秒, 预计剩余秒数)"""
+        end = self.end_ns or time.perf_counter_ns()
+        elapsed = (end - self.start_ns) / 1e9 if self.start_ns else 0
+        fraction = self.file_position / self.file_size if self.file_size else 1.0
+        rate = self.bytes_sent / elapsed if elapsed > 0 else 0
+        remaining = elapsed * (1 - fraction) / fraction if fraction > 0 and not self.end_ns else 0
+        return self.bytes_sent, fraction, rate, remaining
+        
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+# 流控选项: 代号 -> (xonxoff, rtscts)
+FLOW_CONTROL = {
+    'N': (False, False),
+    'R': (False, True),
+    'X': (True, False),
+    'B': (True, True),
+}
+
+
+def open_port(port, baudrate=115200, bytesize=8, parity='N', stopbits=1, flow_control='N', timeout=0.5):
+    """打开串口, port 可以是设备名或 pyserial 的 URL (如 loop://)"""
+    xonxoff, rtscts = FLOW_CONTROL[flow_control]
+    return serial.serial_for_url(
+        port,
+        baudrate=baudrate,
+        bytesize=bytesize,
+        parity=parity,
+        stopbits=stopbits,
+        timeout=timeout,
+        xonxoff=xonxoff,
+        rtscts=rtscts,
+    )
+
+
+class ByteChannel:
+    """从串口引擎接收数据的字节流通道
+
+    在接收线程中收集数据, read() 按需取出; write() 经发送线程写出。接收
+    显示和录制不受影响。用完后调用 close() 移除接收回调。
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self._buffer = bytearray()
+        self._ready = threading.Condition()
+        engine.add_listener(self._on_data)
+        
+    def _on_data(self, data, timestamp_ns):
+        with self._ready:
+            self._buffer += data
+            self._ready.notify_all()
+            
+    def read(self, size, timeout):
+        """读取最多 size 字节, 至少等到 1 字节或超时, 超时返回 b''"""
+        deadline = time.monotonic() + timeout
+        with self._ready:
+            while not self._buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.engine.is_open:
+                    return b''
+                self._ready.wait(min(remaining, 0.5))
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+            
+    def write(self, data):
+        self.engine.send(data, background=True)
+        
+    def purge(self):
+        """丢弃已收到但未读取的数据"""
+        with self._ready:
+            self._buffer.clear()
+            
+    def close(self):
+        self.engine.remove_listener(self._on_data)
+
+
+def bits_per_char(bytesize=8, parity='N', stopbits=1):
+    """一个字符在线路上占用的位数: 起始位 + 数据位 + 校验位 + 停止位"""
+    return 1 + bytesize + (0 if parity == 'N' else 1) + stopbits
+
+
+class TrafficStats:
+    """收发统计
+
+    计数器在 I/O 线程中累加(接收线程累加 rx_*、frames, 发送线程累加 tx_*),
+    界面或命令行定时调用 sample() 取样: 瞬时速率为与上一次取样之间的差值,
+    平均速率为最近 average_window 秒内的差值, 峰值取瞬时速率的最大值。线路
+    利用率为速率占波特率可传输的字节/秒的比例。最近 history 次取样保留在
+    samples 中, 可用 write_csv() 导出。
+    """
+    COUNTERS = ('rx_bytes', 'rx_chunks', 'frames', 'tx_bytes', 'tx_requests',
+                'rx_errors', 'tx_errors', 'tx_rejected', 'rx_dropped')
+    RATES = ('rx_bytes', 'tx_bytes', 'frames')
+
+    def __init__(self, history=3600, average_window=10.0):
+        self.average_window = average_window
+        self.samples = deque(maxlen=history)
+        self.reset()
+
+    def reset(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.samples.clear()
+        self.peaks = dict.fromkeys(self.RATES, 0.0)
+        self.started = time.monotonic()
+
+    def snapshot(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def sample(self, baudrate=0, char_bits=10, now=None):
+        """取样并返回统计
+
+        返回的字典包含各计数器的累计值, 以及 rx_bytes/tx_bytes/frames 的
+        <名称>_rate (瞬时, 每秒)、<名称>_avg (平均, 每秒)、<名称>_peak, 和
+        rx_utilisation / tx_utilisation (0-1, 未知波特率时为 None)。
+        """
+        now = time.monotonic() if now is None else now
+        current = self.snapshot()
+        previous = self.samples[-1] if self.samples else (self.started, dict.fromkeys(self.COUNTERS, 0))
+        # 平均窗口起点: 窗口内最早的一次取样
+        window_start = previous
+        for sample in reversed(self.samples):
+            if now - sample[0] > self.average_window:
+                break
+            window_start = sample
+        self.samples.append((now, current))
+        result = dict(current)
+        for name in self.RATES:
+            elapsed = now - previous[0]
+            rate = (current[name] - previous[1][name]) / elapsed if elapsed > 0 else 0.0
+            window = now - window_start[0]
+            average = (current[name] - window_start[1][name]) / window if window > 0 else 0.0
+            self.peaks[name] = max(self.peaks[name], rate)
+            result[f'{name}_rate'] = rate
+            result[f'{name}_avg'] = average
+            result[f'{name}_peak'] = self.peaks[name]
+        capacity = baudrate / char_bits if baudrate else 0
+        result['rx_utilisation'] = result['rx_bytes_rate'] / capacity if capacity else None
+        result['tx_utilisation'] = result['tx_bytes_rate'] / capacity if capacity else None
+        result['elapsed'] = now - self.started
+        return result
+
+    def write_csv(self, path):
+        """导出每次取样的累计值和瞬时速率"""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time', 'elapsed_s'] + list(self.COUNTERS) + [f'{name}_per_s' for name in self.RATES])
+            previous = (self.started, dict.fromkeys(self.COUNTERS, 0))
+            for timestamp, counters in list(self.samples):
+                rates = []
+                for name in self.RATES:
+                    if timestamp <= previous[0]:
+                        rates.append('')
+                    else:
+                        rates.append(f"{(counters[name] - previous[1][name]) / (timestamp - previous[0]):.1f}")
+                wall = datetime.fromtimestamp(time.time() - (time.monotonic() - timestamp))
+                writer.writerow([wall.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3], f"{timestamp - self.started:.3f}"]
+                                + [counters[name] for name in self.COUNTERS] + rates)
+                previous = (timestamp, counters)
+
+
+def format_traffic(stats):
+    """把 TrafficStats.sample() 的结果格式化为多行文本"""
+    def utilisation(value):
+        return f"{value * 100:.1f}%" if value is not None else "-"
+
+    return '\n'.join([
+        f"接收: {stats['rx_bytes']} 字节  {stats['rx_bytes_rate']:.0f} B/s (平均 {stats['rx_bytes_avg']:.0f}, "
+        f"峰值 {stats['rx_bytes_peak']:.0f})  线路利用率 {utilisation(stats['rx_utilisation'])}",
+        f"发送: {stats['tx_bytes']} 字节  {stats['tx_bytes_rate']:.0f} B/s (平均 {stats['tx_bytes_avg']:.0f}, "
+        f"峰值 {stats['tx_bytes_peak']:.0f})  线路利用率 {utilisation(stats['tx_utilisation'])}",
+        f"帧: {stats['frames']}  {stats['frames_rate']:.1f} 帧/秒 (平均 {stats['frames_avg']:.1f}, "
+        f"峰值 {stats['frames_peak']:.1f})",
+        f"错误: 接收 {stats['rx_errors']}  发送 {stats['tx_errors']}  发送队列满 {stats['tx_rejected']}  "
+        f"接收缓冲区丢弃 {stats['rx_dropped']} 字节",
+    ])
+
+
+class SerialEngine:
+    """串口会话: 打开的串口、接收线程、发送线程和录制
+
+    图形界面和命令行共用这一实现。on_error / on_closed 在接收线程中调用,
+    on_sent(request) / on_send_error(消息) 在发送线程中调用, 图形界面需自行
+    转发到界面线程。submit() 只把数据放入发送队列, send() 等待写出完成。
+    后台任务(周期发送、序列、文件发送)提交的请求不逐个回调 on_sent, 写出的
+    字节累计到 background_bytes。
+    
+    enable_expect() 之后接收数据同时保存到应答缓冲区(最多 expect_limit 字节),
+    expect() 在其中等待匹配正则的应答, 用于脚本化的请求/应答交互。
+    """
+    def __init__(self, ring_buffer=None, on_error=None, on_closed=None, on_sent=None, on_send_error=None,
+                 io_loop=None):
+        self.port = None
+        # 多个会话共用的 IoLoop; 为 None 或串口不支持时每个串口使用独立的接收线程
+        self.io_loop = io_loop
+        self.reader = None
+        self.writer = None
+        self.recorder = None
+        self.ring_buffer = ring_buffer
+        self.on_error = on_error
+        self.on_closed = on_closed
+        self.on_sent = on_sent
+        self.on_send_error = on_send_error
+        self.rx_bytes = 0
+        # 收发统计, 跨多次打开累计, 由使用者 reset_stats()
+        self.stats = TrafficStats()
+        self._dropped_base = 0
+        self.periodic = None
+        self.file_sender = None
+        self.background_bytes = 0
+        self.expect_limit = 0
+        self._responses = bytearray()
+        self._response_ready = threading.Condition()
+        
+    @property
+    def is_open(self):
+        return self.port is not None and self.port.is_open
+        
+    @property
+    def tx_bytes(self):
+        return self.writer.bytes_written if self.writer else 0
+        
+    @property
+    def last_send_ns(self):
+        """最近一次开始写出的 perf_counter_ns 时间"""
+        return self.writer.last_write_ns if self.writer else 0
+        
+    def open(self, port, baudrate=115200, bytesize=8, parity='N', stopbits=1, flow_control='N',
+             wake_policy=SerialReader.WAKE_IMMEDIATE, batch_delay_ms=2, idle_timeout=0.5):
+        """打开串口并启动接收线程, 失败时抛出 serial.SerialException"""
+        self.close()
+        self.port = open_port(port, baudrate, bytesize, parity, stopbits, flow_control, idle_timeout)
+        self.rx_bytes = 0
+        self.writer = SerialWriter(self.port, on_sent=self._on_sent, on_error=self.on_send_error)
+        self.writer.recorder = self.recorder
+        self.writer.stats = self.stats
+        self.writer.start()
+        batch = wake_policy == SerialReader.WAKE_BATCH and batch_delay_ms > 0
+        if self.io_loop is not None and not batch and IoLoop.supports(self.port):
+            self.reader = SelectorReader(
+                self.io_loop,
+                self.port,
+                ring_buffer=self.ring_buffer,
+                on_data=self._on_data,
+                on_error=self._on_rx_error,
+                on_closed=self.on_closed,
+            )
+        else:
+            self.reader = SerialReader(
+                self.port,
+                wake_policy=wake_policy,
+                idle_timeout=idle_timeout,
+                batch_delay_ms=batch_delay_ms,
+                ring_buffer=self.ring_buffer,
+                on_data=self._on_data,
+                on_error=self._on_rx_error,
+                on_closed=self.on_closed,
+            )
+        self.reader.recorder = self.recorder
+        self.reader.start()
+        return self.port
+        
+    def close(self):
+        self.stop_periodic()
+        self.stop_file_send()
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        if self.port and self.port.is_open:
+            self.port.close()
+        self.port = None
+        
+    def add_listener(self, callback):
+        """添加接收回调 callback(data, timestamp_ns), 在接收线程中调用
+
+        帧统计不会自动挂接: 计入 stats.frames 的分帧回调在创建时传入
+        stats=engine.stats, 曲线和 Modbus 监视等其他分帧回调不计数。
+        """
+        if self.reader:
+            # 替换而不是原地修改列表, 接收线程正在遍历的旧列表不受影响
+            self.reader.listeners = self.reader.listeners + [callback]
+            
+    def remove_listener(self, callback):
+        if self.reader:
+            self.reader.listeners = [listener for listener in self.reader.listeners if listener != callback]
+            
+    def open_channel(self):
+        """返回读取接收数据的 ByteChannel, 用于文件传输协议"""
+        if not self.is_open:
+            raise serial.SerialException("串口未打开")
+        return ByteChannel(self)
+            
+    def _on_data(self, data, timestamp_ns):
+        self.rx_bytes += len(data)
+        stats = self.stats
+        stats.rx_bytes += len(data)
+        stats.rx_chunks += 1
+        if self.expect_limit:
+            with self._response_ready:
+                self._responses += data
+                if len(self._responses) > self.expect_limit:
+                    del self._responses[:len(self._responses) - self.expect_limit]
+                self._response_ready.notify_all()
+                
+    def _on_rx_error(self, message):
+        self.stats.rx_errors += 1
+        if self.on_error:
+            self.on_error(message)
+            
+    def reset_stats(self):
+        self.stats.reset()
+        self._dropped_base = self.ring_buffer.dropped if self.ring_buffer is not None else 0
+        
+    def sample_stats(self):
+        """对 stats 取样, 按当前串口的波特率和字符格式计算线路利用率"""
+        if self.ring_buffer is not None:
+            self.stats.rx_dropped = max(0, self.ring_buffer.dropped - self._dropped_base)
+        port = self.port
+        if port is None:
+            return self.stats.sample()
+        return self.stats.sample(port.baudrate, bits_per_char(port.bytesize, port.parity, port.stopbits))
+        
+    def submit(self, data, background=False):
+        """把数据加入发送队列后立即返回 TxRequest, 队列已满时抛出 TxQueueFull"""
+        if not self.is_open:
+            raise serial.SerialException("串口未打开")
+        return self.writer.submit(data, background)
+        
+    def _on_sent(self, request):
+        if request.background:
+            self.background_bytes += request.written
+        elif self.on_sent:
+            self.on_sent(request)
+            
+    def start_periodic(self, payload, interval_s):
+        """每 interval_s 秒发送一次 payload, 返回 PeriodicSender"""
+        if not self.is_open:
+            raise serial.SerialException("串口未打开")
+        self.stop_periodic()
+        writer = self.writer
+        self.periodic = PeriodicSender(
+            lambda data: writer.submit(data, background=True), payload, interval_s, on_error=self.on_send_error
+        )
+        self.periodic.start()
+        return self.periodic
+        
+    def stop_periodic(self):
+        if self.periodic:
+            self.periodic.stop()
+            self.periodic = None
+            
+    def start_file_send(self, path, hex_mode=False, rate=0):
+        """开始流式发送文件, 返回 FileSender
+
+        每块约为 50ms 的线路时间, 不超过 4096 字节(常见的串口驱动发送缓冲区),
+        取消后最多还有几块留在发送队列中。
+        """
+        if not self.is_open:
+            raise serial.SerialException("串口未打开")
+        self.stop_file_send()
+        chunk_size = max(64, min(4096, self.port.baudrate // 10 // 20))
+        writer = self.writer
+        self.file_sender = FileSender(
+            lambda data: writer.submit(data, background=True), path, hex_mode, chunk_size=chunk_size, rate=rate
+        )
+        self.file_sender.start()
+        return self.file_sender
+        
+    def stop_file_send(self):
+        if self.file_sender:
+            self.file_sender.stop()
+            self.file_sender = None
+            
+    def send(self, data, timeout=None, background=False):
+        """发送数据并等待写出完成, 返回写入的字节数"""
+        request = self.submit(data, background)
+        if not request.wait(timeout):
+            raise serial.SerialTimeoutException("发送超时")
+        if request.error:
+            raise serial.SerialException(request.error)
+        return request.written
+        
+    def start_recording(self, path):
+        """开始录制到捕获文件, 返回 CaptureWriter"""
+        self.stop_recording()
+        self.recorder = CaptureWriter(path)
+        for worker in (self.reader, self.writer):
+            if worker:
+                worker.recorder = self.recorder
+        return self.recorder
+        
+    def stop_recording(self):
+        """停止录制, 返回已关闭的 CaptureWriter (未在录制时返回 None)"""
+        recorder = self.recorder
+        if recorder is None:
+            return None
+        for worker in (self.reader, self.writer):
+            if worker:
+                worker.recorder = None
+        self.recorder = None
+        recorder.close()
+        return recorder
+        
+    def enable_expect(self, limit=1024 * 1024):
+        self.expect_limit = limit
+        
+    def discard_responses(self):
+        """清空应答缓冲区"""
+        with self._response_ready:
+            self._responses.clear()
+            
+    def expect(self, pattern, timeout=1.0):
+        """等待应答缓冲区中出现匹配 pattern (bytes 正则) 的数据
+
+        返回 match 对象并丢弃匹配结束之前的数据, 超时返回 None。
+        """
+        compiled = re.compile(pattern)
+        deadline = time.monotonic() + timeout
+        with self._response_ready:
+            while True:
+                # 在副本上匹配, 删除已匹配数据后 match 对象仍然有效
+                match = compiled.search(bytes(self._responses))
+                if match:
+                    del self._responses[:match.end()]
+                    return match
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._response_ready.wait(remaining)
+                
+    def transact(self, data, pattern, timeout=1.0):
+        """发送请求并等待匹配的应答, 返回 match 对象或 None"""
+        self.discard_responses()
+        self.send(data)
+        return self.expect(pattern, timeout)
+
+
+def unescape(text):
+    """把 \\r \\n \\t \\xNN 等转义序列转换为字节, 其余字符按 UTF-8 编码"""
+    return codecs.escape_decode(text.encode('utf-8'))[0]
+
+
+class ScriptError(Exception):
+    """脚本语法错误"""
+
+
+class SequenceStep:
+    """序列中的一步: send 发送 count 次, wait 延后下一步的计划时间, expect 等待应答"""
+    __slots__ = ('kind', 'line_no', 'text', 'data', 'frame', 'count', 'wait_ns', 'pattern', 'timeout_ms',
+                 'checksummed')
+
+    def __init__(self, kind, line_no, text, data=None, frame=None, count=1, wait_ns=0,
+                 pattern=None, timeout_ms=1000):
+        self.kind = kind
+        self.line_no = line_no
+        self.text = text
+        self.data = data
+        self.frame = frame
+        self.count = count
+        self.wait_ns = wait_ns
+        self.pattern = pattern
+        self.timeout_ms = timeout_ms
+        # checksum.key -> 追加了校验值的 data, 数据帧步骤使用 Frame 自己的缓存
+        self.checksummed = {}
+
+    @property
+    def payload(self):
+        # 数据帧在运行中被编辑时使用最新的编码
+        return self.frame.data if self.frame is not None else self.data
+
+    def encode(self, checksum=None):
+        """发送的字节, checksum 不为 None 时追加校验值(数据帧的换行保留在校验值之后)"""
+        if self.frame is not None:
+            return self.frame.encode(checksum)
+        if checksum is None:
+            return self.data
+        data = self.checksummed.get(checksum.key)
+        if data is None:
+            data = self.checksummed[checksum.key] = checksum.append(self.data)
+        return data
+
+
+def parse_sequence(lines, frames=None):
+    """解析请求/应答脚本, 返回 [SequenceStep, ...], 语法错误抛出 ScriptError
+
+    send / sendhex / frame 可在末尾加 *N 表示连续发送 N 次。frame 命令在
+    frames (FrameLibrary) 中按名称查找, 发送时使用数据帧当前的编码。
+    """
+    steps = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        command, _, argument = line.partition(' ')
+        command = command.lower()
+        argument = argument.strip()
+        try:
+            if command in ('send', 'sendhex', 'frame'):
+                count = 1
+                head, _, tail = argument.rpartition(' ')
+                if head and tail.startswith('*') and tail[1:].isdigit():
+                    argument, count = head, int(tail[1:])
+                step = SequenceStep('send', line_no, line, count=count)
+                if command == 'send':
+                    step.data = unescape(argument)
+                elif command == 'sendhex':
+                    step.data = bytes.fromhex(argument)
+                else:
+                    step.frame = frames.find(argument) if frames is not None else None
+                    if step.frame is None:
+                        raise ScriptError(f"第 {line_no} 行: 数据帧 {argument} 不存在")
+            elif command == 'wait':
+                step = SequenceStep('wait', line_no, line, wait_ns=int(float(argument) * 1e6))
+            elif command == 'expect':
+                pattern, timeout_ms = argument, 1000
+                head, _, tail = argument.rpartition(' ')
+                if head and tail.isdigit():
+                    pattern, timeout_ms = head, int(tail)
+                step = SequenceStep('expect', line_no, line, pattern=re.compile(pattern.encode('utf-8')),
+                                    timeout_ms=timeout_ms)
+            else:
+                raise ScriptError(f"第 {line_no} 行: 未知命令 {command}")
+        except (ValueError, re.error) as e:
+            raise ScriptError(f"第 {line_no} 行: {e}") from e
+        steps.append(step)
+    return steps
+
+
+class StepTiming:
+    """一个步骤在各次循环中的计时统计
+
+    对 send, lateness 为实际开始时间相对计划时间的延迟, duration 为写出全部
+    数据的耗时; 对 expect, duration 为从序列中上一个 send 步骤提交最后一次发送
+    到收到匹配应答的往返时间, 不受同时进行的自动发送或文件发送影响。
+    """
+    __slots__ = ('step', 'runs', 'failures', 'lateness_total', 'lateness_max',
+                 'duration_total', 'duration_min', 'duration_max')
+
+    def __init__(self, step):
+        self.step = step
+        self.runs = 0
+        self.failures = 0
+        self.lateness_total = 0
+        self.lateness_max = 0
+        self.duration_total = 0
+        self.duration_min = 0
+        self.duration_max = 0
+
+    def add(self, lateness_ns, duration_ns):
+        if not self.runs or duration_ns < self.duration_min:
+            self.duration_min = duration_ns
+        self.runs += 1
+        self.lateness_total += lateness_ns
+        self.lateness_max = max(self.lateness_max, lateness_ns)
+        self.duration_total += duration_ns
+        self.duration_max = max(self.duration_max, duration_ns)
+
+
+class SequencePlayer(threading.Thread):
+    """按计划时间执行发送序列的线程
+
+    send 步骤按绝对计划时间执行: 序列开始时间加上之前所有 wait 的时长, 发送
+    本身的耗时不会推迟后续步骤, 迟到的量计入该步骤的 lateness。expect 步骤
+    等待匹配的应答, 收到后以当前时间作为之后步骤的计划起点; 超时则停止并
+    把 ok 置为假。loops 为循环次数, 0 表示一直循环到 stop()。
+    
+    timings 为与步骤一一对应的 StepTiming; on_log(消息) 在本线程中调用。
+    checksum 为 checksum 模块的校验算法时, 追加到每个 send 步骤的数据之后。
+    """
+    def __init__(self, engine, steps, loops=1, spin_s=0.0002, on_log=None, checksum=None):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.steps = steps
+        self.checksum = checksum
+        self.loops = loops
+        self.spin_ns = int(spin_s * 1e9)
+        self.on_log = on_log
+        self.timings = [StepTiming(step) for step in steps]
+        self.loops_done = 0
+        self.ok = True
+        self.error = None
+        self._stopped = threading.Event()
+        
+    def log(self, message):
+        if self.on_log:
+            self.on_log(message)
+            
+    def run(self):
+        engine = self.engine
+        if any(step.kind == 'expect' for step in self.steps) and not engine.expect_limit:
+            engine.enable_expect()
+        planned = time.perf_counter_ns()
+        # 本序列最近一次提交发送的时间, expect 的往返时间从这里算起
+        sent_ns = planned
+        try:
+            while self.loops == 0 or self.loops_done < self.loops:
+                for step, timing in zip(self.steps, self.timings):
+                    if step.kind == 'wait':
+                        planned += step.wait_ns
+                        continue
+                    if not sleep_until(planned, self._stopped, self.spin_ns):
+                        return
+                    started = time.perf_counter_ns()
+                    if step.kind == 'send':
+                        # 之后的 expect 只匹配本次发送之后的应答
+                        engine.discard_responses()
+                        payload = step.encode(self.checksum)
+                        for _ in range(step.count):
+                            sent_ns = time.perf_counter_ns()
+                            engine.send(payload, background=True)
+                        timing.add(started - planned, time.perf_counter_ns() - started)
+                    else:
+                        match = self._expect(step)
+                        if self._stopped.is_set():
+                            return
+                        if match is None:
+                            timing.failures += 1
+                            self.ok = False
+                            self.error = f"第 {step.line_no} 行: 等待 {step.pattern.pattern!r} 超时 ({step.timeout_ms} ms)"
+                            self.log(self.error)
+                            return
+                        now = time.perf_counter_ns()
+                        round_trip = now - sent_ns
+                        timing.add(0, round_trip)
+                        self.log(f"第 {step.line_no} 行: 匹配 {match.group(0)!r}, 往返 {round_trip / 1e6:.2f} ms")
+                        planned = now
+                self.loops_done += 1
+        except Exception as e:
+            self.ok = False
+            self.error = str(e)
+            self.log(self.error)
+            
+    def _expect(self, step):
+        """分段等待应答, 使 stop() 能及时生效"""
+        deadline = time.monotonic() + step.timeout_ms / 1000
+        while not self._stopped.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            match = self.engine.expect(step.pattern, min(remaining, 0.1))
+            if match is not None:
+                return match
+        return None
+        
+    def report(self):
+        """返回各 send/expect 步骤的计时统计行"""
+        rows = []
+        for timing in self.timings:
+            if timing.step.kind == 'wait':
+                continue
+            runs = timing.runs
+            rows.append({
+                'line_no': timing.step.line_no,
+                'text': timing.step.text,
+                'runs': runs,
+                'failures': timing.failures,
+                'late_mean_us': timing.lateness_total / runs / 1000 if runs else 0,
+                'late_max_us': timing.lateness_max / 1000,
+                'duration_min_ms': timing.duration_min / 1e6,
+                'duration_mean_ms': timing.duration_total / runs / 1e6 if runs else 0,
+                'duration_max_ms': timing.duration_max / 1e6,
+            })
+        return rows
+        
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+def run_script(engine, lines, log=print, frames=None, loops=1, checksum=None):
+    """在当前线程中执行请求/应答脚本, 返回执行完的 SequencePlayer
+
+    语法错误在发送任何数据之前抛出 ScriptError; expect 超时时停止执行,
+    返回的 player.ok 为假。
+    """
+    player = SequencePlayer(engine, parse_sequence(lines, frames), loops=loops, on_log=log, checksum=checksum)
+    player.run()
+    return player
+
+
+def format_report(rows):
+    """把 SequencePlayer.report() 格式化为文本表格"""
+    lines = [f"{'行':>4} {'次数':>6} {'失败':>4} {'延迟均值':>10} {'延迟最大':>10} "
+             f"{'耗时最小':>10} {'耗时均值':>10} {'耗时最大':>10}  步骤"]
+    for row in rows:
+        lines.append(
+            f"{row['line_no']:>4} {row['runs']:>6} {row['failures']:>4} "
+            f"{row['late_mean_us']:>8.1f}us {row['late_max_us']:>8.1f}us "
+            f"{row['duration_min_ms']:>8.3f}ms {row['duration_mean_ms']:>8.3f}ms {row['duration_max_ms']:>8.3f}ms  "
+            f"{row['text']}"
+        )
+    return '\n'.join(lines)
+
+
+class ResponseMatcher:
+    """应答匹配规则
+
+    prefix 为应答开头的字节, regex 为 bytes 正则, length 为应答字节数。只给
+    length 时收满 length 字节即为应答; prefix 与 length 同时给出时从前缀起收满
+    length 字节; regex 与 length 不能同时使用。
+    """
+    def __init__(self, prefix=None, regex=None, length=None):
+        if prefix is None and regex is None and not length:
+            raise ValueError("需要指定前缀、正则或长度")
+        if regex is not None and length:
+            raise ValueError("正则匹配不能同时指定长度")
+        self.prefix = prefix
+        self.regex = re.compile(regex) if regex is not None else None
+        self.length = length or 0
+        
+    def match(self, buffer):
+        """在已收到的数据中查找应答, 返回应答结束位置, 未收全时返回 -1"""
+        if self.regex is not None:
+            match = self.regex.search(buffer)
+            return match.end() if match else -1
+        start = 0
+        if self.prefix:
+            start = buffer.find(self.prefix)
+            if start < 0:
+                return -1
+        end = start + max(self.length, len(self.prefix or b''))
+        return end if len(buffer) >= end else -1
+
+
+class LatencyProbe(threading.Thread):
+    """请求/应答往返时间测量线程
+
+    每次迭代发送 payload, 在接收线程的回调中按 matcher 匹配应答, 往返时间为
+    请求第一段数据开始写出到使应答完整的那次读取之间的 perf_counter_ns 差值,
+    两端都在 I/O 线程中取时间戳, 不受界面刷新影响。timeout 秒内没有应答计为
+    超时; 每次迭代之间间隔 interval 秒(按绝对时间调度)。
+    
+    samples 为 [(序号, 发送时间戳, 往返时间 ns 或 None), ...]。
+    """
+    def __init__(self, engine, payload, matcher, iterations=100, timeout=1.0, interval=0.0):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.payload = payload
+        self.matcher = matcher
+        self.iterations = iterations
+        self.timeout = timeout
+        self.interval_ns = int(interval * 1e9)
+        self.samples = []
+        self.timeouts = 0
+        self.error = None
+        self._stopped = threading.Event()
+        self._matched = threading.Event()
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._armed = False
+        self._matched_ns = 0
+        
+    def _on_data(self, data, timestamp_ns):
+        with self._lock:
+            if not self._armed:
+                return
+            self._buffer += data
+            if self.matcher.match(self._buffer) >= 0:
+                self._armed = False
+                self._matched_ns = timestamp_ns
+                self._matched.set()
+                
+    def run(self):
+        self.engine.add_listener(self._on_data)
+        planned = time.perf_counter_ns()
+        try:
+            for index in range(self.iterations):
+                if not sleep_until(planned, self._stopped):
+                    return
+                with self._lock:
+                    # 上一次迟到的应答不计入本次
+                    self._buffer.clear()
+                    self._matched.clear()
+                    self._armed = True
+                try:
+                    request = self.engine.submit(self.payload, background=True)
+                except (TxQueueFull, serial.SerialException) as e:
+                    self.error = str(e)
+                    return
+                request.wait()
+                if request.error:
+                    self.error = request.error
+                    return
+                if self._wait_matched():
+                    self.samples.append((index, request.start_ns, self._matched_ns - request.start_ns))
+                elif self._stopped.is_set():
+                    return
+                else:
+                    with self._lock:
+                        self._armed = False
+                    self.timeouts += 1
+                    self.samples.append((index, request.start_ns, None))
+                planned = max(planned + self.interval_ns, time.perf_counter_ns())
+        finally:
+            self.engine.remove_listener(self._on_data)
+            
+    def _wait_matched(self):
+        """等待应答, 分段等待以便及时响应 stop()"""
+        deadline = time.monotonic() + self.timeout
+        while not self._stopped.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._matched.wait(min(remaining, 0.1)):
+                return True
+        return False
+        
+    @property
+    def completed(self):
+        return len(self.samples)
+        
+    def latencies(self):
+        """返回所有成功迭代的往返时间(ns), 已排序"""
+        return sorted(rtt for _, _, rtt in self.samples if rtt is not None)
+        
+    def stats(self):
+        """返回统计: 次数, 超时次数, 最小/均值/p50/p99/最大往返时间(微秒)"""
+        values = self.latencies()
+        n = len(values)
+        
+        def percentile(fraction):
+            return values[min(n - 1, int(n * fraction))] / 1000 if n else 0
+            
+        return {
+            'count': len(self.samples),
+            'timeouts': self.timeouts,
+            'min_us': values[0] / 1000 if n else 0,
+            'mean_us': sum(values) / n / 1000 if n else 0,
+            'p50_us': percentile(0.5),
+            'p99_us': percentile(0.99),
+            'max_us': values[-1] / 1000 if n else 0,
+        }
+        
+    def histogram(self, bins=20):
+        """返回往返时间直方图 [(下限 us, 上限 us, 次数), ...], 在最小值和最大值之间等宽分箱"""
+        values = self.latencies()
+        if not values:
+            return []
+        low, high = values[0], values[-1]
+        width = max((high - low) / bins, 1)
+        counts = [0] * bins
+        for value in values:
+            counts[min(int((value - low) / width), bins - 1)] += 1
+        return [((low + i * width) / 1000, (low + (i + 1) * width) / 1000, count)
+                for i, count in enumerate(counts)]
+        
+    def write_csv(self, path):
+        """把每次迭代的结果写入 CSV: 序号, 发送时间, 往返时间(us), 结果"""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['iteration', 'sent_at', 'rtt_us', 'status'])
+            for index, sent_ns, rtt in list(self.samples):
+                writer.writerow([
+                    index, format_capture_time(sent_ns),
+                    f"{rtt / 1000:.1f}" if rtt is not None else '',
+                    'ok' if rtt is not None else 'timeout',
+                ])
+                
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+def format_latency(probe, bins=20, width=40):
+    """把 LatencyProbe 的统计和直方图格式化为文本"""
+    stats = probe.stats()
+    lines = [
+        f"{stats['count']} 次, 超时 {stats['timeouts']}, 往返时间 最小 {stats['min_us']:.1f}us "
+        f"均值 {stats['mean_us']:.1f}us p50 {stats['p50_us']:.1f}us p99 {stats['p99_us']:.1f}us "
+        f"最大 {stats['max_us']:.1f}us"
+    ]
+    histogram = probe.histogram(bins)
+    peak = max((count for _, _, count in histogram), default=0)
+    for low, high, count in histogram:
+        bar = '#' * (round(count / peak * width) if peak else 0)
+        lines.append(f"{low:>10.1f} - {high:>10.1f}us {count:>6}  {bar}")
+    return '\n'.join(lines)
+
+
+def format_size(n):
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.1f} {unit}" if unit != 'B' else f"{n} B"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def send_file(engine, path, hex_mode=False, rate=0):
+    """发送文件并在标准错误输出进度, 成功时返回 True"""
+    sender = engine.start_file_send(path, hex_mode, rate)
+    try:
+        while not sender.finished:
+            time.sleep(0.5)
+            sent, fraction, speed, remaining = sender.progress()
+            print(f"\r{fraction * 100:5.1f}%  {format_size(sent)}  {format_size(speed)}/s  剩余 {remaining:.0f}s   ",
+                  end='', file=sys.stderr)
+    finally:
+        engine.stop_file_send()
+    sent, _, speed, _ = sender.progress()
+    print(f"\r已发送 {format_size(sent)}, 平均 {format_size(speed)}/s" + " " * 20, file=sys.stderr)
+    if sender.error:
+        print(f"文件发送失败: {sender.error}", file=sys.stderr)
+        return False
+    return True
+
+
+def list_ports():
+    for port in serial.tools.list_ports.comports():
+        print(f"{port.device}\t{port.description}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="串口监视命令行工具")
+    parser.add_argument('port', nargs='?', help="串口设备名或 pyserial URL (如 COM3, /dev/ttyUSB0, loop://)")
+    parser.add_argument('--list', action='store_true', help="列出可用串口后退出")
+    parser.add_argument('-b', '--baudrate', type=int, default=115200)
+    parser.add_argument('--bytesize', type=int, choices=(5, 6, 7, 8), default=8)
+    parser.add_argument('--parity', choices=('N', 'E', 'O', 'M', 'S'), default='N')
+    parser.add_argument('--stopbits', type=float, choices=(1, 1.5, 2), default=1)
+    parser.add_argument('--flow', choices=tuple(FLOW_CONTROL), default='N',
+                        help="流控: N 无, R RTS/CTS, X XON/XOFF, B 两者")
+    parser.add_argument('--batch-delay', type=int, default=0, metavar='MS',
+                        help="收到数据后再等待的毫秒数, 0 表示立即读取")
+    parser.add_argument('--log', metavar='FILE', help="把接收数据格式化后写入文本文件")
+    parser.add_argument('--hex', action='store_true', help="以十六进制格式输出接收数据")
+    parser.add_argument('--timestamps', action='store_true', help="为每行接收数据添加时间戳")
+    parser.add_argument('--deframe', metavar='SPEC',
+                        help="按帧输出接收数据, 每帧一行十六进制: delimiter:0d0a、fixed:N、"
+                             "length:offset=N,size=N,order=big,adjust=N,header=HEX、slip、cobs 或 idle:MS")
+    parser.add_argument('--checksum', metavar='NAME',
+                        help="在每个发送的数据之后追加校验值, 并校验 --deframe 切出的帧; "
+                             "如 CRC-16/MODBUS、CRC-32、SUM8, 名称后加 :le 或 :be 指定字节序")
+    parser.add_argument('--capture', metavar='FILE', help="录制 RX/TX 到捕获文件 (.smcap)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不在标准输出显示接收数据")
+    parser.add_argument('--send', action='append', default=[], metavar='TEXT',
+                        help="发送文本, 支持转义, 可重复")
+    parser.add_argument('--send-hex', action='append', default=[], metavar='HEX',
+                        help="发送十六进制数据, 可重复")
+    parser.add_argument('--frame', action='append', default=[], metavar='NAME',
+                        help="发送数据帧库中的数据帧, 可重复")
+    parser.add_argument('--frames', metavar='FILE', help="数据帧库文件, 默认使用图形界面的数据帧库")
+    parser.add_argument('--interval', type=float, metavar='MS',
+                        help="按此间隔周期发送 --send/--send-hex/--frame 的数据, 结束时打印实际频率和抖动; "
+                             "与 --latency 一起使用时为两次请求的间隔")
+    parser.add_argument('--latency', type=int, metavar='N',
+                        help="测量往返时间: 发送 --send/--send-hex/--frame 的数据 N 次, 按 --match-* 匹配应答, "
+                             "结束时打印 p50/p99/最大值和直方图")
+    parser.add_argument('--match-prefix', metavar='TEXT', help="应答以此开头, 支持转义")
+    parser.add_argument('--match-regex', metavar='REGEX', help="应答匹配此正则")
+    parser.add_argument('--match-length', type=int, metavar='N', help="应答的字节数")
+    parser.add_argument('--response-timeout', type=float, default=1000, metavar='MS', help="等待应答的超时")
+    parser.add_argument('--csv', metavar='FILE', help="把 --latency 每次的结果写入 CSV 文件")
+    parser.add_argument('--file', metavar='FILE', help="流式发送文件")
+    parser.add_argument('--file-hex', action='store_true', help="--file 为十六进制文本文件")
+    parser.add_argument('--rate', type=int, default=0, metavar='BPS', help="--file 的发送速率上限, 字节/秒")
+    parser.add_argument('--script', metavar='FILE', help="执行请求/应答脚本, 结束时打印各步骤的计时")
+    parser.add_argument('--loops', type=int, default=1, metavar='N', help="脚本循环次数, 0 表示一直循环")
+    parser.add_argument('--duration', type=float, metavar='SECONDS',
+                        help="运行时长; 未指定时有发送或脚本则完成后退出, 否则一直运行到 Ctrl+C")
+    parser.add_argument('--stats', action='store_true', help="退出时打印收发统计: 字节数、平均速率、线路利用率和错误")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.list:
+        list_ports()
+        return 0
+    if not args.port:
+        print("请指定串口, 或使用 --list 列出可用串口", file=sys.stderr)
+        return 2
+
+    # 先读取脚本和数据帧库, 出错时不必打开串口
+    script = None
+    if args.script:
+        try:
+            with open(args.script, encoding='utf-8') as f:
+                script = f.readlines()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"无法读取脚本 {args.script}: {e}", file=sys.stderr)
+            return 2
+    frames = FrameLibrary(args.frames or default_library_path())
+    try:
+        frames.load()
+    except (OSError, FrameLibraryError) as e:
+        print(f"无法加载数据帧库: {e}", file=sys.stderr)
+        return 2
+    checksum = None
+    if args.checksum:
+        try:
+            checksum = parse_checksum(args.checksum)
+        except ValueError as e:
+            print(f"校验参数错误: {e}", file=sys.stderr)
+            return 2
+    payloads = []
+    for text in args.send:
+        try:
+            payloads.append(unescape(text))
+        except ValueError as e:
+            print(f"--send 数据 {text!r} 的转义无效: {e}", file=sys.stderr)
+            return 2
+    for text in args.send_hex:
+        try:
+            payloads.append(bytes.fromhex(text))
+        except ValueError as e:
+            print(f"--send-hex 数据 {text!r} 不是有效的十六进制: {e}", file=sys.stderr)
+            return 2
+    for name in args.frame:
+        frame = frames.find(name)
+        if frame is None:
+            print(f"数据帧 {name} 不存在", file=sys.stderr)
+            return 2
+        payloads.append(frame)
+    # 校验值追加在数据之后; 数据帧的换行保留在校验值之后
+    payloads = [payload.encode(checksum) if isinstance(payload, Frame) else
+                checksum.append(payload) if checksum else payload
+                for payload in payloads]
+    matcher = None
+    if args.latency:
+        try:
+            if not payloads:
+                raise ValueError("--latency 需要 --send、--send-hex 或 --frame 指定请求")
+            matcher = ResponseMatcher(
+                prefix=unescape(args.match_prefix) if args.match_prefix else None,
+                regex=args.match_regex.encode('utf-8') if args.match_regex else None,
+                length=args.match_length,
+            )
+        except (ValueError, re.error) as e:
+            print(f"往返时间测量参数错误: {e}", file=sys.stderr)
+            return 2
+    deframer = None
+    if args.deframe:
+        try:
+            deframer = parse_deframer(args.deframe)
+        except ValueError as e:
+            print(f"分帧参数错误: {e}", file=sys.stderr)
+            return 2
+
+    formatter = ReceiveFormatter(hex_mode=args.hex, timestamps=args.timestamps, split_lines=True,
+                                 show_partial=False)
+    outputs = []
+    log_file = None
+    if args.log:
+        log_file = open(args.log, 'a', encoding='utf-8', newline='')
+        outputs.append(log_file)
+    if not args.quiet:
+        outputs.append(sys.stdout)
+    output_lock = threading.Lock()
+
+    def write_received(data, timestamp_ns):
+        with output_lock:
+            text, _ = formatter.feed(data, [(0, timestamp_ns)])
+            for stream in outputs:
+                stream.write(text)
+                stream.flush()
+
+    checksum_errors = 0
+
+    def write_frame(data, start_ns, end_ns):
+        nonlocal checksum_errors
+        mark = ''
+        if checksum and not checksum.verify(data):
+            checksum_errors += 1
+            mark = ' 校验错误'
+        with output_lock:
+            line = f"[{format_capture_time(start_ns)}] ({len(data)}) {data.hex(' ').upper()}{mark}\n"
+            for stream in outputs:
+                stream.write(line)
+                stream.flush()
+
+    # 空闲间隔分帧的最后一帧要靠主线程定时检查才能完成
+    idle_poll = max(deframer.gap_ns / 2e9, 0.001) if isinstance(deframer, IdleGapDeframer) else 0.2
+
+    def report_error(message):
+        print(f"串口错误: {message}", file=sys.stderr)
+
+    engine = SerialEngine(on_error=report_error)
+    frame_listener = DeframingListener(deframer, write_frame, stats=engine.stats) if deframer else None
+    if args.capture:
+        engine.start_recording(args.capture)
+    try:
+        engine.open(
+            args.port,
+            baudrate=args.baudrate,
+            bytesize=args.bytesize,
+            parity=args.parity,
+            stopbits=args.stopbits,
+            flow_control=args.flow,
+            wake_policy=SerialReader.WAKE_BATCH if args.batch_delay else SerialReader.WAKE_IMMEDIATE,
+            batch_delay_ms=args.batch_delay,
+        )
+    except (serial.SerialException, ValueError) as e:
+        print(f"无法打开串口 {args.port}: {e}", file=sys.stderr)
+        engine.stop_recording()
+        return 2
+    if frame_listener:
+        # 即使不输出(-q 且没有 --log)也要分帧, 帧统计和校验计数依赖它
+        engine.add_listener(frame_listener)
+    elif outputs:
+        engine.add_listener(write_received)
+    if script is not None:
+        engine.enable_expect()
+
+    status = 0
+    start = time.monotonic()
+    periodic = args.interval is not None and payloads and not args.latency
+    try:
+        if args.latency:
+            probe = LatencyProbe(engine, b''.join(payloads), matcher, args.latency,
+                                 timeout=args.response_timeout / 1000, interval=(args.interval or 0) / 1000)
+            probe.start()
+            try:
+                while probe.is_alive():
+                    probe.join(0.5)
+                    print(f"\r{probe.completed}/{args.latency}  超时 {probe.timeouts}   ",
+                          end='', file=sys.stderr)
+            finally:
+                probe.stop()
+                print(file=sys.stderr)
+                print(format_latency(probe), file=sys.stderr)
+                if args.csv:
+                    probe.write_csv(args.csv)
+            if probe.error or probe.timeouts:
+                if probe.error:
+                    print(f"测量中止: {probe.error}", file=sys.stderr)
+                status = 1
+        elif periodic:
+            engine.start_periodic(b''.join(payloads), args.interval / 1000)
+        else:
+            for payload in payloads:
+                engine.send(payload)
+        if args.file:
+            if not send_file(engine, args.file, args.file_hex, args.rate):
+                status = 1
+        if script is not None:
+            try:
+                player = run_script(engine, script, log=lambda message: print(message, file=sys.stderr),
+                                    frames=frames, loops=args.loops, checksum=checksum)
+                print(format_report(player.report()), file=sys.stderr)
+                if not player.ok:
+                    status = 1
+            except ScriptError as e:
+                print(f"脚本错误: {e}", file=sys.stderr)
+                status = 2
+        if args.duration is not None:
+            remaining = args.duration - (time.monotonic() - start)
+            while remaining > 0 and engine.is_open:
+                time.sleep(min(remaining, idle_poll))
+                if frame_listener:
+                    frame_listener.poll()
+                remaining = args.duration - (time.monotonic() - start)
+        elif periodic or not (payloads or args.file or script is not None or args.latency):
+            while engine.is_open:
+                time.sleep(idle_poll)
+                if frame_listener:
+                    frame_listener.poll()
+        else:
+            # 留出最后一个应答到达的时间
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if engine.periodic:
+            stats = engine.periodic.stats()
+            print(f"周期发送: 实际 {stats['achieved_hz']:.1f}/{stats['target_hz']:.1f} 次/秒, "
+                  f"延迟 均值 {stats['mean_us']:.1f}us p99 {stats['p99_us']:.1f}us 最大 {stats['max_us']:.1f}us, "
+                  f"跳过 {stats['skipped']}, 队列满 {stats['rejected']}", file=sys.stderr)
+        if args.stats:
+            # 只在退出时取样一次, 瞬时速率即整个运行期间的平均速率
+            print(format_traffic(engine.sample_stats()), file=sys.stderr)
+        engine.close()
+        engine.stop_recording()
+        if frame_listener:
+            frame_listener.flush()
+            if checksum:
+                print(f"帧: {deframer.frames}, 校验错误: {checksum_errors}", file=sys.stderr)
+        with output_lock:
+            tail = formatter.flush()
+            for stream in outputs:
+                stream.write(tail)
+                stream.flush()
+        if log_file:
+            log_file.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
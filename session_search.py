@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""接收历史检索
+
+SessionSearchIndex 把本次会话收到的原始字节追加到临时文件, 同时为每个
+64 KB 块维护一个相邻字节对(bigram)的布隆位图。普通字节查询先用位图排除
+不可能包含匹配的块, 只扫描候选块; 正则查询直接在内存映射的文件上匹配。
+整个文件是连续的, 跨越读取边界或块边界的匹配同样能找到。
+
+每个查询的结果和已扫描到的位置会被缓存, 有新数据到达后再次查询只扫描
+新增部分, 不会每次从头开始。
+
+append() 在接收线程中调用(作为串口引擎的接收回调), 与界面线程的查询之间
+用锁保护; 查询只在锁内确定当前大小, 扫描文件时不阻塞接收。临时文件超过
+max_size 后不再写入, 之后的数据只计入 skipped。
+
+临时文件名包含创建它的进程号, 程序异常退出后留下的文件由下次启动时的
+sweep_stale_files() 清理。
+"""
+import os
+import re
+import sys
+import mmap
+import time
+import tempfile
+import threading
+
+BLOCK_SIZE = 64 * 1024
+BLOOM_BITS = 4096
+# 正则增量查询时回退扫描的字节数, 覆盖跨越上次扫描末尾的匹配
+REGEX_OVERLAP = 4096
+
+
+def _bigram_hashes(data):
+    """返回 data 中所有相邻字节对映射到布隆位图的位号集合"""
+    values = set()
+    if len(data) >= 2:
+        view = memoryview(data)
+        values.update(view[:len(data) // 2 * 2].cast('H'))
+        values.update(view[1:1 + (len(data) - 1) // 2 * 2].cast('H'))
+    # 16 位乘法散列, 取高位作为位号
+    shift = 16 - (BLOOM_BITS.bit_length() - 1)
+    return {((value * 40503) & 0xFFFF) >> shift for value in values}
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    if sys.platform == 'win32':
+        # Windows 上其他进程打开中的文件不能删除, 由删除失败保护
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 进程存在但属于其他用户
+        return True
+    return True
+
+
+def sweep_stale_files(directory, prefix, suffix, max_age_s=0):
+    """删除 directory 中已退出的进程留下的临时文件, 返回删除的文件数
+
+    文件名格式为 <prefix><进程号>_...<suffix>; 创建它的进程仍在运行, 或修改
+    时间在 max_age_s 秒以内的文件保留。
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    removed = 0
+    now = time.time()
+    for name in names:
+        if not (name.startswith(prefix) and name.endswith(suffix)):
+            continue
+        pid = name[len(prefix):].split('_', 1)[0]
+        if pid.isdigit() and _process_alive(int(pid)):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) < max_age_s:
+                continue
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class SessionSearchIndex:
+    """会话接收数据的增量检索索引"""
+
+    def __init__(self, directory=None, max_size=1024 * 1024 * 1024):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "SerialMonitor")
+        self.max_size = max_size
+        self.size = 0
+        # 超出 max_size 未写入索引的字节数
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self.path = None
+        self._file = None
+        self._blooms = []
+        self._tail = bytearray()
+        self._previous_byte = b''
+        # (模式, 是否正则) -> [已扫描到的位置, 匹配列表]
+        self._cache = {}
+
+    @property
+    def full(self):
+        return self.skipped > 0
+
+    @property
+    def total(self):
+        """收到的全部字节数, 包括超出上限未索引的部分"""
+        return self.size + self.skipped
+
+    def __call__(self, data, timestamp_ns=None):
+        """作为串口引擎的接收回调"""
+        self.append(data)
+
+    def append(self, data):
+        """追加接收数据, 每凑满一块生成该块的布隆位图"""
+        if not data:
+            return
+        with self._lock:
+            if self.skipped or self.size + len(data) > self.max_size:
+                # 达到上限: 只保留能放下的部分, 索引始终是会话开头的连续数据
+                room = 0 if self.skipped else max(self.max_size - self.size, 0)
+                self.skipped += len(data) - room
+                data = data[:room]
+                if not data:
+                    return
+            self._append(data)
+
+    def _append(self, data):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, self.path = tempfile.mkstemp(prefix=f"session_{os.getpid()}_", suffix=".bin", dir=self.directory)
+            self._file = os.fdopen(fd, 'w+b')
+        self._file.write(data)
+        self.size += len(data)
+        self._tail += data
+        while len(self._tail) >= BLOCK_SIZE:
+            block = bytes(self._tail[:BLOCK_SIZE])
+            del self._tail[:BLOCK_SIZE]
+            # 位图包含跨越上一块末尾的字节对
+            bloom = bytearray(BLOOM_BITS // 8)
+            for bit in _bigram_hashes(self._previous_byte + block):
+                bloom[bit >> 3] |= 1 << (bit & 7)
+            self._blooms.append(bytes(bloom))
+            self._previous_byte = block[-1:]
+
+    def _snapshot(self):
+        """写出缓冲的数据, 返回 (当前大小, 已生成的位图数)"""
+        with self._lock:
+            if self._file is None:
+                return 0, 0
+            self._file.flush()
+            return self.size, len(self._blooms)
+
+    def read(self, start, end):
+        """读取 [start, end) 范围的原始数据"""
+        size, _ = self._snapshot()
+        end = min(end, size)
+        if start >= end:
+            return b''
+        with mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+            return mapped[start:end]
+
+    def _candidate_ranges(self, pattern, start, size, bloom_count):
+        """返回 [start, size) 中可能包含匹配的扫描范围 [(起, 止), ...]"""
+        length = len(pattern)
+        bits = _bigram_hashes(pattern)
+        if not bits or length > BLOCK_SIZE:
+            return [(start, size)]
+        ranges = []
+        for block in range(start // BLOCK_SIZE, bloom_count + 1):
+            # 从本块开始的匹配只可能落在本块和下一块中; 下一块尚未建立位图时直接扫描
+            if block + 1 < bloom_count:
+                bloom = self._blooms[block]
+                following = self._blooms[block + 1]
+                if not all((bloom[bit >> 3] | following[bit >> 3]) >> (bit & 7) & 1 for bit in bits):
+                    continue
+            block_start = block * BLOCK_SIZE
+            scan_start = max(block_start, start)
+            scan_end = min(block_start + BLOCK_SIZE + length - 1, size)
+            if scan_start >= scan_end:
+                continue
+            if ranges and ranges[-1][1] >= scan_start:
+                ranges[-1] = (ranges[-1][0], scan_end)
+            else:
+                ranges.append((scan_start, scan_end))
+        return ranges
+
+    def search(self, pattern, regex=False, max_results=100000):
+        """查找所有匹配, 返回按位置排序的 [(起, 止), ...]
+
+        pattern 为 bytes; regex 为真时按字节正则表达式匹配。结果被缓存,
+        之后的查询只扫描新增的数据。达到 max_results 时停止, 缓存记录实际
+        扫描到的位置, 以更大的 max_results 再次查询时从该处继续。
+        """
+        if not pattern:
+            return []
+        size, bloom_count = self._snapshot()
+        if not size:
+            return []
+        key = (pattern, regex)
+        scanned, matches = self._cache.get(key, (0, []))
+        if scanned >= size or len(matches) >= max_results:
+            return matches
+        # 提前停止时为最后一个匹配的结尾, 否则为本次扫描的末尾
+        reached = size
+        with mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+            if regex:
+                compiled = re.compile(pattern)
+                last_end = matches[-1][1] if matches else 0
+                position = max(last_end, scanned - REGEX_OVERLAP, 0)
+                for match in compiled.finditer(mapped, position):
+                    if match.end() <= scanned or match.start() < last_end or match.end() == match.start():
+                        continue
+                    matches.append((match.start(), match.end()))
+                    if len(matches) >= max_results:
+                        reached = match.end()
+                        break
+            else:
+                length = len(pattern)
+                # 上次扫描末尾之前 length - 1 字节起的匹配可能跨越旧的末尾
+                resume = max(scanned - length + 1, matches[-1][1] if matches else 0, 0)
+                for range_start, range_end in self._candidate_ranges(pattern, resume, size, bloom_count):
+                    position = mapped.find(pattern, range_start, range_end)
+                    while position >= 0 and reached == size:
+                        if not matches or position >= matches[-1][1]:
+                            matches.append((position, position + length))
+                            if len(matches) >= max_results:
+                                reached = position + length
+                        position = mapped.find(pattern, position + length, range_end)
+                    if reached < size:
+                        break
+        self._cache[key] = (reached, matches)
+        return matches
+
+    def clear(self):
+        """清空索引并删除临时文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+            self._file = None
+            self.path = None
+            self.size = 0
+            self.skipped = 0
+            self._blooms = []
+            self._tail = bytearray()
+            self._previous_byte = b''
+            self._cache = {}
+
+    def close(self):
+        self.clear()
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""async_serial 模块测试: pty 对上的多串口自测和命令行错误处理"""
+import asyncio
+import sys
+
+import pytest
+
+import async_serial
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="需要 pty")
+def test_selftest_over_pty_pairs():
+    assert asyncio.run(async_serial._selftest(ports=4, size=64 * 1024))
+
+
+@pytest.mark.parametrize('port', ['loop://', '/nonexistent/tty'])
+def test_echo_reports_unusable_port(port, capsys):
+    assert async_serial.main(['echo', port]) == 1
+    assert '无法打开串口' in capsys.readouterr().err
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""bench_suite 模块测试: 限速、结果记录和引擎层的短时用例"""
+import os
+import time
+
+import pytest
+
+from bench_suite import Pacer, result, run_engine, describe
+
+
+def test_pacer_unlimited_always_due():
+    pacer = Pacer(0, chunk_size=1024)
+    assert len(pacer.due()) == 1024
+    assert pacer.due() is not None
+    assert pacer.delay() == 0.0
+
+
+def test_pacer_limits_rate():
+    # 9600 波特约 960 字节/秒, 每块约 10ms 的数据
+    pacer = Pacer(960)
+    assert len(pacer.chunk) == 9
+    produced = 0
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        chunk = pacer.due()
+        if chunk is None:
+            time.sleep(pacer.delay())
+        else:
+            produced += len(chunk)
+    assert abs(produced - 0.2 * 960) <= 3 * len(pacer.chunk)
+
+
+def test_result_record():
+    record = result('engine', 'loop', 'loopback', 960, 2.0, 2000, 1990, 1900, lag=[0.002, 0.001, 0.004])
+    assert record['baudrate'] == 9600
+    assert record['bytes_per_s'] == 950
+    assert record['lag_p99_ms'] == 4.0 and record['lag_max_ms'] == 4.0
+    assert '9600' in describe(record)
+    record = result('engine', 'loop', 'loopback', 0, 1.0, 10, 10, 10)
+    assert record['baudrate'] is None and record['lag_p99_ms'] is None
+    assert '不限速' in describe(record)
+
+
+@pytest.mark.parametrize('transport, direction', [
+    ('loop', 'loopback'),
+    pytest.param('pty', 'rx', marks=pytest.mark.skipif(not hasattr(os, 'openpty'), reason="需要 pty")),
+    pytest.param('pty', 'tx', marks=pytest.mark.skipif(not hasattr(os, 'openpty'), reason="需要 pty")),
+])
+def test_run_engine_moves_all_bytes(transport, direction):
+    record = run_engine(transport, direction, 11520, 0.2)
+    assert record['bytes_sent'] > 0
+    assert record['bytes_received'] == record['bytes_sent']
+    assert record['bytes_per_s'] > 0
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""capture_file 模块测试: 写入后读回, 以及索引缺失时重建"""
+import os
+
+import pytest
+
+from capture_file import (
+    CaptureWriter, CaptureReader, CaptureFormatError, DIRECTION_RX, DIRECTION_TX, index_path_for,
+    CAPTURE_MAGIC, FILE_HEADER, RECORD_HEADER, INDEX_ENTRY
+)
+
+
+def write_capture(path, count=2000, block_size=4096):
+    """写入交替的 RX/TX 记录, 返回 [(时间戳, 方向, 负载), ...]"""
+    records = []
+    writer = CaptureWriter(str(path), block_size=block_size, flush_interval=60)
+    for n in range(count):
+        direction = DIRECTION_TX if n % 5 == 0 else DIRECTION_RX
+        payload = os.urandom(1 + n % 97)
+        timestamp_ns = 1_000_000 * n
+        writer.record(direction, payload, timestamp_ns)
+        records.append((timestamp_ns, direction, payload))
+    writer.close()
+    return records
+
+
+def test_writer_layout(tmp_path):
+    path = tmp_path / 'run.smcap'
+    writer = CaptureWriter(str(path), block_size=64, flush_interval=60)
+    writer.record_rx(b'a' * 40, 10)
+    writer.record_tx(b'b' * 40, 20)
+    writer.record_rx(b'c', 30)
+    writer.record_rx(b'', 40)
+    assert (writer.records, writer.rx_bytes, writer.tx_bytes) == (3, 41, 40)
+    writer.close()
+    data = path.read_bytes()
+    assert data[:8] == CAPTURE_MAGIC
+    offset = FILE_HEADER.size
+    records = []
+    while offset < len(data):
+        timestamp_ns, direction, length = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        records.append((timestamp_ns, direction, data[offset:offset + length]))
+        offset += length
+    assert records == [(10, DIRECTION_RX, b'a' * 40), (20, DIRECTION_TX, b'b' * 40), (30, DIRECTION_RX, b'c')]
+    # 第一块满 64 字节后写出, 关闭时写出剩余的一条
+    index = list(INDEX_ENTRY.iter_unpack(open(index_path_for(str(path)), 'rb').read()))
+    second_block = FILE_HEADER.size + 2 * RECORD_HEADER.size + 80
+    assert index == [(FILE_HEADER.size, 10, 0, 0), (second_block, 30, 2, 40)]
+
+
+def read_all(reader):
+    return [(timestamp_ns, direction, bytes(payload))
+            for block in range(reader.block_count)
+            for timestamp_ns, direction, payload in reader.iter_block_records(block)]
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'run.smcap'
+    records = write_capture(path)
+    reader = CaptureReader(str(path))
+    try:
+        assert reader.block_count > 10
+        assert read_all(reader) == records
+        assert reader.end_time == records[-1][0]
+    finally:
+        reader.close()
+
+
+def test_lookup_by_time_and_rx_offset(tmp_path):
+    path = tmp_path / 'run.smcap'
+    records = write_capture(path)
+    reader = CaptureReader(str(path))
+    try:
+        for target in (0, 3, 777, len(records) - 1):
+            timestamp_ns = records[target][0]
+            block = reader.find_block_by_time(timestamp_ns)
+            assert timestamp_ns in [record[0] for record in reader.iter_block_records(block)]
+        rx_offset = 0
+        for timestamp_ns, direction, payload in records[:1500]:
+            if direction == DIRECTION_RX:
+                rx_offset += len(payload)
+        _, _, _, block_rx_offset = reader.block_entry(reader.find_block_by_rx_offset(rx_offset))
+        assert block_rx_offset <= rx_offset
+    finally:
+        reader.close()
+
+
+def test_rebuild_index_when_missing(tmp_path):
+    path = tmp_path / 'run.smcap'
+    records = write_capture(path)
+    with open(index_path_for(str(path)), 'rb') as f:
+        original_index = f.read()
+    os.remove(index_path_for(str(path)))
+    reader = CaptureReader(str(path), block_size=4096)
+    try:
+        assert read_all(reader) == records
+        # 重建时按相同的块大小切分, 每块首条记录与写入时一致
+        assert bytes(reader.rebuild_index(4096))[:32] == original_index[:32]
+    finally:
+        reader.close()
+
+
+def test_truncated_capture_ignores_partial_record(tmp_path):
+    path = tmp_path / 'run.smcap'
+    records = write_capture(path, count=50)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)
+    reader = CaptureReader(str(path))
+    try:
+        assert read_all(reader) == records[:-1]
+    finally:
+        reader.close()
+
+
+def test_rejects_non_capture_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'short')
+    with pytest.raises(CaptureFormatError):
+        CaptureReader(str(path))
+
+
+@pytest.mark.parametrize('damage', ['stale', 'truncated', 'garbage'])
+def test_rebuild_index_when_inconsistent(tmp_path, damage):
+    path = tmp_path / 'run.smcap'
+    records = write_capture(path)
+    index_path = index_path_for(str(path))
+    with open(index_path, 'rb') as f:
+        index = f.read()
+    if damage == 'stale':
+        # 索引缺少最后几块, 最后一条索引之后还有多块数据
+        index = index[:len(index) // 2 // 32 * 32]
+    elif damage == 'truncated':
+        # 捕获文件在最后一块中间被截断
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 1000)
+    else:
+        index = index[:-32] + (os.path.getsize(path) - 3).to_bytes(8, 'little') + index[-24:]
+    with open(index_path, 'wb') as f:
+        f.write(index)
+    reader = CaptureReader(str(path), block_size=4096)
+    try:
+        expected = read_all(reader)
+        assert isinstance(reader._index, bytearray)
+        if damage == 'truncated':
+            assert expected == records[:len(expected)] and len(expected) < len(records)
+        else:
+            assert expected == records
+    finally:
+        reader.close()
+
+
+def test_rejects_bad_magic(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'\x00' * 64)
+    with pytest.raises(CaptureFormatError):
+        CaptureReader(str(path))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""checksum 模块测试: 已知答案向量和追加/校验往返"""
+import os
+
+import pytest
+
+from checksum import CHECKSUMS, Crc, checksum_names, parse_checksum
+
+CHECK_INPUT = b'123456789'
+
+# 简单校验和的期望值按定义手工计算
+SIMPLE_CHECKS = {
+    'SUM8': sum(CHECK_INPUT) & 0xFF,
+    'SUM16': sum(CHECK_INPUT) & 0xFFFF,
+    'XOR8': 0x31,
+    'LRC': -sum(CHECK_INPUT) & 0xFF,
+}
+
+
+@pytest.mark.parametrize('name', [name for name in checksum_names() if isinstance(CHECKSUMS[name], Crc)])
+def test_crc_check_value(name):
+    checksum = CHECKSUMS[name]
+    assert checksum.compute(CHECK_INPUT) == checksum.check
+
+
+@pytest.mark.parametrize('name, expected', SIMPLE_CHECKS.items())
+def test_simple_check_value(name, expected):
+    assert CHECKSUMS[name].compute(CHECK_INPUT) == expected
+
+
+@pytest.mark.parametrize('name, data, digest', [
+    # Modbus 读保持寄存器请求, CRC 低字节在前
+    ('CRC-16/MODBUS', bytes.fromhex('010300000002'), bytes.fromhex('c40b')),
+    ('CRC-16/XMODEM', CHECK_INPUT, bytes.fromhex('31c3')),
+    ('CRC-32', CHECK_INPUT, bytes.fromhex('2639f4cb')),
+])
+def test_digest_byteorder(name, data, digest):
+    assert parse_checksum(name).digest(data) == digest
+
+
+@pytest.mark.parametrize('name', checksum_names())
+def test_append_verify_round_trip(name):
+    checksum = CHECKSUMS[name]
+    for size in (0, 1, 17, 300):
+        data = os.urandom(size)
+        frame = checksum.append(data)
+        assert len(frame) == size + checksum.size
+        assert checksum.verify(frame)
+        corrupted = bytearray(frame)
+        corrupted[-1] ^= 0x01
+        assert not checksum.verify(bytes(corrupted))
+
+
+def test_verify_with_offset_and_short_frame():
+    checksum = parse_checksum('CRC-16/MODBUS')
+    frame = b'\xaa\x55' + checksum.append(b'payload')
+    assert checksum.verify(frame, offset=2)
+    assert not checksum.verify(frame)
+    assert not checksum.verify(b'\x01')
+
+
+def test_parse_checksum_aliases_and_byteorder():
+    assert parse_checksum('modbus') is CHECKSUMS['CRC-16/MODBUS']
+    swapped = parse_checksum('CRC-16/XMODEM:le')
+    assert swapped.digest(CHECK_INPUT) == bytes.fromhex('c331')
+    assert CHECKSUMS['CRC-16/XMODEM'].byteorder == 'big'
+
+
+@pytest.mark.parametrize('spec', ['CRC-99', 'CRC-16/MODBUS:middle'])
+def test_parse_checksum_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_checksum(spec)
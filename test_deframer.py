@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""deframer 模块测试: 各分帧方式在任意分段输入下切出的帧与原始帧一致"""
+import os
+import random
+
+import pytest
+
+from deframer import (
+    DelimiterDeframer, FixedLengthDeframer, LengthPrefixDeframer, SlipDeframer, CobsDeframer,
+    IdleGapDeframer, DeframingListener, parse_deframer
+)
+
+
+def payloads(count=200, seed=1):
+    rng = random.Random(seed)
+    return [bytes(rng.randrange(256) for _ in range(rng.randint(1, 300))) for _ in range(count)]
+
+
+def feed_in_chunks(deframer, stream, chunk_sizes):
+    """按循环使用的块大小把字节流分段送入, 返回切出的帧数据"""
+    frames = []
+    position = 0
+    index = 0
+    while position < len(stream):
+        size = chunk_sizes[index % len(chunk_sizes)]
+        frames += deframer.feed(stream[position:position + size], position)
+        position += size
+        index += 1
+    return [frame[0] for frame in frames]
+
+
+CHUNKINGS = [[1], [2, 3], [7], [64], [4096], [1, 500, 13]]
+
+
+@pytest.mark.parametrize('chunks', CHUNKINGS)
+def test_delimiter_split_across_feeds(chunks):
+    lines = [payload.replace(b'\r', b'.').replace(b'\n', b'.') for payload in payloads()]
+    stream = b''.join(line + b'\r\n' for line in lines)
+    assert feed_in_chunks(DelimiterDeframer(b'\r\n'), stream, chunks) == lines
+
+
+def test_delimiter_include_delimiter_and_empty_frames():
+    deframer = DelimiterDeframer(b';', include_delimiter=True)
+    assert [frame[0] for frame in deframer.feed(b'a;;b;c', 0)] == [b'a;', b'b;']
+    assert deframer.pending == 1
+    assert deframer.flush()[0][0] == b'c'
+
+
+@pytest.mark.parametrize('chunks', CHUNKINGS)
+def test_fixed_length(chunks):
+    stream = os.urandom(64 * 50)
+    expected = [stream[i:i + 64] for i in range(0, len(stream), 64)]
+    assert feed_in_chunks(FixedLengthDeframer(64), stream, chunks) == expected
+
+
+@pytest.mark.parametrize('chunks', CHUNKINGS)
+def test_length_prefix_with_header(chunks):
+    header = b'\xaa\x55'
+    frames = [header + len(payload).to_bytes(2, 'big') + payload for payload in payloads()]
+    deframer = LengthPrefixDeframer(length_offset=2, length_size=2, header=header)
+    assert feed_in_chunks(deframer, b''.join(frames), chunks) == frames
+
+
+def test_length_prefix_resyncs_on_garbage():
+    header = b'\xaa\x55'
+    frame = header + b'\x00\x03abc'
+    deframer = LengthPrefixDeframer(length_offset=2, length_size=2, header=header)
+    assert [f[0] for f in deframer.feed(b'\x00\x01\xaa' + frame + frame, 0)] == [frame, frame]
+
+
+def test_length_prefix_little_endian_and_adjust():
+    frame = b'\x05\x00abc\x01\x02'
+    deframer = LengthPrefixDeframer(length_offset=0, length_size=2, byteorder='little', length_adjust=0)
+    assert deframer.feed(frame, 0)[0][0] == frame
+    # adjust 计入长度字段之外的两字节校验值
+    deframer = LengthPrefixDeframer(length_offset=0, length_size=1, length_adjust=2)
+    assert deframer.feed(b'\x03abcXY', 0)[0][0] == b'\x03abcXY'
+
+
+@pytest.mark.parametrize('chunks', CHUNKINGS)
+def test_slip(chunks):
+    frames = payloads()
+    stream = b''.join(map(SlipDeframer.encode, frames))
+    assert feed_in_chunks(SlipDeframer(), stream, chunks) == frames
+
+
+def test_slip_escapes():
+    data = bytes([0xC0, 0xDB, 0x01, 0xDC, 0xDD])
+    assert SlipDeframer.decode(SlipDeframer.encode(data)[:-1]) == data
+
+
+@pytest.mark.parametrize('chunks', CHUNKINGS)
+def test_cobs(chunks):
+    frames = payloads() + [b'\x00' * 300, bytes(range(1, 256)) * 2]
+    stream = b''.join(map(CobsDeframer.encode, frames))
+    assert feed_in_chunks(CobsDeframer(), stream, chunks) == frames
+
+
+def test_cobs_invalid_frame_is_counted():
+    deframer = CobsDeframer()
+    # 编码字节 5 指向帧末尾之后
+    assert deframer.feed(b'\x05ab\x00' + CobsDeframer.encode(b'ok'), 0) == [(b'ok', 0, 0)]
+    assert deframer.errors == 1
+
+
+def test_idle_gap_closes_frames_on_feed_and_poll():
+    deframer = IdleGapDeframer(gap_ms=5)
+    ms = 1_000_000
+    assert deframer.feed(b'ab', 0) == []
+    assert deframer.feed(b'cd', 2 * ms) == []
+    assert deframer.feed(b'ef', 10 * ms) == [(b'abcd', 0, 2 * ms)]
+    assert deframer.poll(12 * ms) == []
+    assert deframer.poll(16 * ms) == [(b'ef', 10 * ms, 10 * ms)]
+    assert deframer.frames == 2
+
+
+def test_max_length_drops_unframed_data():
+    deframer = DelimiterDeframer(b'\n', max_length=16)
+    assert deframer.feed(b'x' * 20, 0) == []
+    assert deframer.dropped == 20
+    assert deframer.feed(b'ok\n', 0)[0][0] == b'ok'
+
+
+def test_listener_counts_frames():
+    class Stats:
+        frames = 0
+
+    received = []
+    listener = DeframingListener(FixedLengthDeframer(2), lambda data, start, end: received.append(data),
+                                 stats=Stats())
+    listener(b'abcde', 0)
+    listener.flush()
+    assert received == [b'ab', b'cd', b'e']
+    assert listener.stats.frames == 3
+
+
+def test_listener_counts_frames_closed_by_poll():
+    class Stats:
+        frames = 0
+
+    received = []
+    listener = DeframingListener(IdleGapDeframer(gap_ms=1), lambda data, start, end: received.append(data),
+                                 stats=Stats())
+    listener(b'\x01\x03', 0)
+    listener.poll(10_000_000)
+    assert received == [b'\x01\x03']
+    assert listener.stats.frames == 1
+
+
+@pytest.mark.parametrize('spec, kind', [
+    ('delimiter:0d0a', DelimiterDeframer),
+    ('fixed:8', FixedLengthDeframer),
+    ('length:offset=2,size=2,order=little,adjust=2,header=aa55', LengthPrefixDeframer),
+    ('slip', SlipDeframer),
+    ('cobs', CobsDeframer),
+    ('idle:3', IdleGapDeframer),
+])
+def test_parse_deframer(spec, kind):
+    assert isinstance(parse_deframer(spec), kind)
+
+
+def test_parse_deframer_rejects_unknown():
+    with pytest.raises(ValueError):
+        parse_deframer('nope')
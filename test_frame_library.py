@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""frame_library 模块测试: 保存/加载往返和损坏文件的处理"""
+import pytest
+
+from checksum import parse_checksum
+from frame_library import FrameLibrary, FrameLibraryError, encode_payload
+
+
+def sample_library(path):
+    library = FrameLibrary(str(path))
+    library.add("查询", "AT+GMR", append_newline=True)
+    library.add("读寄存器", "01 03 00 00 00 02 C4 0B", hex_mode=True)
+    library.add("中文", "温度?")
+    return library
+
+
+def test_encode_payload():
+    assert encode_payload("AT", append_newline=True) == b'AT\r\n'
+    assert encode_payload("01, 02", hex_mode=True) == b'\x01\x02'
+    assert encode_payload("abc", hex_mode=True) == b'\xab\xc0'
+
+
+def test_checksum_goes_before_newline():
+    checksum = parse_checksum('SUM8')
+    assert encode_payload("0102", hex_mode=True, append_newline=True, checksum=checksum) == b'\x01\x02\x03\r\n'
+    frame = FrameLibrary().add("a", "0102", hex_mode=True, append_newline=True)
+    assert frame.encode() is frame.data
+    assert frame.encode(checksum) == b'\x01\x02\x03\r\n'
+
+
+
+def test_checksummed_bytes_cached_until_update():
+    library = FrameLibrary()
+    frame = library.add("a", "0102", hex_mode=True)
+    crc = parse_checksum('CRC-16/MODBUS')
+    first = frame.encode(crc)
+    assert frame.encode(parse_checksum('CRC-16/MODBUS')) is first
+    assert frame.encode(parse_checksum('CRC-16/MODBUS:be')) == crc.with_byteorder('big').append(b'\x01\x02')
+    library.update(frame.id, text="03", append_newline=True)
+    assert frame.encode(crc) == crc.append(b'\x03') + b'\r\n'
+
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / 'frames.smfl'
+    library = sample_library(path)
+    library.remove(library.find("中文").id)
+    library.add("最后", "x")
+    library.save()
+
+    loaded = FrameLibrary(str(path)).load()
+    assert [(frame.id, frame.name, frame.text, frame.hex_mode, frame.append_newline, frame.data)
+            for frame in loaded] == \
+           [(frame.id, frame.name, frame.text, frame.hex_mode, frame.append_newline, frame.data)
+            for frame in library]
+    assert loaded.next_id == library.next_id
+    assert loaded.find("读寄存器").data == bytes.fromhex('010300000002c40b')
+
+
+def test_update_reencodes_and_renames():
+    library = FrameLibrary()
+    frame = library.add("a", "hi")
+    library.update(frame.id, name="b", append_newline=True)
+    assert library.find("a") is None
+    assert library.find("b").data == b'hi\r\n'
+    library.add("c", "x")
+    with pytest.raises(ValueError):
+        library.update(frame.id, name="c")
+    with pytest.raises(ValueError):
+        library.add("c", "y")
+
+
+def test_missing_file_is_empty(tmp_path):
+    assert len(FrameLibrary(str(tmp_path / 'missing.smfl')).load()) == 0
+
+
+@pytest.mark.parametrize('damage', ['short', 'magic', 'truncated'])
+def test_corrupt_file_raises_and_leaves_library_empty(tmp_path, damage):
+    path = tmp_path / 'frames.smfl'
+    sample_library(path).save()
+    content = path.read_bytes()
+    if damage == 'short':
+        content = content[:5]
+    elif damage == 'magic':
+        content = b'XXXX' + content[4:]
+    else:
+        content = content[:20]
+    path.write_bytes(content)
+    library = FrameLibrary(str(path))
+    with pytest.raises(FrameLibraryError):
+        library.load()
+    assert len(library) == 0
+
+
+def test_save_replaces_atomically(tmp_path):
+    path = tmp_path / 'sub' / 'frames.smfl'
+    sample_library(path).save()
+    assert path.exists()
+    assert not (tmp_path / 'sub' / 'frames.smfl.tmp').exists()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""main 模块中与界面无关部分的测试, 需要 PyQt5"""
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from main import ReceiveHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ReceiveHistory(max_lines=3, max_line_length=8, spill_dir=str(tmp_path))
+    yield history
+    history.clear()
+
+
+def test_history_continues_open_line(history):
+    assert history.append('ab') == (False, 1, 0)
+    assert history.line_open
+    assert history.append('cd\nef\n') == (True, 1, 0)
+    assert list(history.lines) == ['abcd', 'ef']
+    assert not history.line_open
+    assert history.next_line_no == 2
+
+
+def test_history_wraps_long_lines(history):
+    history.append('0123456789abc\n')
+    assert list(history.lines) == ['01234567', '89abc']
+    history.append('xy')
+    history.append('z' * 10)
+    assert list(history.lines) == ['89abc', 'xyzzzzzz', 'zzzz']
+
+
+def test_history_spills_evicted_lines(history):
+    changed, added, removed = history.append('1\n2\n3\n4\n5\n')
+    assert (added, removed) == (5, 2)
+    assert list(history.lines) == ['3', '4', '5']
+    assert history.first_line_no == 2
+    with open(history.spill_path, encoding='utf-8') as f:
+        assert f.read() == '1\n2\n'
+    assert os.path.basename(history.spill_path).startswith(f'receive_{os.getpid()}_')
+
+
+def test_history_char_limit(tmp_path):
+    history = ReceiveHistory(max_lines=100, max_chars=10, spill_dir=str(tmp_path))
+    history.append('aaaa\nbbbb\ncccc\n')
+    assert list(history.lines) == ['bbbb', 'cccc']
+    assert history.chars == 8
+    history.clear()
+
+
+def test_history_retract_partial(history):
+    history.append('done\nhalf')
+    assert history.retract_partial()
+    assert list(history.lines) == ['done']
+    assert not history.retract_partial()
+
+
+def test_sweep_keeps_recent_spill_files(tmp_path):
+    dead_pid = 2 ** 22 + 12345
+    old = tmp_path / f'receive_{dead_pid}_a.log'
+    recent = tmp_path / f'receive_{dead_pid}_b.log'
+    for path in (old, recent):
+        path.write_text('x')
+    os.utime(old, (0, 0))
+    ReceiveHistory.sweep(str(tmp_path))
+    assert not old.exists() and recent.exists()
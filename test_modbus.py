@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""modbus 模块测试: 请求构造、帧拆分和解码"""
+import struct
+
+import pytest
+
+import modbus
+
+from modbus import (
+    CRC, REQUEST, RESPONSE, EXCEPTION, UNKNOWN, ModbusMonitor, PollItem,
+    build_request, response_length, split_frames, decode_frame, frame_gap_ms, char_time_s
+)
+
+
+def read_response(slave, function, values):
+    payload = b''.join(struct.pack('>H', value) for value in values)
+    return CRC.append(bytes([slave, function, len(payload)]) + payload)
+
+
+def test_build_request_known_frame():
+    assert build_request(1, 3, 0, 2) == bytes.fromhex('010300000002c40b')
+
+
+def test_timing():
+    assert char_time_s(9600) == pytest.approx(10 / 9600)
+    assert char_time_s(9600, parity='E', stopbits=2) == pytest.approx(12 / 9600)
+    assert frame_gap_ms(9600) == pytest.approx(3.5 * 10 / 9600 * 1000)
+    assert frame_gap_ms(115200) == 1.75
+
+
+def test_response_length():
+    assert response_length(3, 10) == 25
+    assert response_length(1, 9) == 7
+    assert response_length(6, 1) == 8
+
+
+def test_split_merged_request_and_response():
+    request = build_request(1, 3, 0x10, 2)
+    response = read_response(1, 3, [0x1234, 0xABCD])
+    exception = CRC.append(bytes([2, 0x83, 0x02]))
+    assert split_frames(request + response + exception) == [request, response, exception]
+    assert split_frames(request + b'\x01\x02') == [request, b'\x01\x02']
+
+
+def test_decode_request_response_and_exception():
+    request = decode_frame(build_request(7, 4, 100, 3))
+    assert (request.kind, request.slave, request.address, request.count) == (REQUEST, 7, 100, 3)
+    response = decode_frame(read_response(7, 4, [1, 2, 3]), expect_response=True)
+    assert (response.kind, response.values) == (RESPONSE, [1, 2, 3])
+    exception = decode_frame(CRC.append(bytes([7, 0x84, 0x02])))
+    assert (exception.kind, exception.exception) == (EXCEPTION, 2)
+    bad = decode_frame(build_request(7, 4, 100, 3)[:-1] + b'\x00')
+    assert not bad.crc_ok and bad.kind == UNKNOWN
+
+
+def test_decode_coil_response():
+    frame = decode_frame(CRC.append(bytes([1, 1, 1, 0b00000101])), expect_response=True)
+    assert frame.values[:4] == [1, 0, 1, 0]
+
+
+def test_monitor_pairs_requests_with_responses():
+    frames = []
+    monitor = ModbusMonitor(gap_ms=2, on_frame=frames.append)
+    ms = 1_000_000
+    monitor.listener(build_request(1, 3, 0, 1), 0)
+    monitor.listener(read_response(1, 3, [42]), 10 * ms)
+    monitor.listener(b'\x01\x03\x00', 20 * ms)
+    monitor.listener.poll(30 * ms)
+    assert [frame.kind for frame in frames] == [REQUEST, RESPONSE, UNKNOWN]
+    assert frames[1].values == [42]
+    assert monitor.crc_errors == 1
+
+
+@pytest.mark.parametrize('text', ['1:3:0', '0:3:0:1', '1:6:0:1', '1:3:0:200', 'a:b:c:d'])
+def test_poll_item_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        PollItem.parse(text)
+
+
+def test_poll_item_parse():
+    item = PollItem.parse('0x11:3:0x100:4')
+    assert str(item) == '17:3:256:4'
+    assert item.request == build_request(17, 3, 256, 4)
+
+
+def test_cli_reports_unopenable_port(tmp_path, capsys):
+    assert modbus.main(['monitor', str(tmp_path / 'missing')]) == 2
+    assert '无法打开串口' in capsys.readouterr().err
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""plot_data 模块测试: 字段解析和抽取环形缓冲区的包络与逐点扫描一致"""
+import random
+
+import pytest
+
+from plot_data import LineParser, DecimatingRing, PlotStore, PlotFeed
+
+
+def test_parse_name_value_pairs():
+    assert LineParser().parse("T=23.4, H:55 junk x=-1e3") == [('T', 23.4), ('H', 55.0), ('x', -1000.0)]
+
+
+def test_parse_named_groups_and_sequence():
+    assert LineParser(r'temp (?P<t>\S+) hum (?P<h>\S+)').parse("temp 1.5 hum 2") == [('t', 1.5), ('h', 2.0)]
+    assert LineParser(r'[-\d.]+').parse("3 4.5 -6") == [('1', 3.0), ('2', 4.5), ('3', -6.0)]
+
+
+def test_parser_rejects_bad_regex():
+    with pytest.raises(ValueError):
+        LineParser('(')
+
+
+def brute_envelope(points, start_ns, end_ns, width):
+    columns = {}
+    scale = width / (end_ns - start_ns)
+    for timestamp_ns, value in points:
+        if start_ns <= timestamp_ns < end_ns:
+            column = min(max(int((timestamp_ns - start_ns) * scale), 0), width - 1)
+            low, high = columns.get(column, (value, value))
+            columns[column] = (min(low, value), max(high, value))
+    return [(column, low, high) for column, (low, high) in sorted(columns.items())]
+
+
+def random_ring(count, capacity=1 << 16):
+    rng = random.Random(count)
+    ring = DecimatingRing(capacity=capacity)
+    points = []
+    timestamp_ns = 0
+    for _ in range(count):
+        timestamp_ns += rng.randint(1, 1000)
+        value = rng.uniform(-100, 100)
+        ring.append(timestamp_ns, value)
+        points.append((timestamp_ns, value))
+    # 环形缓冲区只保留最近 capacity 个采样
+    return ring, points[-capacity:]
+
+
+def windows(points):
+    yield points[0][0], points[-1][0] + 1
+    yield points[len(points) // 3][0] + 1, points[-1][0] - 7
+
+
+def test_envelope_exact_when_columns_hold_few_samples():
+    ring, points = random_ring(2000)
+    for start_ns, end_ns in windows(points):
+        assert ring.envelope(start_ns, end_ns, 800) == brute_envelope(points, start_ns, end_ns, 800)
+
+
+@pytest.mark.parametrize('count', [1000, 50000, 300000])
+def test_envelope_covers_exactly_the_window(count):
+    # 摘要块按块首时间戳归入像素列, 单列的值可能来自相邻列; 整个窗口的极值必须准确
+    ring, points = random_ring(count)
+    assert ring.last == points[-1][1]
+    for width in (1, 97, 800):
+        for start_ns, end_ns in windows(points):
+            envelope = ring.envelope(start_ns, end_ns, width)
+            expected = brute_envelope(points, start_ns, end_ns, 1)[0]
+            assert min(low for _, low, _ in envelope) == expected[1]
+            assert max(high for _, _, high in envelope) == expected[2]
+            assert all(0 <= column < width for column, _, _ in envelope)
+    assert ring.envelope(points[-1][0] + 1, points[-1][0] + 100, 10) == []
+
+
+def test_feed_parses_lines_split_across_chunks():
+    store = PlotStore(capacity=1024)
+    feed = PlotFeed(store, LineParser())
+    feed.listener(b'a=1,b=2\na=', 100)
+    feed.listener(b'3\nnoise\n', 200)
+    assert feed.lines == 3
+    assert store.samples == 3
+    envelopes = store.envelopes(0, 1000, 10)
+    # 跨块的行使用首字节所在批的时间戳
+    assert envelopes['a'] == ([(1, 1.0, 3.0)], 3.0)
+    assert envelopes['b'][1] == 2.0
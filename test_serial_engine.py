@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+"""serial_engine 模块测试, 使用 pyserial 的 loop:// 回环端口"""
+import os
+import sys
+import time
+import threading
+
+import pytest
+import serial
+
+import serial_engine
+from checksum import parse_checksum
+from frame_library import FrameLibrary
+from serial_engine import (
+    SerialEngine, SequencePlayer, parse_sequence, ReceiveFormatter, HexDumpFormatter, RxRingBuffer,
+    format_capture_time, SerialWriter, TxQueueFull, PeriodicSender, FileSender, ResponseMatcher,
+    LatencyProbe, format_latency, IoLoop, SelectorReader, TrafficStats, format_traffic, bits_per_char
+)
+
+
+@pytest.fixture
+def engine():
+    engine = SerialEngine()
+    engine.open('loop://')
+    yield engine
+    engine.close()
+
+
+def test_expect_round_trip_measured_from_own_send(engine):
+    # send 之后等待 80ms 再 expect; 期间另一次发送不应缩短测得的往返时间
+    steps = parse_sequence(["send PING", "wait 80", "expect PING"])
+    player = SequencePlayer(engine, steps)
+    player.start()
+    time.sleep(0.03)
+    engine.send(b'other')
+    player.join(2)
+    assert player.ok, player.error
+    assert player.timings[2].duration_min >= 80e6
+
+
+def test_cli_rejects_invalid_hex(capsys):
+    assert serial_engine.main(['loop://', '--send-hex', '01zz']) == 2
+    assert '01zz' in capsys.readouterr().err
+
+
+def test_cli_quiet_still_deframes_and_verifies(capsys):
+    status = serial_engine.main(['loop://', '-q', '--send-hex', '0102', '--send-hex', '0304',
+                                 '--checksum', 'SUM8', '--deframe', 'fixed:3', '--duration', '0.2'])
+    assert status == 0
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert '帧: 2, 校验错误: 0' in captured.err
+
+
+def test_sequence_appends_checksum_before_frame_newline(engine):
+    library = FrameLibrary()
+    library.add("ping", "01 02", hex_mode=True, append_newline=True)
+    received = []
+    engine.add_listener(lambda data, timestamp_ns: received.append(data))
+    player = SequencePlayer(engine, parse_sequence(["frame ping", "sendhex 03"], library),
+                            checksum=parse_checksum('SUM8'))
+    player.start()
+    player.join(2)
+    assert player.ok, player.error
+    deadline = time.monotonic() + 1
+    while len(b''.join(received)) < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert b''.join(received) == b'\x01\x02\x03\r\n\x03\x03'
+
+
+def test_cli_stats_count_frames_closed_by_idle_gap(capsys):
+    status = serial_engine.main(['loop://', '--send-hex', '010300000002', '--deframe', 'idle:4',
+                                 '--duration', '0.3', '--stats'])
+    assert status == 0
+    assert '帧: 1 ' in capsys.readouterr().err
+
+
+def test_cli_rejects_invalid_escape_and_missing_script(tmp_path, capsys):
+    assert serial_engine.main(['loop://', '--send', '\\x4']) == 2
+    assert '转义无效' in capsys.readouterr().err
+    assert serial_engine.main(['loop://', '--script', str(tmp_path / 'missing.txt')]) == 2
+    assert '无法读取脚本' in capsys.readouterr().err
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_reader_delivers_received_bytes_to_listeners(engine):
+    received = []
+    engine.add_listener(lambda data, timestamp_ns: received.append((data, timestamp_ns)))
+    before = time.perf_counter_ns()
+    engine.send(b'hello ')
+    engine.send(b'world')
+    assert wait_for(lambda: b''.join(data for data, _ in received) == b'hello world')
+    # 时间戳在接收线程读到数据时记录
+    assert all(before <= timestamp_ns <= time.perf_counter_ns() for _, timestamp_ns in received)
+    assert engine.rx_bytes == 11
+
+
+def test_text_formatter_keeps_characters_split_across_reads():
+    formatter = ReceiveFormatter()
+    data = '温度 25℃\n'.encode('utf-8')
+    text = ''.join(formatter.feed(data[i:i + 1])[0] for i in range(len(data)))
+    assert text == '温度 25℃\n'
+    assert formatter.feed(b'\xff')[0] == '�'
+
+
+def test_ring_buffer_drops_oldest_bytes_when_full():
+    ring = RxRingBuffer(capacity=8)
+    ring.write(b'abcdef', 100)
+    ring.write(b'ghij', 200)
+    assert ring.dropped == 2
+    assert len(ring) == 8
+    assert ring.read_with_stamps() == (b'cdefghij', [(0, 100), (4, 200)])
+    assert ring.last_read_start == 2
+    ring.write(b'0123456789', 300)
+    assert ring.read_with_stamps() == (b'23456789', [(0, 300)])
+    assert ring.dropped == 4
+    assert ring.read() == b''
+
+
+def test_ring_buffer_partial_reads_wrap_around():
+    ring = RxRingBuffer(capacity=8)
+    ring.write(b'abcdef', 1)
+    assert ring.read(4) == b'abcd'
+    ring.write(b'ghijk', 2)
+    assert ring.read_with_stamps() == (b'efghijk', [(0, 1), (2, 2)])
+    assert ring.last_read_start == 4
+    assert ring.dropped == 0
+
+
+def test_hex_dump_rows_stay_aligned_across_feeds():
+    formatter = HexDumpFormatter()
+    data = bytes(range(40))
+    rows, partial = formatter.feed(data[:10])
+    assert rows == ''
+    assert partial == HexDumpFormatter.format_rows(data[:10]).rstrip('\n')
+    rows, partial = formatter.feed(data[10:])
+    assert rows == HexDumpFormatter.format_rows(data[:32])
+    assert formatter.pending_length == 8
+    assert partial == HexDumpFormatter.format_rows(data[32:]).rstrip('\n')
+
+
+def test_hex_dump_row_layout():
+    assert HexDumpFormatter.format_rows(b'AB\x00~\x7f') == '41 42 00 7E 7F'.ljust(48) + ' AB.~.\n'
+    rows = HexDumpFormatter.format_rows(bytes(32)).splitlines()
+    assert len(rows) == 2 and all(len(row) == 16 * 3 + 1 + 16 for row in rows)
+
+
+def test_text_formatter_stamps_each_line_with_its_read_time():
+    formatter = ReceiveFormatter(timestamps=True, split_lines=True, clock_offset_ns=0)
+    first, second = 1_000_000_000, 2_500_000_000
+    text, _ = formatter.feed(b'one\ntw', [(0, first)])
+    text += formatter.feed(b'o\nthree\n', [(0, second)])[0]
+    stamp = [format_capture_time(t, 0) for t in (first, second)]
+    assert text == f"[{stamp[0]}] one\n[{stamp[0]}] two\n[{stamp[1]}] three\n"
+
+
+def test_hex_formatter_stamps_rows_with_first_byte_time():
+    formatter = ReceiveFormatter(hex_mode=True, timestamps=True, split_lines=True,
+                                 clock_offset_ns=0, show_partial=False)
+    text, _ = formatter.feed(bytes(24), [(0, 1_000_000_000), (10, 2_000_000_000)])
+    text += formatter.feed(bytes(8), [(0, 3_000_000_000)])[0]
+    stamps = [line[1:16] for line in text.splitlines()]
+    assert stamps == [format_capture_time(t, 0) for t in (1_000_000_000, 2_000_000_000)]
+
+
+class BlockingPort:
+    """write() 阻塞到 release 被置位, 模拟对端流控暂停"""
+    is_open = True
+
+    def __init__(self):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.data = bytearray()
+
+    def write(self, data):
+        self.writing.set()
+        self.release.wait()
+        self.data += data
+        return len(data)
+
+    def cancel_write(self):
+        self.release.set()
+
+
+def test_writer_limits_queued_requests():
+    port = BlockingPort()
+    writer = SerialWriter(port, max_requests=2)
+    writer.stats = TrafficStats()
+    writer.start()
+    first = writer.submit(b'a')
+    writer.submit(b'b')
+    with pytest.raises(TxQueueFull):
+        writer.submit(b'c')
+    assert writer.stats.tx_rejected == 1
+    port.release.set()
+    assert first.wait(2)
+    assert wait_for(lambda: writer.depth == 0)
+    writer.submit(b'c').wait(2)
+    writer.stop()
+    assert port.data == b'abc'
+    assert writer.stats.tx_requests == 3
+
+
+def test_writer_limits_queued_bytes_but_accepts_one_large_request():
+    port = BlockingPort()
+    writer = SerialWriter(port, max_bytes=10, chunk_size=4)
+    writer.start()
+    large = writer.submit(b'0123456789AB')
+    with pytest.raises(TxQueueFull):
+        writer.submit(b'x')
+    assert writer.pending_bytes == 12
+    port.release.set()
+    assert large.wait(2)
+    assert large.written == 12 and large.error is None
+    writer.stop()
+    assert port.data == b'0123456789AB'
+
+
+def test_writer_stop_cancels_queued_requests():
+    port = BlockingPort()
+    writer = SerialWriter(port, chunk_size=4)
+    writer.start()
+    first = writer.submit(b'abcdefgh')
+    second = writer.submit(b'ijkl')
+    assert port.writing.wait(2)
+    writer.stop()
+    assert first.error == "发送已取消" and first.written == 4
+    assert second.error == "发送线程已停止" and second.done.is_set()
+    with pytest.raises(TxQueueFull):
+        writer.submit(b'x')
+
+
+def test_periodic_sender_keeps_absolute_deadlines():
+    sent = []
+    sender = PeriodicSender(lambda payload: sent.append(payload), b'tick', 0.01)
+    sender.start()
+    time.sleep(0.2)
+    stopped_ns = time.perf_counter_ns()
+    sender.stop()
+    assert sender.fired == len(sent) >= 5
+    assert set(sent) == {b'tick'}
+    # 周期序号由开始时间推算, 单次迟到不会推迟之后的截止时间
+    expected_ticks = (stopped_ns - sender.start_ns) // 10_000_000 + 1
+    assert abs(sender.fired + sender.skipped - expected_ticks) <= 1
+    assert min(sender.lateness) >= 0
+
+
+def test_periodic_sender_skips_missed_periods_and_counts_rejections():
+    calls = []
+
+    def submit(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            time.sleep(0.035)
+        else:
+            raise TxQueueFull("发送队列已满")
+
+    sender = PeriodicSender(submit, b'x', 0.01)
+    sender.start()
+    assert wait_for(lambda: len(calls) >= 3)
+    sender.stop()
+    assert sender.fired == 1
+    assert sender.skipped >= 2
+    assert sender.rejected == len(calls) - 1
+    stats = sender.stats()
+    assert stats['target_hz'] == 100
+    assert (stats['skipped'], stats['rejected']) == (sender.skipped, sender.rejected)
+
+
+def test_periodic_sender_stops_on_send_error():
+    errors = []
+
+    def submit(payload):
+        raise serial.SerialException("串口未打开")
+
+    sender = PeriodicSender(submit, b'x', 0.01, on_error=errors.append)
+    sender.start()
+    sender.join(2)
+    assert not sender.is_alive()
+    assert errors == ["串口未打开"]
+
+
+def collect(engine):
+    received = bytearray()
+    engine.add_listener(lambda data, timestamp_ns: received.extend(data))
+    return received
+
+
+@pytest.mark.parametrize('hex_mode', [False, True])
+def test_file_sender_streams_file_through_engine(engine, tmp_path, hex_mode):
+    data = os.urandom(20_000)
+    path = tmp_path / 'data.bin'
+    if hex_mode:
+        # 每行 37 字节, 换行和空格不在读取边界对齐; 末尾的奇数个字符补 0
+        text = '\n'.join(data[i:i + 37].hex(' ') for i in range(0, len(data), 37)) + ' 7'
+        path.write_text(text)
+        data += b'\x70'
+    else:
+        path.write_bytes(data)
+    received = collect(engine)
+    sender = FileSender(lambda chunk: engine.submit(chunk, background=True), str(path),
+                        hex_mode=hex_mode, chunk_size=1000, window=2)
+    sender.READ_SIZE = 777
+    sender.start()
+    sender.join(5)
+    assert sender.finished and sender.error is None and not sender.cancelled
+    assert wait_for(lambda: len(received) >= len(data))
+    assert bytes(received) == data
+    sent, fraction, rate, remaining = sender.progress()
+    assert (sent, fraction, remaining) == (len(data), 1.0, 0)
+    assert rate > 0
+
+
+def test_file_sender_paces_to_rate(engine, tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(bytes(4000))
+    sender = FileSender(engine.submit, str(path), chunk_size=1000, rate=20_000)
+    sender.start()
+    sender.join(5)
+    # 最后一块在已提交 3000 字节之后发出, 不早于 0.15 秒
+    assert (sender.end_ns - sender.start_ns) / 1e9 >= 0.15
+    assert sender.bytes_sent == 4000
+
+
+def test_file_sender_reports_write_errors(tmp_path):
+    class FailedRequest:
+        written = 0
+        error = "写入失败"
+
+        def wait(self, timeout=None):
+            return True
+
+    path = tmp_path / 'data.bin'
+    path.write_bytes(bytes(100))
+    sender = FileSender(lambda chunk: FailedRequest(), str(path), chunk_size=10, window=1)
+    sender.run()
+    assert sender.error == "写入失败"
+    assert not sender.cancelled
+
+
+@pytest.mark.parametrize('matcher, buffer, end', [
+    (ResponseMatcher(prefix=b'OK'), b'..OK\r\n', 4),
+    (ResponseMatcher(prefix=b'\x01\x03', length=5), b'\x00\x01\x03\x02', -1),
+    (ResponseMatcher(prefix=b'\x01\x03', length=5), b'\x00\x01\x03\x02\xaa\xbb', 6),
+    (ResponseMatcher(length=3), b'abcd', 3),
+    (ResponseMatcher(regex=rb'T=\d+\n'), b'x T=25\n', 7),
+    (ResponseMatcher(regex=rb'T=\d+\n'), b'x T=25', -1),
+])
+def test_response_matcher(matcher, buffer, end):
+    assert matcher.match(buffer) == end
+
+
+def test_response_matcher_rejects_invalid_rules():
+    with pytest.raises(ValueError):
+        ResponseMatcher()
+    with pytest.raises(ValueError):
+        ResponseMatcher(regex=rb'x', length=4)
+
+
+def test_latency_probe_over_loopback(engine, tmp_path):
+    probe = LatencyProbe(engine, b'PING\r\n', ResponseMatcher(prefix=b'PING\r\n'), iterations=20)
+    probe.start()
+    probe.join(5)
+    assert probe.error is None
+    stats = probe.stats()
+    assert (stats['count'], stats['timeouts']) == (20, 0)
+    assert 0 < stats['min_us'] <= stats['p50_us'] <= stats['p99_us'] <= stats['max_us']
+    histogram = probe.histogram(bins=5)
+    assert len(histogram) == 5 and sum(count for _, _, count in histogram) == 20
+    probe.write_csv(tmp_path / 'rtt.csv')
+    lines = (tmp_path / 'rtt.csv').read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'iteration,sent_at,rtt_us,status'
+    assert len(lines) == 21 and lines[1].endswith(',ok')
+    assert format_latency(probe, bins=5).startswith('20 次, 超时 0')
+    # 探测结束后移除接收回调
+    assert probe._on_data not in engine.reader.listeners
+
+
+def test_latency_probe_counts_timeouts(engine):
+    probe = LatencyProbe(engine, b'PING', ResponseMatcher(prefix=b'PONG'), iterations=2, timeout=0.05)
+    probe.start()
+    probe.join(5)
+    assert probe.timeouts == 2
+    assert [rtt for _, _, rtt in probe.samples] == [None, None]
+    assert probe.histogram() == []
+    assert probe.stats()['count'] == 2
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="需要 pty")
+def test_io_loop_serves_several_ports():
+    io_loop = IoLoop()
+    io_loop.start()
+    pairs = [os.openpty() for _ in range(3)]
+    received = [bytearray() for _ in pairs]
+    engines = []
+    try:
+        for (master, slave), buffer in zip(pairs, received):
+            engine = SerialEngine(io_loop=io_loop)
+            engine.open(os.ttyname(slave))
+            engine.add_listener(lambda data, timestamp_ns, buffer=buffer: buffer.extend(data))
+            engines.append(engine)
+        assert all(isinstance(engine.reader, SelectorReader) for engine in engines)
+        assert io_loop.port_count == 3
+        for index, (master, _) in enumerate(pairs):
+            os.write(master, b'port %d' % index)
+        assert wait_for(lambda: [bytes(buffer) for buffer in received] == [b'port %d' % i for i in range(3)])
+        engines[1].send(b'reply', timeout=2)
+        assert os.read(pairs[1][0], 16) == b'reply'
+        engines[0].close()
+        assert io_loop.port_count == 2
+        os.write(pairs[2][0], b'!')
+        assert wait_for(lambda: received[2].endswith(b'!'))
+    finally:
+        for engine in engines:
+            engine.close()
+        io_loop.stop()
+        for master, slave in pairs:
+            os.close(master)
+            os.close(slave)
+    assert not io_loop.is_alive()
+
+
+def test_engine_falls_back_to_reader_thread_without_descriptor():
+    io_loop = IoLoop()
+    io_loop.start()
+    engine = SerialEngine(io_loop=io_loop)
+    try:
+        engine.open('loop://')
+        assert not isinstance(engine.reader, SelectorReader)
+        assert io_loop.port_count == 0
+    finally:
+        engine.close()
+        io_loop.stop()
+
+
+def test_traffic_stats_rates_peaks_and_utilisation(tmp_path):
+    stats = TrafficStats(average_window=10.0)
+    stats.started = 0.0
+    stats.rx_bytes = 1000
+    first = stats.sample(baudrate=9600, char_bits=10, now=1.0)
+    assert first['rx_bytes_rate'] == 1000
+    assert first['rx_utilisation'] == pytest.approx(1000 / 960)
+    assert first['tx_utilisation'] == 0
+    stats.rx_bytes, stats.frames = 1500, 4
+    stats.sample(baudrate=9600, char_bits=10, now=2.0)
+    stats.rx_bytes = 1800
+    third = stats.sample(baudrate=9600, char_bits=10, now=3.0)
+    assert third['rx_bytes_rate'] == 300
+    assert third['rx_bytes_avg'] == 400
+    assert third['rx_bytes_peak'] == 1000
+    assert third['frames_peak'] == 4
+    assert stats.sample(now=4.0)['rx_utilisation'] is None
+
+    stats.write_csv(tmp_path / 'stats.csv')
+    rows = (tmp_path / 'stats.csv').read_text(encoding='utf-8').splitlines()
+    assert len(rows) == 5
+    assert rows[1].split(',')[-3:] == ['1000.0', '0.0', '0.0']
+    text = format_traffic(third)
+    assert '接收: 1800 字节' in text and '线路利用率 31.2%' in text and '线路利用率 0.0%' in text
+
+
+def test_engine_counts_traffic(engine):
+    received = collect(engine)
+    engine.send(b'0123456789', timeout=2)
+    assert wait_for(lambda: len(received) == 10)
+    stats = engine.sample_stats()
+    assert (stats['rx_bytes'], stats['tx_bytes'], stats['tx_requests']) == (10, 10, 1)
+    assert stats['rx_utilisation'] is not None
+    engine.reset_stats()
+    assert engine.sample_stats()['rx_bytes'] == 0
+
+
+def test_bits_per_char():
+    assert bits_per_char() == 10
+    assert bits_per_char(7, 'E', 2) == 11
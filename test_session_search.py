@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""session_search 模块测试: 索引查询结果与逐字节暴力查找一致"""
+import os
+import re
+import random
+
+import pytest
+
+from session_search import SessionSearchIndex, BLOCK_SIZE, sweep_stale_files
+
+
+def brute_force(data, pattern):
+    """不重叠的匹配, 与 SessionSearchIndex 的约定相同"""
+    matches = []
+    position = data.find(pattern)
+    while position >= 0:
+        matches.append((position, position + len(pattern)))
+        position = data.find(pattern, position + len(pattern))
+    return matches
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SessionSearchIndex(directory=str(tmp_path))
+    yield index
+    index.close()
+
+
+def session_data(size=3 * BLOCK_SIZE + 1234, seed=2):
+    rng = random.Random(seed)
+    data = bytearray(rng.randrange(ord('a'), ord('e')) for _ in range(size))
+    # 在块边界两侧放置跨越边界的标记
+    for boundary in range(BLOCK_SIZE, size, BLOCK_SIZE):
+        data[boundary - 3:boundary + 3] = b'NEEDLE'
+    return bytes(data)
+
+
+@pytest.mark.parametrize('chunk', [1000, 4096, 65536, 70001])
+def test_matches_brute_force_across_block_boundaries(index, chunk):
+    data = session_data()
+    for start in range(0, len(data), chunk):
+        index.append(data[start:start + chunk])
+    for pattern in (b'NEEDLE', b'abc', b'dd', b'LEN', b'zz'):
+        assert index.search(pattern) == brute_force(data, pattern), pattern
+
+
+def test_incremental_search_finds_matches_spanning_old_end(index):
+    data = session_data()
+    pattern = b'NEEDLE'
+    expected_all = brute_force(data, pattern)
+    split = BLOCK_SIZE - 2
+    index.append(data[:split])
+    assert index.search(pattern) == brute_force(data[:split], pattern)
+    index.append(data[split:])
+    assert index.search(pattern) == expected_all
+
+
+def test_regex_matches_brute_force(index):
+    data = session_data()
+    for start in range(0, len(data), 5000):
+        index.append(data[start:start + 5000])
+    pattern = rb'NEED(LE)?|a{4,}'
+    expected = [match.span() for match in re.finditer(pattern, data)]
+    assert index.search(pattern, regex=True) == expected
+
+
+def test_read_and_clear(index):
+    index.append(b'hello world')
+    assert index.read(6, 11) == b'world'
+    path = index.path
+    index.clear()
+    assert index.size == 0
+    assert index.search(b'hello') == []
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize('regex', [False, True])
+def test_max_results_resumes_from_real_position(index, regex):
+    data = session_data()
+    index.append(data)
+    pattern = b'abc'
+    expected = brute_force(data, pattern)
+    assert len(expected) > 20
+    assert index.search(pattern, regex=regex, max_results=10) == expected[:10]
+    # 缓存记录提前停止的位置, 放宽上限后继续找到之后的匹配
+    assert index.search(pattern, regex=regex, max_results=len(expected) + 1) == expected
+
+
+def test_size_cap_keeps_contiguous_prefix(tmp_path):
+    index = SessionSearchIndex(directory=str(tmp_path), max_size=100)
+    try:
+        index.append(b'x' * 60)
+        assert not index.full
+        index.append(b'y' * 60 + b'NEEDLE')
+        index.append(b'NEEDLE')
+        assert (index.size, index.skipped, index.total) == (100, 32, 132)
+        assert index.full
+        assert index.search(b'NEEDLE') == []
+        assert index.read(50, 200) == b'x' * 10 + b'y' * 40
+    finally:
+        index.close()
+
+
+def test_engine_listener_interface(index):
+    index(b'abc', 123)
+    assert index.read(0, 3) == b'abc'
+
+
+def test_sweep_removes_only_files_of_exited_processes(tmp_path):
+    index = SessionSearchIndex(directory=str(tmp_path))
+    index.append(b'live')
+    dead_pid = 2 ** 22 + 12345
+    stale = tmp_path / f'session_{dead_pid}_x.bin'
+    legacy = tmp_path / 'session_abcd.bin'
+    recent = tmp_path / f'receive_{dead_pid}_y.log'
+    other = tmp_path / f'other_{dead_pid}.bin'
+    for path in (stale, legacy, recent, other):
+        path.write_bytes(b'x')
+    assert sweep_stale_files(str(tmp_path), 'session_', '.bin') == 2
+    assert sweep_stale_files(str(tmp_path), 'receive_', '.log', max_age_s=3600) == 0
+    assert os.path.exists(index.path)
+    assert not stale.exists() and not legacy.exists()
+    assert recent.exists() and other.exists()
+    os.utime(recent, (0, 0))
+    assert sweep_stale_files(str(tmp_path), 'receive_', '.log', max_age_s=3600) == 1
+    index.close()
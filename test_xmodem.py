@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""xmodem 模块测试: 通过 pty 对在 pyserial 串口与 pty 主端之间收发文件"""
+import os
+import sys
+import random
+import threading
+
+import pytest
+import serial
+
+from xmodem import (
+    ModemTransfer, TransferCancelled, SerialChannel, _FdChannel, _packet,
+    XMODEM_CRC, XMODEM_1K, YMODEM, SOH, STX, SUB
+)
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="需要 pty")
+
+
+@pytest.fixture
+def channels():
+    """(pty 主端通道, pyserial 串口通道) 的工厂, 测试结束时关闭"""
+    import tty
+    opened = []
+
+    def make(error_rate=0.0, lost_acks=0):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        port = serial.Serial(os.ttyname(slave), 115200)
+        os.close(slave)
+        opened.append((master, port))
+        return _FdChannel(master, error_rate, lost_acks), SerialChannel(port)
+
+    yield make
+    for master, port in opened:
+        port.close()
+        os.close(master)
+
+
+def make_files(directory, *sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        path = directory / f'source{i}.bin'
+        path.write_bytes(os.urandom(size))
+        paths.append(str(path))
+    return paths
+
+
+def transfer(sending, receiving, mode, source, target, **options):
+    """在线程中发送, 当前线程接收, 返回 (发送端, 接收端统计)"""
+    sender = ModemTransfer(sending, mode, **options)
+    receiver = ModemTransfer(receiving, mode, **options)
+    errors = []
+
+    def run_sender():
+        try:
+            sender.send(source)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run_sender)
+    thread.start()
+    try:
+        stats = receiver.receive(str(target))
+    finally:
+        thread.join()
+    assert not errors, errors
+    return sender, stats
+
+
+def assert_same_files(expected, received):
+    assert len(received) == len(expected)
+    for a, b in zip(expected, received):
+        with open(a, 'rb') as fa, open(b, 'rb') as fb:
+            assert fa.read() == fb.read()
+
+
+def test_packet_layout():
+    packet = _packet(1, b'abc', 128, use_crc=True)
+    assert packet[:3] == bytes([SOH, 1, 0xFE])
+    assert packet[3:131] == b'abc' + bytes([SUB]) * 125
+    assert len(packet) == 133
+    packet = _packet(256, b'', 1024, use_crc=False)
+    assert packet[:3] == bytes([STX, 0, 0xFF])
+    assert len(packet) == 1028
+
+
+@pytest.mark.parametrize('mode', [XMODEM_CRC, XMODEM_1K])
+@pytest.mark.parametrize('sender_side', ['pty', 'serial'])
+def test_xmodem_round_trip(channels, tmp_path, mode, sender_side):
+    peer, local = channels()
+    sending, receiving = (peer, local) if sender_side == 'pty' else (local, peer)
+    source = make_files(tmp_path, 20_000)[0]
+    _, stats = transfer(sending, receiving, mode, source, tmp_path / 'out.bin')
+    # XMODEM 没有文件长度, 接收的文件末尾可能带有填充字节
+    with open(source, 'rb') as f:
+        data = f.read()
+    with open(stats.files[0], 'rb') as f:
+        assert f.read().rstrip(bytes([SUB])) == data.rstrip(bytes([SUB]))
+
+
+def test_ymodem_batch_keeps_names_and_sizes(channels, tmp_path):
+    peer, local = channels()
+    sources = make_files(tmp_path, 1, 128, 1024, 3000)
+    target = tmp_path / 'received'
+    target.mkdir()
+    _, stats = transfer(peer, local, YMODEM, sources, target)
+    assert_same_files(sources, stats.files)
+    assert [os.path.basename(path) for path in stats.files] == [os.path.basename(path) for path in sources]
+
+
+def test_ymodem_recovers_from_lost_header_ack(channels, tmp_path):
+    # 接收端对文件头的 ACK 丢失, 发送端重发文件头, 接收端应重新应答 ACK + 'C'
+    peer, local = channels(lost_acks=1)
+    sources = make_files(tmp_path, 1, 128)
+    target = tmp_path / 'received'
+    target.mkdir()
+    _, stats = transfer(local, peer, YMODEM, sources, target, block_timeout=1.0)
+    assert_same_files(sources, stats.files)
+
+
+def test_noisy_line_retransmits_corrupted_blocks(channels, tmp_path):
+    random.seed(3)
+    peer, local = channels(error_rate=0.2)
+    source = make_files(tmp_path, 1024 * 24)
+    target = tmp_path / 'received'
+    target.mkdir()
+    sender, stats = transfer(peer, local, YMODEM, source, target, block_timeout=1.0)
+    assert_same_files(source, stats.files)
+    assert sender.stats.retries > 0
+
+
+def test_cancel_stops_both_sides(channels, tmp_path):
+    peer, local = channels()
+    receiver = ModemTransfer(local, XMODEM_CRC, start_timeout=5.0)
+    sender = ModemTransfer(peer, XMODEM_CRC)
+    errors = []
+
+    def run_receiver():
+        try:
+            receiver.receive(str(tmp_path / 'out.bin'))
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run_receiver)
+    thread.start()
+    receiver.cancel()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert isinstance(errors[0], TransferCancelled)
+    with pytest.raises(TransferCancelled):
+        sender.send(make_files(tmp_path, 100)[0])
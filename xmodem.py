@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+"""XMODEM / YMODEM 文件传输
+
+支持 XMODEM-CRC(128 字节块, 接收方不支持 CRC 时回退到校验和)、XMODEM-1K
+(1024 字节块)和 YMODEM 批量传输的发送与接收。协议通过字节通道工作:
+
+    channel.read(size, timeout) -> bytes    超时返回 b''
+    channel.write(data)
+    channel.purge()                         丢弃未读取的数据
+
+串口引擎的 open_channel() 返回这样的通道; SerialChannel 直接包装一个
+pyserial 串口。ModemTransfer 的 send()/receive() 是阻塞调用, 应在工作线程
+中运行, cancel() 可从其他线程调用。
+
+CRC-16/XMODEM 使用 binascii.crc_hqx (C 实现的查表 CRC)。XMODEM/YMODEM
+是停等协议, 每块单独确认: 每块最多重试 retries 次; 最近 ERROR_WINDOW 块中
+有一半需要重传时, 1K 块自动降为 128 字节块, 减少噪声线路上每次重传的代价。
+
+命令行:
+    python xmodem.py send <串口> <文件>... [--mode ymodem] [-b 115200]
+    python xmodem.py receive <串口> <文件或目录> [--mode xmodem-crc]
+    python xmodem.py selftest        通过 pty 对测试所有模式的收发(Linux/macOS)
+"""
+import os
+import sys
+import time
+import random
+import select
+import argparse
+import binascii
+import threading
+from collections import deque
+
+SOH = 0x01
+STX = 0x02
+EOT = 0x04
+ACK = 0x06
+NAK = 0x15
+CAN = 0x18
+CRC = 0x43  # 'C'
+SUB = 0x1A
+
+XMODEM_CRC = 'xmodem-crc'
+XMODEM_1K = 'xmodem-1k'
+YMODEM = 'ymodem'
+MODES = (XMODEM_CRC, XMODEM_1K, YMODEM)
+
+ERROR_WINDOW = 16
+
+# 取消传输: 连续的 CAN, 之后用退格清除对端终端上可能显示的字符
+CANCEL_SEQUENCE = bytes([CAN] * 8) + b'\b' * 8
+
+
+class ModemError(Exception):
+    """传输失败"""
+
+
+class TransferCancelled(ModemError):
+    """传输被本端或对端取消"""
+
+
+class TransferStats:
+    """传输统计, 在传输线程中更新"""
+
+    def __init__(self):
+        self.file_name = ''
+        self.file_size = 0
+        self.file_bytes = 0
+        self.total_bytes = 0
+        self.blocks = 0
+        self.retries = 0
+        self.downshifts = 0
+        self.files = []
+        self.start = time.monotonic()
+        self.end = 0.0
+
+    @property
+    def elapsed(self):
+        return (self.end or time.monotonic()) - self.start
+
+    @property
+    def rate(self):
+        """平均有效数据速率, 字节/秒"""
+        elapsed = self.elapsed
+        return self.total_bytes / elapsed if elapsed > 0 else 0
+
+
+class SerialChannel:
+    """把 pyserial 串口包装为字节通道"""
+
+    def __init__(self, port):
+        self.port = port
+
+    def read(self, size, timeout):
+        """等待第一个字节最多 timeout 秒, 再取出已到达的其余数据"""
+        self.port.timeout = timeout
+        data = self.port.read(1)
+        if data and size > 1:
+            data += self.port.read(min(size - 1, self.port.in_waiting))
+        return data
+
+    def write(self, data):
+        self.port.write(data)
+        self.port.flush()
+
+    def purge(self):
+        self.port.reset_input_buffer()
+
+
+class _FdChannel:
+    """文件描述符(pty 主端)上的字节通道, 用于自测
+
+    error_rate 为每次写出时随机篡改一个字节的概率, 模拟噪声线路; lost_acks
+    为丢弃的前几个单独写出的 ACK 数, 模拟确认丢失。
+    """
+
+    def __init__(self, fd, error_rate=0.0, lost_acks=0):
+        self.fd = fd
+        self.error_rate = error_rate
+        self.lost_acks = lost_acks
+
+    def read(self, size, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return os.read(self.fd, size) if ready else b''
+
+    def write(self, data):
+        if self.lost_acks and data == bytes([ACK]):
+            self.lost_acks -= 1
+            return
+        if self.error_rate and random.random() < self.error_rate:
+            data = bytearray(data)
+            data[random.randrange(len(data))] ^= 0x55
+            data = bytes(data)
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def purge(self):
+        while select.select([self.fd], [], [], 0)[0]:
+            os.read(self.fd, 4096)
+
+
+def _packet(number, data, size, use_crc, fill=SUB):
+    """组装一个数据包: 头, 块号, 块号反码, 数据(用 fill 填充), CRC 或校验和"""
+    data = data.ljust(size, bytes([fill]))
+    header = bytes([SOH if size == 128 else STX, number & 0xFF, 0xFF - (number & 0xFF)])
+    if use_crc:
+        return header + data + binascii.crc_hqx(data, 0).to_bytes(2, 'big')
+    return header + data + bytes([sum(data) & 0xFF])
+
+
+class ModemTransfer:
+    """XMODEM / YMODEM 发送与接收
+
+    mode 为 XMODEM_CRC、XMODEM_1K 或 YMODEM。on_progress(stats) 在每块完成
+    后调用。
+    """
+
+    def __init__(self, channel, mode=XMODEM_CRC, retries=10, block_timeout=10.0, start_timeout=60.0,
+                 on_progress=None):
+        if mode not in MODES:
+            raise ValueError(f"未知的传输模式 {mode}")
+        self.channel = channel
+        self.mode = mode
+        self.retries = retries
+        self.block_timeout = block_timeout
+        self.start_timeout = start_timeout
+        self.on_progress = on_progress
+        self.stats = TransferStats()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """取消传输, 通知对端后 send()/receive() 抛出 TransferCancelled"""
+        self._cancelled.set()
+
+    # 底层读写
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            try:
+                self.channel.write(CANCEL_SEQUENCE)
+            finally:
+                raise TransferCancelled("传输已取消")
+
+    def _read_byte(self, timeout):
+        """读取一个字节, 超时返回 None; 等待期间检查取消"""
+        deadline = time.monotonic() + timeout
+        while True:
+            self._check_cancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            data = self.channel.read(1, min(remaining, 0.25))
+            if data:
+                return data[0]
+
+    def _read_exact(self, size, timeout):
+        """读取 size 字节, 两个字节之间超过 timeout 秒时返回已读到的部分"""
+        data = bytearray()
+        while len(data) < size:
+            self._check_cancelled()
+            chunk = self.channel.read(size - len(data), timeout)
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+
+    def _purge(self, idle=0.2, limit=1.0):
+        """丢弃线路上的残余数据, 直到空闲 idle 秒"""
+        deadline = time.monotonic() + limit
+        self.channel.purge()
+        while time.monotonic() < deadline and self.channel.read(4096, idle):
+            pass
+
+    def _peer_cancelled(self):
+        """收到一个 CAN 后, 第二个 CAN 表示对端取消"""
+        if self._read_byte(1.0) == CAN:
+            raise TransferCancelled("对端取消了传输")
+
+    def _progress(self):
+        if self.on_progress:
+            self.on_progress(self.stats)
+
+    # 发送
+
+    def _wait_for_start(self, allow_checksum):
+        """等待接收方的 'C' 或 NAK, 返回是否使用 CRC"""
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            byte = self._read_byte(min(1.0, max(0.0, deadline - time.monotonic())))
+            if byte == CRC:
+                return True
+            if byte == NAK and allow_checksum:
+                return False
+            if byte == CAN:
+                self._peer_cancelled()
+        raise ModemError("等待接收方开始超时")
+
+    def _send_packet(self, number, data, size, use_crc, fill=SUB):
+        """发送一个数据包并等待 ACK, 返回是否经过重传"""
+        packet = _packet(number, data, size, use_crc, fill)
+        for attempt in range(self.retries + 1):
+            self.channel.write(packet)
+            reply = self._read_byte(self.block_timeout)
+            if reply == ACK:
+                return attempt > 0
+            if reply == CAN:
+                self._peer_cancelled()
+            self.stats.retries += 1
+            if reply != NAK:
+                # 超时或收到杂散数据: 清空线路后重传
+                self._purge()
+        raise ModemError(f"数据块 {number} 重试 {self.retries} 次后仍失败")
+
+    def _send_eot(self):
+        """发送 EOT 直到接收方 ACK (YMODEM 接收方通常先 NAK 第一个 EOT)"""
+        for _ in range(self.retries + 1):
+            self.channel.write(bytes([EOT]))
+            reply = self._read_byte(self.block_timeout)
+            if reply == ACK:
+                return
+            if reply == CAN:
+                self._peer_cancelled()
+        raise ModemError("EOT 未被确认")
+
+    def _send_data(self, source, size, use_crc):
+        """发送文件内容的数据块(从块号 1 开始)"""
+        block_size = 128 if self.mode == XMODEM_CRC else 1024
+        recent = deque(maxlen=ERROR_WINDOW)
+        number = 1
+        sent = 0
+        pending = b''
+        while True:
+            if len(pending) < block_size:
+                pending += source.read(block_size - len(pending))
+            if not pending:
+                break
+            # 剩余数据不超过 128 字节时使用短块, 减少填充
+            current = block_size if len(pending) > 128 else 128
+            data, pending = pending[:current], pending[current:]
+            retried = self._send_packet(number, data, current, use_crc)
+            recent.append(retried)
+            if block_size == 1024 and sum(recent) >= ERROR_WINDOW // 2:
+                block_size = 128
+                self.stats.downshifts += 1
+                recent.clear()
+            number += 1
+            sent += len(data)
+            self.stats.blocks += 1
+            self.stats.file_bytes = min(sent, size) if size else sent
+            self.stats.total_bytes += len(data)
+            self._progress()
+        self._send_eot()
+
+    def send(self, paths):
+        """发送文件; XMODEM 模式只能发送一个文件"""
+        if isinstance(paths, str):
+            paths = [paths]
+        if self.mode != YMODEM and len(paths) != 1:
+            raise ValueError("XMODEM 一次只能发送一个文件")
+        self.stats = TransferStats()
+        try:
+            use_crc = self._wait_for_start(allow_checksum=self.mode == XMODEM_CRC)
+            for path in paths:
+                size = os.path.getsize(path)
+                self.stats.file_name = os.path.basename(path)
+                self.stats.file_size = size
+                self.stats.file_bytes = 0
+                with open(path, 'rb') as source:
+                    if self.mode == YMODEM:
+                        stat = os.stat(path)
+                        header = (os.path.basename(path).encode('utf-8') + b'\0'
+                                  + f"{size} {int(stat.st_mtime):o} {stat.st_mode & 0o7777:o}".encode('ascii'))
+                        self._send_packet(0, header, 128 if len(header) < 128 else 1024, use_crc, fill=0)
+                        use_crc = self._wait_for_start(allow_checksum=False)
+                    self._send_data(source, size, use_crc)
+                self.stats.files.append(path)
+                if self.mode == YMODEM:
+                    use_crc = self._wait_for_start(allow_checksum=False)
+            if self.mode == YMODEM:
+                # 全零的块 0 结束批量传输
+                self._send_packet(0, b'', 128, use_crc, fill=0)
+        finally:
+            self.stats.end = time.monotonic()
+        return self.stats
+
+    # 接收
+
+    def _read_packet(self, use_crc, timeout):
+        """读取一个数据包
+
+        返回 ('block', 块号, 数据)、('eot',)、('timeout',) 或 ('error',)。
+        """
+        header = self._read_byte(timeout)
+        if header is None:
+            return ('timeout',)
+        if header == EOT:
+            return ('eot',)
+        if header == CAN:
+            self._peer_cancelled()
+            return ('error',)
+        if header not in (SOH, STX):
+            return ('error',)
+        size = 128 if header == SOH else 1024
+        body = self._read_exact(2 + size + (2 if use_crc else 1), 1.0)
+        if len(body) != 2 + size + (2 if use_crc else 1) or body[0] + body[1] != 0xFF:
+            return ('error',)
+        data = body[2:2 + size]
+        if use_crc:
+            valid = binascii.crc_hqx(data, 0) == int.from_bytes(body[-2:], 'big')
+        else:
+            valid = sum(data) & 0xFF == body[-1]
+        if not valid:
+            return ('error',)
+        return ('block', body[0], data)
+
+    def _start_receive(self, allow_checksum):
+        """重复发送 'C' (之后回退到 NAK) 直到收到第一个包, 返回 (是否 CRC, 包)"""
+        deadline = time.monotonic() + self.start_timeout
+        attempts = 0
+        while time.monotonic() < deadline:
+            # 发送 'C' 几次仍无响应时, XMODEM 回退到校验和模式
+            use_crc = not allow_checksum or attempts < 4
+            self.channel.write(bytes([CRC if use_crc else NAK]))
+            attempts += 1
+            packet = self._read_packet(use_crc, 3.0)
+            if packet[0] == 'block':
+                return use_crc, packet
+            if packet[0] == 'eot':
+                # 对端没有收到上一个文件 EOT 的 ACK
+                self.channel.write(bytes([ACK]))
+            elif packet[0] == 'error':
+                self._purge()
+        raise ModemError("等待发送方开始超时")
+
+    def _linger(self, idle=1.0):
+        """XMODEM 结束后短暂等待, 最后的 ACK 丢失时对端会重发 EOT"""
+        while True:
+            byte = self._read_byte(idle)
+            if byte is None:
+                return
+            if byte == EOT:
+                self.channel.write(bytes([ACK]))
+
+    def _receive_data(self, target, use_crc, first_packet, size=None):
+        """接收数据块直到 EOT, 写入 target; size 为 None 时去掉末尾的 SUB 填充
+
+        first_packet 为已读到的第一个包(可为 None)。
+        """
+        expected = 1
+        errors = 0
+        last = None  # 最后一块先保留, 收到 EOT 后再决定是否去掉填充
+        received = 0
+        eot_seen = False
+        packet = first_packet
+        while True:
+            if packet is None:
+                packet = self._read_packet(use_crc, self.block_timeout)
+            kind = packet[0]
+            if kind == 'block':
+                number, data = packet[1], packet[2]
+                eot_seen = False
+                if number == 0 and expected == 1 and self.mode == YMODEM:
+                    # 对端没有收到头块的 ACK, 重发了头块; 必须在重复块判断之前,
+                    # 否则只回 ACK 不回 'C', 对端会一直等待开始
+                    self.channel.write(bytes([ACK, CRC]))
+                elif number == expected & 0xFF:
+                    if last is not None:
+                        target.write(last)
+                    if size is not None:
+                        data = data[:max(0, size - received)]
+                    last = data
+                    received += len(data)
+                    expected += 1
+                    errors = 0
+                    self.stats.blocks += 1
+                    self.stats.file_bytes = received
+                    self.stats.total_bytes += len(data)
+                    self.channel.write(bytes([ACK]))
+                    self._progress()
+                elif number == (expected - 1) & 0xFF:
+                    # 对端没有收到 ACK, 重发了上一块
+                    self.channel.write(bytes([ACK]))
+                else:
+                    self.cancel()
+                    self._check_cancelled()
+            elif kind == 'eot':
+                if self.mode == YMODEM and not eot_seen:
+                    # YMODEM: 第一个 EOT 回复 NAK, 确认对端确实结束
+                    eot_seen = True
+                    self.channel.write(bytes([NAK]))
+                else:
+                    self.channel.write(bytes([ACK]))
+                    break
+            else:
+                errors += 1
+                self.stats.retries += 1
+                if errors > self.retries:
+                    self.cancel()
+                    self._check_cancelled()
+                self._purge()
+                self.channel.write(bytes([NAK]))
+            packet = None
+        if last is not None:
+            if size is None:
+                stripped = last.rstrip(bytes([SUB]))
+                self.stats.file_bytes -= len(last) - len(stripped)
+                self.stats.total_bytes -= len(last) - len(stripped)
+                last = stripped
+            target.write(last)
+        return received
+
+    def receive(self, destination):
+        """接收文件, 返回 TransferStats
+
+        XMODEM 模式下 destination 为文件路径; YMODEM 下为目录, 文件名取自
+        发送方的头块。
+        """
+        self.stats = TransferStats()
+        try:
+            if self.mode != YMODEM:
+                use_crc, packet = self._start_receive(allow_checksum=self.mode == XMODEM_CRC)
+                self.stats.file_name = os.path.basename(destination)
+                with open(destination, 'wb') as target:
+                    self._receive_data(target, use_crc, packet)
+                self.stats.files.append(destination)
+                self._linger()
+                return self.stats
+            os.makedirs(destination, exist_ok=True)
+            while True:
+                use_crc, packet = self._start_receive(allow_checksum=False)
+                if packet[1] != 0:
+                    self.cancel()
+                    self._check_cancelled()
+                name, _, info = packet[2].partition(b'\0')
+                self.channel.write(bytes([ACK]))
+                if not name:
+                    break
+                fields = info.split(b'\0', 1)[0].split()
+                size = int(fields[0]) if fields else None
+                # 只使用文件名部分, 防止写出目标目录
+                path = os.path.join(destination, os.path.basename(name.decode('utf-8', errors='replace')))
+                self.stats.file_name = os.path.basename(path)
+                self.stats.file_size = size or 0
+                self.stats.file_bytes = 0
+                with open(path, 'wb') as target:
+                    use_crc, packet = self._start_receive(allow_checksum=False)
+                    self._receive_data(target, use_crc, packet, size)
+                if len(fields) > 1:
+                    mtime = int(fields[1], 8)
+                    if mtime:
+                        os.utime(path, (mtime, mtime))
+                self.stats.files.append(path)
+        finally:
+            self.stats.end = time.monotonic()
+        return self.stats
+
+
+def _format_stats(stats):
+    return (f"{len(stats.files)} 个文件, {stats.total_bytes} 字节, {stats.blocks} 块, "
+            f"重传 {stats.retries} 次, 降块 {stats.downshifts} 次, "
+            f"{stats.elapsed:.2f} 秒, {stats.rate / 1024:.1f} KB/s")
+
+
+def selftest(size=200_000):
+    """通过 pty 对测试各模式的收发, 全部成功时返回 True"""
+    import tempfile
+    import serial
+    import tty
+
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        sources = []
+        for i, length in enumerate((size, 1, 128, 1024, 1000, 50_000)):
+            path = os.path.join(directory, f"source{i}.bin")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(length))
+            sources.append(path)
+        # (模式, 文件, pty 端写出出错的概率, pty 端丢弃的 ACK 数)
+        cases = [(XMODEM_CRC, sources[0], 0, 0), (XMODEM_1K, sources[0], 0, 0), (YMODEM, sources[:5], 0, 0),
+                 (XMODEM_1K, sources[5], 0.2, 0), (YMODEM, sources[1:3], 0, 1)]
+        for mode, source, error_rate, lost_acks in cases:
+            for sender_side in ('pty', 'serial'):
+                master, slave = os.openpty()
+                tty.setraw(master)
+                port = serial.Serial(os.ttyname(slave), 115200)
+                os.close(slave)
+                peer = _FdChannel(master, error_rate, lost_acks)
+                local = SerialChannel(port)
+                sending, receiving = (peer, local) if sender_side == 'pty' else (local, peer)
+                sender = ModemTransfer(sending, mode)
+                receiver = ModemTransfer(receiving, mode)
+                target = os.path.join(directory, f"out_{mode}_{sender_side}")
+                errors = []
+
+                def run_sender():
+                    try:
+                        sender.send(source)
+                    except Exception as e:
+                        errors.append(e)
+
+                thread = threading.Thread(target=run_sender)
+                thread.start()
+                try:
+                    stats = receiver.receive(target)
+                except Exception as e:
+                    errors.append(e)
+                    stats = receiver.stats
+                thread.join()
+                port.close()
+                os.close(master)
+                expected = source if isinstance(source, list) else [source]
+                received = stats.files
+                passed = not errors and len(received) == len(expected) and all(
+                    open(a, 'rb').read() == open(b, 'rb').read() for a, b in zip(expected, received)
+                )
+                ok &= passed
+                print(f"{mode:<11} 发送端={sender_side:<6} 误码={error_rate:<4} 丢 ACK={lost_acks} "
+                      f"{'通过' if passed else '失败'}  "
+                      f"{_format_stats(sender.stats)} {errors or ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="XMODEM/YMODEM 文件传输")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('send', 'receive'):
+        command = sub.add_parser(name)
+        command.add_argument('port')
+        command.add_argument('paths', nargs='+')
+        command.add_argument('--mode', choices=MODES, default=XMODEM_CRC)
+        command.add_argument('-b', '--baudrate', type=int, default=115200)
+    sub.add_parser('selftest')
+    args = parser.parse_args(argv)
+    if args.command == 'selftest':
+        return 0 if selftest() else 1
+
+    import serial
+    from serial_engine import SerialEngine
+    engine = SerialEngine()
+    try:
+        engine.open(args.port, baudrate=args.baudrate)
+    except (serial.SerialException, ValueError) as e:
+        print(f"无法打开串口 {args.port}: {e}", file=sys.stderr)
+        return 2
+    channel = engine.open_channel()
+
+    def progress(stats):
+        print(f"\r{stats.file_name} {stats.file_bytes}/{stats.file_size or '?'} 字节  "
+              f"{stats.rate / 1024:.1f} KB/s  重传 {stats.retries}   ", end='', file=sys.stderr)
+
+    transfer = ModemTransfer(channel, args.mode, on_progress=progress)
+    try:
+        if args.command == 'send':
+            stats = transfer.send(args.paths)
+        else:
+            stats = transfer.receive(args.paths[0])
+        print(f"\n完成: {_format_stats(stats)}", file=sys.stderr)
+        return 0
+    except KeyboardInterrupt:
+        # 传输循环已经退出, cancel() 不会再被检查, 直接通知对端
+        channel.write(CANCEL_SEQUENCE)
+        print("\n传输已取消", file=sys.stderr)
+        return 1
+    except ModemError as e:
+        print(f"\n传输失败: {e}", file=sys.stderr)
+        return 1
+    finally:
+        channel.close()
+        engine.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())